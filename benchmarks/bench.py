@@ -0,0 +1,353 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark suite
+
+Times repo discovery, configuration loading, per-repo analysis and full
+refresh cycles against a synthetic repo farm (see farm.py), and counts the
+subprocesses spawned by each benchmark. Results are written as JSON:
+
+    {
+        "meta":    {python, git, platform, cpus, jobs, runs, ...},
+        "farm":    {farm parameters},
+        "results": {benchmark: {runs, min, median, mean, spawns, ...}}
+    }
+
+and can be compared against a previous run to catch regressions:
+
+    PYTHONPATH=src python3 benchmarks/bench.py --repos 500 -o new.json --baseline old.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import fnmatch
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+
+import farm
+
+import git_dashboard
+from git_dashboard.config import (
+    Configuration,
+    find_git_repos_from_path,
+    analyze,
+)
+from git_dashboard.scanner import scan
+from git_dashboard.discovery import DiscoveryCache, RACY_NS
+from git_dashboard.engine import AnalysisEngine, DEFAULT_WORKERS
+from git_dashboard.fingerprint import AnalysisCache
+from git_dashboard.aheadbehind import AheadBehindCache
+from git_dashboard.fetch import FetchScheduler, find_targets
+from git_dashboard.pool import ProcessBackend
+from git_dashboard.index import StatusIndex
+
+class CountingPopen(subprocess.Popen):
+    """subprocess.Popen that counts the processes it spawns"""
+    lock  = threading.Lock()
+    count = 0
+
+    def __init__(self, *args, **kwargs):
+        """constructor"""
+        with CountingPopen.lock:
+            CountingPopen.count += 1
+        super().__init__(*args, **kwargs)
+
+# every git process goes through subprocess.Popen
+subprocess.Popen = CountingPopen
+
+BENCHMARKS = []   # list of (name, setup function)
+CLEANUPS   = []   # functions to call once the current benchmark is measured
+
+def benchmark(name):
+    """
+    register a benchmark. The decorated function is called as `setup(farm, args)`
+    and returns the function to time, which may return a dict of extra results
+    """
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+def cleanup(func):
+    """call `func` once the benchmark being set up is measured, e.g. to stop its workers"""
+    CLEANUPS.append(func)
+
+@benchmark("discovery.recursive")
+def discovery_recursive(manifest, _):
+    """recursive single-threaded discovery, as used before the scanner"""
+    return lambda: {"found": len(find_git_repos_from_path(manifest["work"]))}
+
+@benchmark("discovery.scan")
+def discovery_scan(manifest, args):
+    """parallel os.scandir scanner used to create the default configuration"""
+    return lambda: {"found": len(list(scan(manifest["work"], workers=args.jobs)))}
+
+@benchmark("discovery.cached.cold")
+def discovery_cached_cold(manifest, _):
+    """discovery with an empty listing cache"""
+    return lambda: {"found": len(DiscoveryCache().find_repos(manifest["work"]))}
+
+@benchmark("discovery.cached.warm")
+def discovery_cached_warm(manifest, _):
+    """discovery with every listing cached"""
+    cache = DiscoveryCache()
+    cache.find_repos(manifest["work"])
+    return lambda: {"found": len(cache.find_repos(manifest["work"]))}
+
+@benchmark("config.load")
+def config_load(manifest, _):
+    """parse the configuration and expand its directories into repos"""
+    return lambda: {"found": sum(map(len, Configuration(manifest["config"]).expand().values()))}
+
+@benchmark("config.reload")
+def config_reload(manifest, _):
+    """expand an already loaded configuration whose file didn't change"""
+    config = Configuration(manifest["config"])
+    config.expand()
+    return lambda: {"found": sum(map(len, config.expand().values()))}
+
+@benchmark("analyze.serial")
+def analyze_serial(manifest, _):
+    """analyze each repo in turn, and report the distribution of per-repo times and time per step"""
+    def run():
+        elapsed, steps = [], {}
+        for path in manifest["repos"]:
+            start = time.perf_counter()
+            result = analyze(path)
+            elapsed.append(time.perf_counter() - start)
+            for step, seconds in result.profile.steps.items():
+                steps[step] = steps.get(step, 0.0) + seconds
+        elapsed.sort()
+        return {"steps": steps, "per_repo": {
+            "median": statistics.median(elapsed),
+            "p95":    elapsed[int(0.95 * (len(elapsed) - 1))],
+            "max":    elapsed[-1],
+        }}
+    return run
+
+@benchmark("refresh.engine")
+def refresh_engine(manifest, args):
+    """full refresh cycle through the concurrent engine, without cache"""
+    config = Configuration(manifest["config"])
+    engine = AnalysisEngine(args.jobs)
+    return lambda: {"found": sum(map(len, config.analyze(engine=engine).values()))}
+
+@benchmark("refresh.incremental")
+def refresh_incremental(manifest, args):
+    """full refresh cycle through the concurrent engine, when no repo changed since the last one"""
+    config = Configuration(manifest["config"], DiscoveryCache())
+    engine = AnalysisEngine(args.jobs, AnalysisCache())
+    config.analyze(engine=engine)
+    return lambda: {"found": sum(map(len, config.analyze(engine=engine).values()))}
+
+@benchmark("refresh.memo")
+def refresh_memo(manifest, args):
+    """full refresh cycle through the concurrent engine, with every ahead/behind count memoized"""
+    config = Configuration(manifest["config"])
+    engine = AnalysisEngine(args.jobs, memo=AheadBehindCache())
+    config.analyze(engine=engine)
+    return lambda: {"found": sum(map(len, config.analyze(engine=engine).values()))}
+
+@benchmark("refresh.processes")
+def refresh_processes(manifest, args):
+    """full refresh cycle through the concurrent engine, with repos analyzed by warm processes"""
+    config  = Configuration(manifest["config"])
+    backend = ProcessBackend(min(args.jobs, os.cpu_count() or 1))
+    engine  = AnalysisEngine(args.jobs, backend=backend)
+    cleanup(engine.shutdown)
+    config.analyze(engine=engine)
+    def run():
+        # git processes started by the workers are not counted in `spawns`
+        spawned = backend.spawned
+        found   = sum(map(len, config.analyze(engine=engine).values()))
+        return {"found": found, "worker_spawns": backend.spawned - spawned}
+    return run
+
+@benchmark("fetch.shared")
+def fetch_shared(manifest, args):
+    """fetch every repo through the background fetcher, the farm's clones sharing one upstream"""
+    targets = find_targets(manifest["repos"])
+    fetcher = FetchScheduler(0, args.jobs)
+    def run():
+        moved = set()
+        for group in targets.values():
+            moved.update(fetcher.fetch(group))
+        return {"urls": len(targets), "moved": len(moved)}
+    return run
+
+@benchmark("index.filter")
+def index_filter(manifest, args):
+    """index the status of every repo, then filter them by each prefix of a repo name, as typed"""
+    groups = Configuration(manifest["config"]).analyze(engine=AnalysisEngine(args.jobs))
+    text   = os.path.basename(manifest["repos"][-1])
+    def run():
+        index = StatusIndex()
+        index.update(groups)
+        for end in range(len(text)):
+            index.query(text[:end + 1])
+        return {"found": len(index.query("", ["dirty", "behind"]))}
+    return run
+
+def python(*args, **environ):
+    """
+    run python with `args` and the git_dashboard package of the benchmarks, return its stdout.
+    `environ` overrides environment variables
+    """
+    package = os.path.dirname(os.path.abspath(git_dashboard.__file__))
+    env     = dict(os.environ, PYTHONPATH=os.path.dirname(package), **environ)
+    return subprocess.run([sys.executable] + list(args), env=env, check=True, capture_output=True,
+                          text=True).stdout
+
+@benchmark("startup.version")
+def startup_version(*_):
+    """start the command line to print the version"""
+    def run():
+        python("-m", "git_dashboard.dashboard", "--version")
+    return run
+
+@benchmark("startup.cli")
+def startup_cli(manifest, args):
+    """start the command line and print the status of every repo, including interpreter startup"""
+    # caches are written to an empty home in the farm, not to the user's configuration
+    home = tempfile.mkdtemp(dir=manifest["root"])
+    cleanup(lambda: shutil.rmtree(home))
+    def run():
+        python("-m", "git_dashboard.dashboard", "--no-gui", "-c", manifest["config"],
+               "-j", str(args.jobs), HOME=home, XDG_CONFIG_HOME=os.path.join(home, ".config"))
+    return run
+
+@benchmark("startup.imports")
+def startup_imports(*_):
+    """import the command line interface, and check that it doesn't import Qt"""
+    check = ("import sys, json, git_dashboard.dashboard, git_dashboard.cli, git_dashboard.client; "
+             "print(json.dumps(sorted(name for name in sys.modules "
+             "if name.split('.')[0] in ('PySide6', 'yaml'))))")
+    return lambda: {"heavy_modules": json.loads(python("-c", check))}
+
+def measure(run, runs):
+    """time `runs` calls of `run`, counting the processes spawned by the last one"""
+    samples, extra = [], {}
+    for _ in range(runs):
+        spawned = CountingPopen.count
+        start   = time.perf_counter()
+        extra   = run() or {}
+        samples.append(time.perf_counter() - start)
+        spawned = CountingPopen.count - spawned
+    return dict(
+        runs=samples, min=min(samples), median=statistics.median(samples),
+        mean=statistics.mean(samples), spawns=spawned, **extra,
+    )
+
+def git_version():
+    """return the version of git, or None"""
+    try:
+        return subprocess.run(["git", "--version"], check=True, capture_output=True,
+                              text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, tolerance):
+    """return the benchmarks whose median regressed from `baseline` by more than `tolerance`"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is not None and result["median"] > previous["median"] * (1 + tolerance):
+            regressions.append((name, previous["median"], result["median"]))
+    return regressions
+
+def parser():
+    """argument parser"""
+    par = argparse.ArgumentParser(description="Git dashboard benchmarks")
+    par.add_argument("-d", "--directory",
+                     default=os.path.join(tempfile.gettempdir(), "git-dashboard-farm"),
+                     help="Directory of the synthetic repo farm. Default=%(default)s")
+    par.add_argument("-k", "--select", action="append",
+                     help="Only run benchmarks matching this pattern (fnmatch syntax). "
+                          "Can be repeated")
+    par.add_argument("-n", "--runs", type=int, default=3, help="Runs per benchmark. Default=3")
+    par.add_argument("-j", "--jobs", type=int, default=DEFAULT_WORKERS,
+                     help=f"Number of concurrent workers. Default={DEFAULT_WORKERS}")
+    par.add_argument("-o", "--output", help="Write results to this JSON file instead of stdout")
+    par.add_argument("-b", "--baseline", help="Compare against results of a previous run")
+    par.add_argument("-t", "--tolerance", type=float, default=0.2,
+                     help="Fail if a median is slower than the baseline by more than this ratio. "
+                          "Default=0.2")
+    par.add_argument("-l", "--list", action="store_true", help="List benchmarks and exit")
+    farm.add_arguments(par.add_argument_group("farm parameters"))
+    return par
+
+def main():
+    """main function"""
+    args = parser().parse_args()
+    selected = [(name, setup) for name, setup in BENCHMARKS
+                if not args.select
+                or any(fnmatch.fnmatch(name, pattern) for pattern in args.select)]
+    if args.list:
+        for name, setup in selected:
+            print(f"{name:24} {setup.__doc__}")
+        return
+
+    start = time.time()
+    manifest = farm.generate(args.directory, farm.spec_from_args(args))
+    # directory listings taken too soon after the farm is generated are not cached
+    time.sleep(max(0, os.stat(manifest["config"]).st_mtime_ns + RACY_NS - time.time_ns()) / 1e9)
+    print(f"farm: {len(manifest['repos'])} repos in {manifest['work']} "
+          f"({time.time() - start:.1f}s)", file=sys.stderr)
+
+    results = {}
+    for name, setup in selected:
+        try:
+            results[name] = measure(setup(manifest, args), max(1, args.runs))
+        finally:
+            while CLEANUPS:
+                CLEANUPS.pop()()
+        result = results[name]
+        print(f"{name:24} median {result['median']:8.3f}s  min {result['min']:8.3f}s  "
+              f"spawns {result['spawns']:6}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(), "git": git_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(), "jobs": args.jobs,
+            "runs": args.runs, "time": time.time(),
+        },
+        "farm": manifest["spec"],
+        "results": results,
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as inp:
+            regressions = compare(results, json.load(inp), args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION: {name} median {before:.3f}s -> {after:.3f}s", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
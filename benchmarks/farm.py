@@ -0,0 +1,209 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Synthetic repo farm generator
+
+Generates a reproducible tree of local git repos to benchmark against:
+
+    <root>/farm.json                  parameters and list of repos
+    <root>/config.yaml                git-dashboard configuration of the farm
+    <root>/upstreams/repo-<i>.git     bare upstream of each repo, or of every `upstreams`-th repo
+    <root>/work/group-<g>/<d>/.../repo-<i>
+
+Every repo starts as a copy of the same seed repo with `files` files of
+`file_size` bytes, and gets a random number (up to the configured maximum) of
+commits ahead/behind its upstream and of modified, untracked and staged files.
+The same parameters and seed always generate the same farm.
+
+    python3 benchmarks/farm.py /tmp/farm --repos 500 --depth 2
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+import subprocess
+
+# parameters of a farm, and their default value
+DEFAULTS = {
+    "repos":     100,   # number of repos
+    "groups":    4,     # number of configuration groups
+    "depth":     1,     # directory levels between a group directory and its repos
+    "fanout":    8,     # subdirectories per directory level
+    "noise":     2,     # plain (non repo) directories next to each repo
+    "files":     50,    # tracked files per repo
+    "file_size": 1024,  # bytes per tracked file
+    "dirty":     5,     # max modified files per repo
+    "untracked": 5,     # max untracked files per repo
+    "staged":    2,     # max staged files per repo
+    "ahead":     3,     # max commits ahead of upstream per repo
+    "behind":    3,     # max commits behind upstream per repo
+    "upstreams": 0,     # number of bare upstreams shared by the repos, 0 for one per repo
+    "seed":      0,     # random seed
+}
+
+# don't let the user's configuration affect the farm
+GIT_ENV = dict(
+    os.environ,
+    GIT_AUTHOR_NAME="bench", GIT_AUTHOR_EMAIL="bench@localhost",
+    GIT_COMMITTER_NAME="bench", GIT_COMMITTER_EMAIL="bench@localhost",
+    GIT_AUTHOR_DATE="2022-01-01T00:00:00", GIT_COMMITTER_DATE="2022-01-01T00:00:00",
+    GIT_CONFIG_GLOBAL=os.devnull, GIT_CONFIG_NOSYSTEM="1",
+)
+
+def git(path, *args):
+    """run a git command in `path`"""
+    subprocess.run(["git", "-C", path] + list(args), env=GIT_ENV, check=True,
+                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+def write(path, rng, size):
+    """write `size` random printable bytes to `path`"""
+    with open(path, "w", encoding="ascii") as out:
+        out.write("".join(rng.choice("abcdefghijklmnopqrstuvwxyz\n") for _ in range(size)))
+
+def repo_path(spec, index):
+    """return the path of repo `index`, relative to the work directory"""
+    parts = [f"group-{index % spec['groups']}"]
+    for level in range(spec["depth"]):
+        parts.append(f"d{level}-{(index // spec['fanout'] ** level) % spec['fanout']}")
+    parts.append(f"repo-{index}")
+    return os.path.join(*parts)
+
+def make_seed(root, spec, rng):
+    """create the seed repo and its bare upstream, `behind` commits ahead of the initial one"""
+    seed, bare = os.path.join(root, "seed"), os.path.join(root, "seed.git")
+    git(root, "init", "-q", "--bare", bare)
+    git(root, "clone", "-q", bare, seed)
+    for i in range(spec["files"]):
+        write(os.path.join(seed, f"file-{i}.txt"), rng, spec["file_size"])
+    git(seed, "add", "-A")
+    git(seed, "commit", "-q", "-m", "initial")
+    for i in range(spec["behind"]):
+        write(os.path.join(seed, f"file-{i % max(1, spec['files'])}.txt"), rng, spec["file_size"])
+        git(seed, "commit", "-q", "-a", "--allow-empty", "-m", f"upstream {i}")
+    git(seed, "push", "-q", "-u", "origin", "HEAD")
+    return seed, bare
+
+def make_repo(root, spec, rng, index):
+    """create repo `index` from the seed repo, and return its path"""
+    path     = os.path.join(root, "work", repo_path(spec, index))
+    shared   = index % spec["upstreams"] if spec["upstreams"] else index
+    upstream = os.path.join(root, "upstreams", f"repo-{shared}.git")
+    if not os.path.exists(upstream):
+        shutil.copytree(os.path.join(root, "seed.git"), upstream)
+    shutil.copytree(os.path.join(root, "seed"), path, symlinks=True)
+    git(path, "remote", "set-url", "origin", upstream)
+    behind = rng.randint(0, spec["behind"])
+    if behind:
+        git(path, "reset", "-q", "--hard", f"HEAD~{behind}")
+    tracked = [f"file-{i}.txt" for i in range(spec["files"])]
+    for i in range(rng.randint(0, spec["ahead"])):
+        with open(os.path.join(path, "ahead.txt"), "a", encoding="ascii") as out:
+            out.write(f"{i}\n")
+        git(path, "add", "ahead.txt")
+        git(path, "commit", "-q", "-m", f"local {i}")
+    for i in range(rng.randint(0, spec["staged"])):
+        write(os.path.join(path, f"staged-{i}.txt"), rng, 16)
+        git(path, "add", f"staged-{i}.txt")
+    for name in rng.sample(tracked, min(len(tracked), rng.randint(0, spec["dirty"]))):
+        with open(os.path.join(path, name), "a", encoding="ascii") as out:
+            out.write("dirty\n")
+    for i in range(rng.randint(0, spec["untracked"])):
+        write(os.path.join(path, f"untracked-{i}.txt"), rng, 16)
+    # copied files have new inodes: refresh the index, otherwise every status would re-hash the
+    # whole worktree
+    git(path, "update-index", "-q", "--refresh")
+    for i in range(spec["noise"]):
+        noise = os.path.join(os.path.dirname(path), f"data-{index}-{i}")
+        os.makedirs(noise, exist_ok=True)
+        write(os.path.join(noise, "data.txt"), rng, 16)
+    return path
+
+def write_config(root, repos):
+    """write a git-dashboard configuration listing the parent directory of every repo, per group"""
+    groups = {}
+    for path in repos:
+        group = os.path.relpath(path, os.path.join(root, "work")).split(os.sep)[0]
+        parent = os.path.dirname(path)
+        if parent not in groups.setdefault(group, []):
+            groups[group].append(parent)
+    with open(os.path.join(root, "config.yaml"), "w", encoding="utf-8") as out:
+        for group in sorted(groups):
+            out.write(f"{group}:\n")
+            for parent in groups[group]:
+                out.write(f"  - {json.dumps(parent)}\n")
+
+def load(root):
+    """return the manifest of the farm at `root`, or None if there is none"""
+    try:
+        with open(os.path.join(root, "farm.json"), "r", encoding="utf-8") as inp:
+            return json.load(inp)
+    except (OSError, ValueError):
+        return None
+
+def generate(root, spec, force=False):
+    """
+    generate a farm at `root` with parameters `spec` (see DEFAULTS) and return
+    its manifest. An existing farm with the same parameters is reused unless `force`
+    """
+    root = os.path.abspath(root)
+    spec = dict(DEFAULTS, **spec)
+    manifest = load(root)
+    if manifest is not None and manifest["spec"] == spec and not force:
+        return manifest
+    if os.path.exists(root):
+        if manifest is None and os.listdir(root):
+            raise ValueError(f"{root} is not empty and is not a farm")
+        shutil.rmtree(root)
+    os.makedirs(os.path.join(root, "upstreams"))
+    rng = random.Random(spec["seed"])
+    make_seed(root, spec, rng)
+    repos = [make_repo(root, spec, rng, index) for index in range(spec["repos"])]
+    write_config(root, repos)
+    manifest = {"spec": spec, "root": root, "work": os.path.join(root, "work"),
+                "config": os.path.join(root, "config.yaml"), "repos": repos}
+    with open(os.path.join(root, "farm.json"), "w", encoding="utf-8") as out:
+        json.dump(manifest, out, indent=2)
+    return manifest
+
+def add_arguments(par):
+    """add one option per farm parameter to argument parser `par`"""
+    for name, default in DEFAULTS.items():
+        par.add_argument(f"--{name.replace('_', '-')}", type=int, default=default,
+                         help=f"Default={default}")
+
+def spec_from_args(args):
+    """return the farm parameters from parsed arguments"""
+    return {name: getattr(args, name) for name in DEFAULTS}
+
+def main():
+    """main function"""
+    par = argparse.ArgumentParser(description="Generate a synthetic git repo farm")
+    par.add_argument("root", help="Directory of the farm. Re-generated if parameters differ")
+    par.add_argument("--force", action="store_true", help="Re-generate the farm even if it exists")
+    add_arguments(par)
+    args = par.parse_args()
+    try:
+        manifest = generate(args.root, spec_from_args(args), args.force)
+    except (ValueError, subprocess.CalledProcessError) as exc:
+        sys.exit(f"ERROR: {exc}")
+    print(f"{len(manifest['repos'])} repos in {manifest['work']}, "
+          f"configuration in {manifest['config']}")
+
+if __name__ == "__main__":
+    main()
@@ -19,10 +19,9 @@ setup(
     platforms=['any'],
     packages=find_packages('src'),
     package_dir={'': 'src'},
-    python_requires='>=3.6',
+    python_requires='>=3.8',
     install_requires=[
         "appdirs",
-        "GitPython",
         "PySide6",
         "PyYAML",
     ],
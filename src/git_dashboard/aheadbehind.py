@@ -0,0 +1,96 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Memoized ahead/behind counts
+
+Counting the commits a branch is ahead of and behind its upstream walks the
+commit graph, which is the most expensive part of `git status` on long
+diverged branches of big histories. The counts only depend on the two commits
+compared, so they are memoized by (HEAD commit, upstream commit), and the graph
+is only walked again when either of them moves. The same pair of commits in
+two clones shares its entry.
+
+The memo is bounded (least recently used entries are evicted first) and can be
+persisted as a JSON file, oldest entries first:
+
+    {"pairs": [[head, upstream, ahead, behind], ...]}
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+from git_dashboard.config import AHEAD_BEHIND_CACHE
+from git_dashboard.persist import save_json
+
+# default maximum number of memoized pairs
+DEFAULT_SIZE = 4096
+
+class AheadBehindCache:
+    """LRU memo of (ahead, behind) counts by (HEAD commit, upstream commit)"""
+    def __init__(self, size=DEFAULT_SIZE, filename=None):
+        """constructor. If `filename` is given, the memo is loaded from and saved to it"""
+        self.size     = max(1, size)
+        self.filename = filename
+        self.lock     = threading.Lock()
+        # (head, upstream) -> (ahead, behind), least recently used first
+        self.pairs    = OrderedDict()
+        self.dirty    = False
+        self.hits     = 0
+        self.misses   = 0
+        if filename is not None:
+            try:
+                with open(filename, "r", encoding="utf-8") as inp:
+                    for head, upstream, ahead, behind in json.load(inp)["pairs"][-self.size:]:
+                        self.pairs[(head, upstream)] = (int(ahead), int(behind))
+            except (OSError, ValueError, KeyError, TypeError):
+                self.pairs = OrderedDict()
+
+    def get(self, head, upstream):
+        """return the memoized (ahead, behind) of `head` w.r.t `upstream`, or None"""
+        with self.lock:
+            counts = self.pairs.get((head, upstream))
+            if counts is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.pairs.move_to_end((head, upstream))
+            return counts
+
+    def put(self, head, upstream, counts):
+        """memoize the (ahead, behind) `counts` of `head` w.r.t `upstream`"""
+        with self.lock:
+            self.pairs[(head, upstream)] = counts
+            self.pairs.move_to_end((head, upstream))
+            while len(self.pairs) > self.size:
+                self.pairs.popitem(last=False)
+            self.dirty = True
+
+    def save(self):
+        """persist the memo if it changed"""
+        with self.lock:
+            if self.filename is None or not self.dirty:
+                return
+            pairs = [[head, upstream, ahead, behind]
+                     for (head, upstream), (ahead, behind) in self.pairs.items()]
+            self.dirty = False
+        save_json(self.filename, {"pairs": pairs})
+
+def create_memo(args):
+    """return the persisted memo configured by the command line arguments, or None if disabled"""
+    if args.ahead_behind_cache <= 0:
+        return None
+    return AheadBehindCache(args.ahead_behind_cache, AHEAD_BEHIND_CACHE)
@@ -0,0 +1,229 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+All repos Model and View classes
+
+The "all repos" tab is a single table of the repos of every group, filtered by
+text and by status. Filtering queries a StatusIndex (see index.py) instead of
+matching every row, and the model sorts the precomputed sort keys of the
+matching repos itself, instead of a QSortFilterProxyModel comparing rows
+through `data()`. The view is a table, which only queries the visible rows, so
+that filtering thousands of repos stays interactive.
+"""
+
+from PySide6 import QtCore, QtWidgets
+from PySide6.QtCore import Qt, Signal
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QApplication
+
+from git_dashboard.group import (
+    SORT_ROLE,
+    render,
+    tooltips,
+)
+from git_dashboard.index import (
+    BUCKETS,
+    StatusIndex,
+)
+
+def render_row(repo):
+    """return {role: (value of each column)} for a repo, including its path"""
+    path = {Qt.DisplayRole: repo.path, SORT_ROLE: repo.path}
+    return {role: values + (path.get(role),) for role, values in render(repo).items()}
+
+class AllReposModel(QtCore.QAbstractTableModel): # pylint: disable=too-many-instance-attributes
+    """Model of the repos of a StatusIndex matching a filter"""
+    def __init__(self, status_index):
+        """constructor"""
+        super().__init__()
+        self.header       = ["name", "branch", "status", "path"]
+        self.status_index = status_index
+        self.rows         = {}   # path -> (RepoStatus, rendering)
+        self.paths        = []   # displayed paths
+        self.positions    = {}   # displayed path -> row
+        self.text         = ""
+        self.selected     = ()
+        self.sorting      = (-1, Qt.AscendingOrder)
+
+    def update(self, changed):
+        """render the repos at the `changed` paths (see StatusIndex.update) and refresh the view"""
+        for path in changed:
+            repo = self.status_index.repos.get(path)
+            old  = self.rows.get(path)
+            if repo is None:
+                del self.rows[path]
+            elif old is not None and old[0] == repo and old[0].stale == repo.stale:
+                # same status, only its profile may have changed
+                old[1][Qt.ToolTipRole] = tooltips(repo) + (None,)
+                self.rows[path] = (repo, old[1])
+            else:
+                self.rows[path] = (repo, render_row(repo))
+        paths = self.query()
+        if paths != self.paths:
+            self.show(paths)
+            return
+        rows = sorted(self.positions[path] for path in changed if path in self.positions)
+        if rows:
+            self.dataChanged.emit(self.index(rows[0], 0),  # pylint: disable=no-member
+                                  self.index(rows[-1], self.columnCount() - 1))
+
+    def query(self) -> list:
+        """return the paths matching the filter, sorted"""
+        paths = self.status_index.query(self.text, self.selected)
+        column, order = self.sorting
+        if column < 0:
+            return paths
+        return sorted(paths, key=lambda path: self.rows[path][1][SORT_ROLE][column],
+                      reverse=order == Qt.DescendingOrder)
+
+    def set_filter(self, text, selected):
+        """display the repos in any of the `selected` buckets matching every word of `text`"""
+        self.text, self.selected = text, tuple(selected)
+        self.show(self.query())
+
+    def show(self, paths):
+        """display `paths`"""
+        self.beginResetModel()
+        self.paths     = paths
+        self.positions = {path: row for row, path in enumerate(paths)}
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """sort the displayed repos by `column`"""
+        self.sorting = (column, order)
+        self.show(self.query())
+
+    def data(self, index, role):
+        """access model data"""
+        if not index.isValid():
+            return None
+        values = self.rows[self.paths[index.row()]][1].get(role)
+        return None if values is None else values[index.column()]
+
+    def rowCount(self, parent=QtCore.QModelIndex()): # pylint: disable=invalid-name
+        """number of displayed repos"""
+        return 0 if parent.isValid() else len(self.paths)
+
+    def columnCount(self, parent=QtCore.QModelIndex()): # pylint: disable=unused-argument,invalid-name
+        """number of columns"""
+        return len(self.header)
+
+    def headerData(self, col, orientation, role): # pylint: disable=invalid-name
+        """table header"""
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.header[col]
+        return None
+
+class AllReposView(QtWidgets.QWidget):
+    """View of the repos of every group, below a text filter and a toggle button per bucket"""
+    shown = Signal()   # the repos in view changed, e.g. scrolled, filtered or sorted
+
+    def __init__(self, groups, args):
+        """constructor"""
+        super().__init__()
+        self.status_index = StatusIndex()
+        self.model        = AllReposModel(self.status_index)
+        self.current      = None   # path of the current repo, kept across resets of the model
+
+        # filter bar
+        self.text = QtWidgets.QLineEdit()
+        self.text.setPlaceholderText("filter by name, branch or path")
+        self.text.setClearButtonEnabled(True)
+        self.text.textChanged.connect(self.filter)  # pylint: disable=no-member
+        self.count = QtWidgets.QLabel()
+        hlayout = QtWidgets.QHBoxLayout()
+        hlayout.addWidget(self.text)
+        self.buttons = {}
+        for bucket in BUCKETS:
+            button = QtWidgets.QToolButton()
+            button.setCheckable(True)
+            button.toggled.connect(self.filter)  # pylint: disable=no-member
+            hlayout.addWidget(button)
+            self.buttons[bucket] = button
+        hlayout.addWidget(self.count)
+
+        # table with fixed row heights and no column sized to its contents, which queries every row
+        self.table = QtWidgets.QTableView()
+        self.table.setFont(QFont("Arial", int(QApplication.font().pointSize() * args.font_scale)))
+        self.table.setModel(self.model)
+        self.table.setSortingEnabled(True)
+        self.table.setAlternatingRowColors(True)
+        self.table.setShowGrid(False)
+        self.table.setWordWrap(False)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table.verticalHeader().hide()
+        self.table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(self.table.fontMetrics().height() + 4)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.model.modelAboutToBeReset.connect(self.remember_current)  # pylint: disable=no-member
+        self.model.modelReset.connect(self.restore_current)  # pylint: disable=no-member
+        self.model.modelReset.connect(self.layout_rows)  # pylint: disable=no-member
+        # the range changes with the number of rows, and with the height of the table
+        scrollbar = self.table.verticalScrollBar()
+        scrollbar.valueChanged.connect(self.shown)  # pylint: disable=no-member
+        scrollbar.rangeChanged.connect(self.shown)  # pylint: disable=no-member
+
+        vlayout = QtWidgets.QVBoxLayout()
+        vlayout.setContentsMargins(0, 0, 0, 0)
+        vlayout.addLayout(hlayout)
+        vlayout.addWidget(self.table)
+        self.setLayout(vlayout)
+        self.refresh(groups)
+
+    def refresh(self, groups):
+        """update the index and the displayed repos with `groups` ({name: [RepoStatus]})"""
+        self.model.update(self.status_index.update(groups))
+        self.update_counts()
+
+    def filter(self):
+        """apply the filter bar"""
+        self.model.set_filter(self.text.text(), [bucket for bucket, button in self.buttons.items()
+                                                 if button.isChecked()])
+        self.update_counts()
+
+    def update_counts(self):
+        """show the number of repos in each bucket, and the number displayed"""
+        for bucket, button in self.buttons.items():
+            button.setText(f"{bucket} ({len(self.status_index.buckets[bucket])})")
+        self.count.setText(f"{len(self.model.paths)} of {len(self.status_index)} repos")
+
+    def layout_rows(self):
+        """lay out the rows of the reset model now instead of later, and signal the repos in view"""
+        self.table.doItemsLayout()
+        self.shown.emit()
+
+    def shown_paths(self) -> list:
+        """return the paths of the repos in view"""
+        first = self.table.rowAt(0)
+        if first < 0:
+            return []
+        last = self.table.rowAt(self.table.viewport().height() - 1)
+        if last < 0:
+            last = len(self.model.paths) - 1
+        return self.model.paths[first:last + 1]
+
+    def remember_current(self):
+        """remember the current repo before the model is reset"""
+        current = self.table.currentIndex()
+        self.current = self.model.paths[current.row()] if current.isValid() else None
+
+    def restore_current(self):
+        """make the remembered repo current again, if still displayed"""
+        row = self.model.positions.get(self.current)
+        if row is not None:
+            index = self.model.index(row, 0)
+            self.table.setCurrentIndex(index)
+            self.table.scrollTo(index)
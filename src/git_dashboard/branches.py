@@ -0,0 +1,77 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+All local branches of a repo
+
+Every local branch, with its upstream, commits ahead/behind it and the date of
+its last commit, is obtained from a single git process, however many branches
+there are:
+
+    git for-each-ref --format=<FORMAT> refs/heads
+
+which prints one line per branch, with NUL separated fields:
+
+    <*> <refname> <upstream> <track> <committer date>
+
+where `*` marks the current branch and <track> is empty when the branch is in
+sync with its upstream, "ahead N, behind M" (either part may be missing), or
+"gone" when the upstream no longer exists. Branches are returned as dicts:
+
+    {name, current, upstream, ahead, behind, gone, date}
+
+where `upstream`, `ahead` and `behind` are None for branches without upstream,
+and `date` is a unix timestamp.
+"""
+
+import re
+
+from git_dashboard.status import run_git
+
+FORMAT = ("%(HEAD)%00%(refname)%00%(upstream:short)%00%(upstream:track,nobracket)"
+          "%00%(committerdate:unix)")
+TRACK  = re.compile(r"^(?:ahead (\d+))?(?:, )?(?:behind (\d+))?$")
+
+def parse_branch(line) -> dict:
+    """parse a line of `git for-each-ref --format=<FORMAT>`"""
+    head, refname, upstream, track, date = line.split("\0")
+    branch = {
+        "name": refname[len("refs/heads/"):], "current": head == "*", "upstream": upstream or None,
+        "ahead": None, "behind": None, "gone": track == "gone", "date": int(date or 0),
+    }
+    match = TRACK.match(track)
+    if upstream and match:
+        branch["ahead"], branch["behind"] = int(match.group(1) or 0), int(match.group(2) or 0)
+    return branch
+
+def parse_branches(stream) -> list:
+    """parse the output of `git for-each-ref --format=<FORMAT>` into a list of branches"""
+    lines = stream.read().decode("utf-8", "surrogateescape").splitlines()
+    return [parse_branch(line) for line in lines if line]
+
+def git_branches(path, timeout=None, processes=None, profile=None) -> list:
+    """
+    return every local branch of the git repo at `path`, using a single git process.
+    See status.run_git for `timeout` and `processes`. Time spent is recorded in `profile`
+    as the "branches" step (see timing.py)
+
+    :raises GitStatusError: git returned an error, timed out or was cancelled
+    """
+    branches = run_git(path, ["for-each-ref", f"--format={FORMAT}", "refs/heads"], parse_branches,
+                       timeout, processes)
+    if profile is not None:
+        profile.spawned()
+        profile.step("branches")
+    return branches
@@ -0,0 +1,205 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Command line interface
+
+Prints the status of every repo in JSON format, either all at once, or one
+record per repo (NDJSON) as soon as it is analyzed. Qt is never imported, so
+that the command line starts fast, e.g. when called from a shell prompt.
+Warnings go to stderr, so that stdout can be parsed or piped, e.g. to `head`.
+
+With `--profile`, the JSON document becomes {"groups": {...}, "profile": {...}},
+and a {"profile": {...}} record follows the records of each NDJSON cycle, where
+"profile" summarizes the refresh cycle (see cycle_summary).
+"""
+
+import os
+import sys
+import time
+import json
+
+from git_dashboard.config import (
+    DISCOVERY_CACHE,
+    Configuration,
+)
+from git_dashboard.engine import create_engine
+from git_dashboard.options import GitOptions
+from git_dashboard.discovery import DiscoveryCache
+from git_dashboard.watcher import create_watcher
+from git_dashboard.fetch import FetchScheduler
+from git_dashboard import client
+
+def close_stdout():
+    """
+    stop writing to stdout after its reader exited (e.g. piped to `head`), so that
+    Python doesn't report the broken pipe again when flushing stdout at exit
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    os.close(devnull)
+
+def cycle_summary(seconds, spawns, results) -> dict:
+    """return the summary of a refresh cycle, listing the slowest repos first"""
+    profiled = sorted((result for result in results if result.profile is not None),
+                      key=lambda result: result.profile.total, reverse=True)
+    summary  = {
+        "seconds": round(seconds, 6), "repos": len(results), "spawns": spawns,
+        "slowest": [{"path": result.path, "seconds": round(result.profile.total, 6)}
+                    for result in profiled[:10]],
+        # repos that would benefit from git options (see options.py)
+        "advice":  {result.path: result.profile.advice for result in profiled
+                    if result.profile.advice},
+    }
+    return summary
+
+def print_groups(groups, profile=False, summary=None):
+    """
+    print the repos of every group as a JSON document. With `profile`, records include
+    their profile, and the document the `summary` of the refresh cycle, if known
+    """
+    groups = {name: [repo.to_dict(profile) for repo in group] for name, group in groups.items()}
+    print(json.dumps({"groups": groups, "profile": summary} if profile else groups, indent=2))
+
+class RecordPrinter:
+    """
+    Print one JSON record per line (NDJSON) for every repo:
+        {name, branch, status, path, groups[, profile]}
+    Only records that changed since they were last printed are printed.
+    """
+    def __init__(self, profile=False):
+        """constructor. If `profile`, records include the profile of the analysis"""
+        self.profile = profile
+        self.groups  = {}  # repo path -> names of the groups it belongs to
+        self.printed = {}  # repo path -> last printed record
+
+    def update(self, paths):
+        """set the groups of each repo from expanded groups, and return all repo paths"""
+        groups = {}
+        for name, group in paths.items():
+            for path in group:
+                groups.setdefault(path, []).append(name)
+        # repos that are no longer tracked
+        for path in set(self.printed) - set(groups):
+            del self.printed[path]
+            self.write({"path": path, "removed": True})
+        self.groups = groups
+        return list(groups)
+
+    def print(self, path, result):
+        """print the record of a repo if it changed"""
+        record = dict(result.to_dict(), groups=self.groups.get(path, []))
+        if self.printed.get(path) != record:
+            self.printed[path] = record
+            if self.profile:
+                record = dict(record, profile=result.to_dict(profile=True)["profile"])
+            self.write(record)
+
+    @staticmethod
+    def write(record):
+        """write a single record"""
+        print(json.dumps(record), flush=True)
+
+def stream_cycle(args, engine, printer, paths, options):
+    """analyze and print every repo in `paths` with their git `options`, as soon as each is done"""
+    start, spawned, results = time.monotonic(), engine.spawned, []
+    for path, result in engine.stream(paths, options):
+        printer.print(path, result)
+        results.append(result)
+    if args.profile:
+        printer.write({"profile": cycle_summary(time.monotonic() - start,
+                                                engine.spawned - spawned, results)})
+
+def stream_mode(args, config, engine):
+    """
+    print repo status in NDJSON format as soon as each repo is analyzed. With
+    `--watch`, keep running and print the records that change afterwards, including
+    after background fetches (see fetch.py)
+    """
+    printer = RecordPrinter(args.profile)
+    paths   = printer.update(config.expand(initial=True))
+    stream_cycle(args, engine, printer, paths, config.options)
+    if not args.watch:
+        return
+
+    watcher = create_watcher()
+    fetcher = (FetchScheduler(args.fetch_interval, args.fetch_jobs)
+               if args.fetch_interval > 0 else None)
+    try:
+        while True:
+            watcher.update(paths)
+            if fetcher is not None:
+                fetcher.update(paths)
+            # wait for `refresh` seconds, re-analyzing repos as they change
+            deadline = time.monotonic() + args.refresh
+            while time.monotonic() < deadline:
+                changed = watcher.wait(min(1, deadline - time.monotonic()))
+                if fetcher is not None:
+                    changed |= fetcher.poll()
+                changed = sorted(changed)
+                for path, result in zip(changed, engine.refresh(changed, config.options)):
+                    printer.print(path, result)
+            paths = printer.update(config.expand())
+            stream_cycle(args, engine, printer, paths, config.options)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        if fetcher is not None:
+            fetcher.shutdown()
+
+def attach_mode(args):
+    """print the repo status served by the daemon, in the same formats as cmdline_mode"""
+    try:
+        if args.format == "json" and not args.watch:
+            # the daemon doesn't report its refresh cycles
+            print_groups(client.snapshot(args.socket), args.profile)
+            return
+        printer = RecordPrinter(args.profile)
+        for message in client.messages(args.socket, "subscribe" if args.watch else "snapshot"):
+            if message["type"] != "groups":
+                continue
+            groups = client.groups_from(message)
+            printer.update({name: [repo.path for repo in group] for name, group in groups.items()})
+            for repo in {repo.path: repo for group in groups.values() for repo in group}.values():
+                printer.print(repo.path, repo)
+    except BrokenPipeError:
+        close_stdout()
+    except OSError as exc:
+        sys.exit(f"ERROR: Can't attach to daemon at {args.socket}: {exc}")
+    except KeyboardInterrupt:
+        pass
+
+def cmdline_mode(args):
+    """command line mode"""
+    engine = create_engine(args)
+    config = Configuration(args.config, DiscoveryCache(DISCOVERY_CACHE),
+                           GitOptions(branches=args.branches))
+    try:
+        if args.format == "ndjson" or args.watch:
+            stream_mode(args, config, engine)
+        else:
+            start   = time.monotonic()
+            groups  = config.analyze(initial=True, engine=engine)
+            summary = None
+            if args.profile:
+                results = list({repo.path: repo for group in groups.values()
+                                for repo in group}.values())
+                summary = cycle_summary(time.monotonic() - start, engine.spawned, results)
+            print_groups(groups, args.profile, summary)
+    except BrokenPipeError:
+        close_stdout()
+    finally:
+        engine.shutdown()
@@ -0,0 +1,77 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Daemon client
+
+Plain socket client of the daemon (see daemon.py), and encoding of the
+messages exchanged with it. Qt is not needed to talk to the daemon, so that
+command line clients start fast.
+"""
+
+import json
+import socket
+
+from git_dashboard.status import RepoStatus
+
+def encode(message) -> bytes:
+    """return a message as a line of JSON"""
+    return json.dumps(message).encode("utf-8") + b"\n"
+
+def groups_message(groups) -> bytes:
+    """return the snapshot message of `groups` of RepoStatus"""
+    return encode({
+        "type":   "groups",
+        "groups": {name: [repo.to_dict(profile=True) for repo in group]
+                   for name, group in groups.items()},
+    })
+
+def groups_from(message):
+    """return the groups of RepoStatus of a snapshot message"""
+    return {name: [RepoStatus.from_dict(record) for record in group]
+            for name, group in message["groups"].items()}
+
+def messages(path, command):
+    """
+    generator of the messages sent by the daemon listening at `path` in reply to `command`
+
+    :raises OSError: no daemon is listening at `path`
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(encode({"command": command}))
+        with sock.makefile("rb") as inp:
+            for line in inp:
+                yield json.loads(line)
+
+def snapshot(path):
+    """
+    return the latest groups of RepoStatus analyzed by the daemon listening at `path`
+
+    :raises OSError: no daemon is listening at `path`
+    """
+    for message in messages(path, "snapshot"):
+        if message["type"] == "groups":
+            return groups_from(message)
+    raise ConnectionError(f"{path}: no snapshot received")
+
+def is_running(path) -> bool:
+    """return True if a daemon is listening at `path`"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+            return True
+        except OSError:
+            return False
@@ -18,32 +18,57 @@ Configuration functionality
 
 Configuration is stored as a YAML file with the following format:
 
+    group1:
+      - /path/to/repo                 # a git repo
+      - /path/to/dir                  # all git repos directly below dir
+      - "!/path/to/dir/repo"          # exclude a repo
+      - "!/path/to/dir/archive-*"     # exclude repos matching a glob pattern
+      - "!/path/to/dir/old/"          # exclude repos below a prefix
+    group2:
+      - ...
+
+A group can also opt into faster git invocations (see options.py), for all its
+repos or for a single entry:
+
+    group3:
+      git:
+        untracked-files: normal
+      repos:
+        - /path/to/dir
+        - path: /path/to/huge/repo
+          git:
+            fsmonitor: true
 """
 
 import os
 import re
-import copy
+import sys
+import fnmatch
+import hashlib
 
 from appdirs import user_config_dir
-import yaml
-from git import (
-    Repo,
-    InvalidGitRepositoryError,
-    NoSuchPathError,
-    GitCommandError,
-    BadName,
-)
-from git.compat import (
-    defenc
-)
-from git.util import (
-    finalize_process
-)
 
 import git_dashboard
+from git_dashboard.scanner import scan, list_directory, is_git_entry
+from git_dashboard.status import (
+    RepoStatus,
+    git_status,
+    NotAGitRepoError,
+    GitStatusError,
+    GitTimeoutError,
+    GitCancelledError,
+)
+from git_dashboard.branches import git_branches
+from git_dashboard.timing import Profile
+from git_dashboard.options import GitOptions, DEFAULT
 
 CONFIG_DIR = user_config_dir(git_dashboard.__name__, git_dashboard.__author__)
 CONFIG = os.path.join(CONFIG_DIR, "config.yaml")
+DISCOVERY_CACHE = os.path.join(CONFIG_DIR, "discovery.json")
+SNAPSHOT = os.path.join(CONFIG_DIR, "snapshot.json")
+AHEAD_BEHIND_CACHE = os.path.join(CONFIG_DIR, "ahead-behind.json")
+# socket of the daemon, preferably in the per-user runtime directory
+SOCKET = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or CONFIG_DIR, "git-dashboard.sock")
 
 def find_git_repos_from_path(dirname, depth=0, maxdepth=-1):
     """
@@ -52,26 +77,29 @@ def find_git_repos_from_path(dirname, depth=0, maxdepth=-1):
     # avoid symlinks
     if os.path.islink(dirname):
         return []
-    try:
-        results = []
-        dirpath, dirnames, _ = next(os.walk(dirname))
-        if ".git" in dirnames:
-            return [dirpath]
-        if depth != maxdepth:
-            for name in dirnames:
-                absname = os.path.join(dirname, name)
-                results += find_git_repos_from_path(absname, depth+1, maxdepth)
-        return results
-    except StopIteration:
-        # skip directories where we don't have permission
-        return []
+    # directories where we don't have permission are listed as empty
+    is_repo, subdirs = list_directory(dirname, ())
+    if is_repo:
+        return [dirname]
+    results = []
+    if depth != maxdepth:
+        for subdir in subdirs:
+            results += find_git_repos_from_path(subdir, depth+1, maxdepth)
+    return results
 
-def create_default_configuration(root, group='home', config=CONFIG):
-    """scan for git repos starting from root"""
-    print(f"Scanning git repos from '{root}': ", end='')
-    repos = {group: find_git_repos_from_path(root)}
-    print(f"found {len(repos['home'])} git repos")
+def create_default_configuration(root, group='home', config=CONFIG, prune=None, maxdepth=-1):
+    """
+    scan for git repos starting from root.
+    See scanner.scan for the meaning of `prune` and `maxdepth`
+    """
+    def progress(scanned, found):
+        if scanned % 100 == 0:
+            print(f"\rScanning git repos from '{root}': {scanned} directories, {found} git repos",
+                  end='')
+    repos = {group: sorted(scan(root, prune, maxdepth, progress=progress))}
+    print(f"\rScanning git repos from '{root}': found {len(repos[group])} git repos" + " " * 20)
     os.makedirs(os.path.dirname(config), exist_ok=True)
+    import yaml # pylint: disable=import-outside-toplevel
     with open(config, "w", encoding="utf-8") as cfg:
         yaml.dump(repos, cfg)
 
@@ -79,113 +107,236 @@ def short_sha(sha):
     """return a shorter sha signature"""
     return str(sha)[0:8]
 
-def count_untracked_files(repo) -> int:
+def analyze(path, timeout=None, processes=None, options=DEFAULT, memo=None) -> RepoStatus:
     """
-    return number of untracked files in repo
+    given a path to a git repository, return its RepoStatus, profiled (see timing.py).
+    git is killed after `timeout` seconds, or when `processes` is cancelled (see
+    status.GitProcesses).
+    git is run with `options` (see options.py), and the profile advises options that would help.
+    Ahead/behind counts are memoized in `memo` if given (see aheadbehind.py)
+    """
+    profile = Profile()
+    try:
+        info = git_status(path, timeout, processes, profile, options, memo)
+        if options.branches:
+            info["branches"] = git_branches(path, timeout, processes, profile)
+        result = status_from(path, info, options)
+    except NotAGitRepoError:
+        result = RepoStatus(path, error="not a git repo")
+    except GitTimeoutError:
+        result = RepoStatus(path, error="timeout")
+    except GitCancelledError:
+        result = RepoStatus(path, error="cancelled")
+    except GitStatusError:
+        result = RepoStatus(path, error="error")
+    profile.step("parse")
+    result.profile = profile
+    profile.advice = options.advise(result)
+    return result
 
-    :note: equivalent to `return len(repo.untracked_files)` but that operation is too expensive
-    if all we want is the number of untracked files.
+def status_from(path, info, options=DEFAULT) -> RepoStatus:
     """
-    proc = repo.git.status(porcelain=True, untracked_files=True, as_process=True)
-    # Untracked files preffix in porcelain mode
-    prefix = "?? "
-    untracked_files = 0
-    for line in proc.stdout:
-        line = line.decode(defenc)
-        if line.startswith(prefix):
-            untracked_files += 1
-    finalize_process(proc)
-    return untracked_files
+    return the RepoStatus of the repo at `path` from the output of status.git_status
+    run with `options`. Untracked files are None when they were not counted
+    """
+    # determine branch
+    if info["detached"]:
+        branch = f"detached:{short_sha(info['oid'])}"
+    else:
+        branch = info["branch"]
+
+    result = RepoStatus(
+        path,
+        branch    = branch,
+        dirty     = bool(info["modified"] or info["staged"]),
+        ahead     = info["ahead"],
+        behind    = info["behind"],
+        untracked = None if options.untracked_files == "no" else info["untracked"],
+        staged    = info["staged"],
+    )
+    result.branches = info.get("branches")
+    return result
 
-def analyze(path):
+def expand_directory(dirname):
     """
-    given a path to a git repository, return:
-    {name: name, branch: branch, status: status, path: path}
+    return the git repos found in `dirname`: either `dirname` itself or the repos
+    one level below it. Return None if `dirname` is not a valid directory.
     """
-    name = os.path.basename(path)
     try:
-        repo = Repo(path)
-        head = repo.head
-        # determine branch
-        if head.is_detached:
-            branch = f"detached:{short_sha(head.commit)}"
-        else:
-            branch = head.reference.name
+        with os.scandir(dirname) as entries:
+            is_repo = any(is_git_entry(entry) for entry in entries)
+    except OSError:
+        return None
+    if not is_repo:
+        return find_git_repos_from_path(dirname, 0, 1)
+    return [dirname]
 
-        status = []
-        # check for modified files
-        if repo.is_dirty():
-            status.append("dirty")
-        else:
-            status.append("clean")
+class Exclusions:
+    """
+    Index of the "!" entries of a group. An entry can be:
+    - an exact repo path:             "!/home/john/nasa/proj2"
+    - a prefix, with a trailing "/":  "!/home/john/nasa/archive/" (also excludes archive itself)
+    - a glob pattern (fnmatch):       "!/home/john/nasa/*-old"
+    """
+    def __init__(self, patterns):
+        """constructor"""
+        self.exact    = set()
+        self.prefixes = set()
+        globs = []
+        for pattern in patterns:
+            if any(char in pattern for char in "*?["):
+                globs.append(fnmatch.translate(pattern))
+            elif pattern.endswith("/"):
+                self.prefixes.add(pattern.rstrip("/"))
+            else:
+                self.exact.add(pattern)
+        # all glob patterns are matched at once
+        self.globs = re.compile("|".join(globs)) if globs else None
 
-        # check for ahead/behind w.r.t to upstream ref
-        try:
-            cmd = "git rev-parse --abbrev-ref --symbolic-full-name @{u}"
-            upstream = repo.git.execute(cmd, shell=True)
+    def __contains__(self, path):
+        """return True if `path` is excluded"""
+        if path in self.exact:
+            return True
+        if self.prefixes:
+            parent = path
+            while parent not in self.prefixes:
+                if parent == os.path.dirname(parent):
+                    break
+                parent = os.path.dirname(parent)
+            else:
+                return True
+        return self.globs is not None and self.globs.match(path) is not None
+
+    def __bool__(self):
+        """return True if there is at least one exclusion"""
+        return bool(self.exact or self.prefixes or self.globs)
+
+def git_options(group, section, base):
+    """
+    return the git options of a configuration `section` on top of `base`. Warn and
+    return `base` if invalid
+    """
+    if section is None:
+        return base
+    try:
+        return GitOptions.from_config(section, base)
+    except ValueError as error:
+        print(f"WARNING: Invalid git options in group '{group}': {error}. Ignoring them",
+              file=sys.stderr)
+        return base
 
-            cmd = f"git rev-list --left-right --count HEAD...{upstream}"
-            ahead, behind = [int(x) for x in repo.git.execute(cmd, shell=True).split()]
+class Configuration:
+    """
+    Compiled configuration. The YAML file is only parsed again when its content
+    changes, and each group is compiled into the list of directories to expand
+    and an index of exclusions.
+    """
+    def __init__(self, filename=CONFIG, discovery=None, options=DEFAULT):
+        """
+        constructor.
+        If `discovery` is given (see discovery.py), directory listings are cached.
+        Groups and entries without git section are analyzed with `options` (see options.py).
+        """
+        self.filename  = filename
+        self.discovery = discovery
+        self.base      = options
+        self.stat      = None
+        self.digest    = None
+        self.groups    = {}   # group name -> ([(directory, GitOptions)], Exclusions)
+        self.options   = {}   # repo path -> GitOptions, of the last expansion
 
-            status += [f"-{behind}", f"+{ahead}"]
-        except GitCommandError:
-            pass
+    def reload(self) -> bool:
+        """parse the configuration file again if it changed. Return True if it did"""
+        info = os.stat(self.filename)
+        stat = (info.st_mtime_ns, info.st_size)
+        if stat == self.stat:
+            return False
+        self.stat = stat
+        with open(self.filename, "rb") as cfg:
+            content = cfg.read()
+        digest = hashlib.sha1(content).hexdigest()
+        if digest == self.digest:
+            return False
+        self.digest = digest
+        self.groups = {}
+        # yaml is slow to import, and not needed by clients of the daemon
+        import yaml # pylint: disable=import-outside-toplevel
+        for name, group in (yaml.safe_load(content) or {}).items():
+            base = self.base
+            if isinstance(group, dict):
+                base  = git_options(name, group.get("git"), base)
+                group = group.get("repos")
+            dirnames, excludes = [], []
+            for entry in group or []:
+                if isinstance(entry, dict):
+                    options = git_options(name, entry.get("git"), base)
+                    dirnames.append((str(entry.get("path")), options))
+                elif str(entry).startswith("!"):
+                    excludes.append(str(entry)[1:])
+                else:
+                    dirnames.append((str(entry), base))
+            self.groups[name] = (dirnames, Exclusions(excludes))
+        return True
 
-        # count untracked files
-        status.append(f"u{count_untracked_files(repo)}")
+    def expand(self, initial:bool = False):
+        """
+        Expand each group into a list of git repo paths.
+        Directories that contain other git repos are expanded one level deep.
+        If `initial` is True, display warnings if some repos are not valid.
+        """
+        self.reload()
+        expand = expand_directory if self.discovery is None else self.discovery.expand
+        if self.discovery is not None:
+            self.discovery.begin_pass()
+        results = {}
+        options = {}
+        for name, (dirnames, excludes) in self.groups.items():
+            results[name] = []
+            for dirname, git in dirnames:
+                repos = expand(dirname)
+                if repos is None:
+                    # dirname is not valid, warn about it for the first time
+                    if initial:
+                        print(f"WARNING: Directory {dirname} is not valid. Ignoring directory",
+                              file=sys.stderr)
+                    continue
+                for repo in repos:
+                    if excludes and repo in excludes:
+                        if initial:
+                            print(f"WARNING: Excluding directory '{repo}'", file=sys.stderr)
+                    else:
+                        results[name].append(repo)
+                        # a repo listed in several groups keeps its first options
+                        options.setdefault(repo, git)
+        if self.discovery is not None:
+            self.discovery.end_pass()
+        # replaced, not updated: it may be read concurrently by the refresh thread
+        self.options = options
+        return results
 
-        # count staged files
-        try:
-            status.append(f"s{len(repo.index.diff('HEAD'))}")
-        except BadName:
-            # can't resolve HEAD, assume 0 staged files
-            status.append(f"s0")
+    def analyze(self, initial:bool = False, engine=None):
+        """
+        Expand and analyze every group.
+        If `engine` is given (see engine.py), repos are analyzed concurrently through it.
+        """
+        paths = self.expand(initial)
 
-        joined_status = "/".join(status)
+        # analyze every distinct git repo once, across all groups
+        unique = list(dict.fromkeys(path for group in paths.values() for path in group))
+        if engine is None:
+            analyzed = [analyze(path, options=self.options.get(path, DEFAULT)) for path in unique]
+        else:
+            analyzed = engine.analyze(unique, self.options)
+        status = dict(zip(unique, analyzed))
 
-        # simplify the clean case
-        if joined_status in ["clean/-0/+0/u0/s0", "clean/u0/s0"]:
-            joined_status = "clean"
-        return {"name": name, "branch": branch, "status": joined_status, "path": path}
-    except (InvalidGitRepositoryError, NoSuchPathError):
-        return {"name": name, "branch": "n/a", "status": "not a git repo", "path": path}
+        # results are returned per group, in configuration order
+        return {name: [status[path] for path in group] for name, group in paths.items()}
 
-def load_configuration(config=CONFIG, initial:bool = False):
+def load_configuration(config=CONFIG, initial:bool = False, engine=None, discovery=None):
     """
     Load configuration in YAML format.
     If `initial` is True, display warnings if some repos are not valid.
+    If `engine` is given (see engine.py), repos are analyzed concurrently through it.
+    If `discovery` is given (see discovery.py), directory listings are cached.
     """
-    with open(config, "r", encoding="utf-8") as cfg:
-        groups = yaml.safe_load(cfg)
-
-    # iterate through each group and do:
-    # 1. expand paths that contain other git repos
-    # 2. analyze git repos
-    results  = {}
-    excludes = set()
-    for name, group in groups.items():
-        # expand directories that contain other git repos
-        results[name] = []
-        for dirname in group:
-            if re.match(r"^!", dirname):
-                excludes.add(re.sub(r"^!", "", dirname))
-                continue
-            try:
-                _, dirnames, _ = next(os.walk(dirname))
-                if ".git" not in dirnames:
-                    for sub_repo in find_git_repos_from_path(dirname, 0, 1):
-                        results[name].append(analyze(sub_repo))
-                else:
-                    results[name].append(analyze(dirname))
-            except StopIteration:
-                # dirname is not valid, warn about it for the first time
-                if initial:
-                    print(f"WARNING: Directory {dirname} is not valid. Ignoring directory")
-
-        # process exclusions
-        for repo in copy.copy(results[name]):
-            if repo["path"] in excludes:
-                results[name].remove(repo)
-                if initial:
-                    print(f"WARNING: Excluding directory '{repo['path']}'")
-    return results
+    return Configuration(config, discovery).analyze(initial, engine)
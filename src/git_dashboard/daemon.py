@@ -0,0 +1,228 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Shared status daemon
+
+A headless process owns the refresh loop and serves the latest snapshot to any
+number of clients over a local (Unix domain) socket, so that the GUI, command
+line invocations and shell status lines don't each analyze the same repos.
+
+Messages are JSON objects, one per line. Clients send commands:
+
+    {"command": "snapshot"}     reply with the latest snapshot and disconnect
+    {"command": "subscribe"}    reply with the latest snapshot, then push every change
+    {"command": "refresh"}      start a full refresh now
+
+and the daemon sends:
+
+    {"type": "groups", "groups": {name: [record, ...]}}              see RepoStatus.to_dict
+    {"type": "cycle", "seconds": <float>, "spawns": <int>}           end of a full refresh cycle
+    {"type": "tick", "elapsed": <int>, "repos": <int>, "refresh": <int>}    every second
+"""
+
+import os
+import sys
+import json
+import signal
+
+from PySide6.QtCore import (
+    Signal,
+    QObject,
+    QCoreApplication,
+)
+from PySide6.QtNetwork import (
+    QLocalServer,
+    QLocalSocket,
+)
+
+from git_dashboard.client import (
+    encode,
+    groups_message,
+    groups_from,
+    is_running,
+)
+from git_dashboard.refresh import create_refresh_thread
+
+class StatusServer(QLocalServer):
+    """Serve the results of a RefreshThread (see refresh.py) to local clients"""
+    def __init__(self, refresh_thread):
+        """constructor"""
+        super().__init__()
+        self.refresh_thread = refresh_thread
+        self.groups   = None   # latest groups of RepoStatus, None until the first refresh cycle
+        self.snapshot = None   # latest snapshot message
+        self.waiting  = []     # sockets waiting for the first snapshot, to be disconnected after it
+        self.clients  = set()  # subscribed sockets
+        self.setSocketOptions(QLocalServer.UserAccessOption)
+        self.newConnection.connect(self.accept)  # pylint: disable=no-member
+        refresh_thread.ready.connect(self.publish_groups)
+        refresh_thread.cycle.connect(self.publish_cycle)
+        refresh_thread.tick.connect(self.publish_tick)
+
+    def start(self, path) -> bool:
+        """listen at `path`. Return False if another daemon is already listening there"""
+        if is_running(path):
+            return False
+        # remove the socket left over by a daemon that didn't exit cleanly
+        QLocalServer.removeServer(path)
+        return self.listen(path)
+
+    def accept(self):
+        """accept new connections"""
+        while self.hasPendingConnections():
+            sock = self.nextPendingConnection()
+            sock.readyRead.connect(lambda sock=sock: self.serve(sock))
+            sock.disconnected.connect(lambda sock=sock: self.drop(sock))
+
+    def serve(self, sock):
+        """execute the commands sent by a client"""
+        while sock.canReadLine():
+            try:
+                command = json.loads(bytes(sock.readLine()))["command"]
+            except (ValueError, KeyError, TypeError):
+                command = None
+            if command == "subscribe":
+                # subscribers get the first snapshot when it is published
+                self.clients.add(sock)
+                if self.snapshot is not None:
+                    sock.write(self.snapshot)
+            elif command == "snapshot":
+                if self.snapshot is None:
+                    self.waiting.append(sock)
+                else:
+                    self.reply(sock)
+            elif command == "refresh":
+                self.refresh_thread.request_refresh()
+            else:
+                sock.write(encode({"type": "error", "error": "unknown command"}))
+
+    def reply(self, sock):
+        """send the latest snapshot to a client and disconnect it"""
+        sock.write(self.snapshot)
+        sock.disconnectFromServer()
+
+    def drop(self, sock):
+        """forget a disconnected client"""
+        self.clients.discard(sock)
+        if sock in self.waiting:
+            self.waiting.remove(sock)
+        sock.deleteLater()
+
+    def publish(self, data):
+        """send a message to every subscribed client"""
+        for sock in self.clients:
+            sock.write(data)
+
+    def publish_groups(self, groups):
+        """update the snapshot and send it to subscribers if it changed"""
+        if groups == self.groups:
+            return
+        self.groups   = groups
+        self.snapshot = groups_message(groups)
+        waiting, self.waiting = self.waiting, []
+        for sock in waiting:
+            self.reply(sock)
+        self.publish(self.snapshot)
+
+    def publish_cycle(self, seconds_and_spawns):
+        """send the duration of a full refresh cycle to subscribers"""
+        seconds, spawns = seconds_and_spawns
+        self.publish(encode({"type": "cycle", "seconds": seconds, "spawns": spawns}))
+
+    def publish_tick(self, elapsed_and_num_repos):
+        """send the time until the next refresh cycle to subscribers"""
+        elapsed, num_repos = elapsed_and_num_repos
+        self.publish(encode({"type": "tick", "elapsed": elapsed, "repos": num_repos,
+                             "refresh": self.refresh_thread.refresh}))
+
+class DaemonClient(QObject):
+    """
+    Subscriber to the daemon, used by the GUI in place of a RefreshThread:
+    same signals, same refresh/stop requests
+    """
+    ready = Signal(object)   # Signal must be class, not instance member
+    tick  = Signal(object)   # Signal must be class, not instance member
+    cycle = Signal(object)   # Signal must be class, not instance member
+    # never emitted: the daemon sends whole snapshots
+    group_ready = Signal(object)
+
+    def __init__(self, path):
+        """constructor"""
+        super().__init__()
+        self.path    = path
+        self.refresh = 0
+        self.sock    = QLocalSocket()
+        self.sock.readyRead.connect(self.receive)  # pylint: disable=no-member
+
+    def start(self):
+        """connect to the daemon and subscribe to its updates"""
+        self.sock.connectToServer(self.path)
+        self.sock.write(encode({"command": "subscribe"}))
+
+    def receive(self):
+        """dispatch the messages sent by the daemon"""
+        while self.sock.canReadLine():
+            message = json.loads(bytes(self.sock.readLine()))
+            if message["type"] == "groups":
+                self.ready.emit(groups_from(message))
+            elif message["type"] == "cycle":
+                self.cycle.emit((message["seconds"], message["spawns"]))
+            elif message["type"] == "tick":
+                self.refresh = message["refresh"]
+                self.tick.emit((message["elapsed"], message["repos"]))
+
+    def request_refresh(self):
+        """ask the daemon to refresh now"""
+        self.sock.write(encode({"command": "refresh"}))
+
+    def request_stop(self):
+        """disconnect from the daemon, which keeps running"""
+        self.sock.disconnectFromServer()
+
+    @staticmethod
+    def wait():
+        """nothing to wait for, for compatibility with RefreshThread"""
+        return True
+
+    @staticmethod
+    def set_visible(names): # pylint: disable=unused-argument
+        """the daemon refreshes every group, for compatibility with RefreshThread"""
+
+def daemon_mode(args):
+    """run headless, serving repo status to the clients attached to the daemon socket"""
+    app = QCoreApplication(sys.argv)
+    refresh_thread = create_refresh_thread(args)
+    server = StatusServer(refresh_thread)
+    os.makedirs(os.path.dirname(args.socket), exist_ok=True)
+    if not server.start(args.socket):
+        reason = server.errorString() or 'daemon already running'
+        sys.exit(f"ERROR: Can't listen at {args.socket}: {reason}")
+
+    # warn about invalid directories once
+    refresh_thread.config.expand(initial=True)
+    refresh_thread.start()
+
+    def stop_handler(*args): # pylint: disable=unused-argument
+        """Handler for the SIGINT and SIGTERM signals."""
+        QCoreApplication.quit()
+
+    signal.signal(signal.SIGINT, stop_handler)
+    signal.signal(signal.SIGTERM, stop_handler)
+    app.exec()
+    refresh_thread.request_stop()
+    refresh_thread.wait()
+    server.close()
+    refresh_thread.engine.shutdown()
@@ -17,190 +17,140 @@
 
 """
 Git Dashboard
+
+Entry point. Only the modules needed by the selected mode are imported: Qt is
+never imported by the command line interface (see cli.py), so that it starts
+fast when called from shell prompts.
 """
 
 import os
-import sys
-import signal
-from pathlib import Path
 import argparse
-import time
-import json
-import pkg_resources
-
-
-from PySide6.QtCore import (
-    Signal,
-    QThread,
-)
-
-from PySide6.QtWidgets import (
-    QApplication,
-    QMainWindow,
-    QVBoxLayout,
-    QHBoxLayout,
-    QWidget,
-    QLabel,
-    QPushButton,
-)
+from pathlib import Path
 
-from git_dashboard.groups import GroupsView
 from git_dashboard.config import (
     CONFIG,
+    SOCKET,
     create_default_configuration,
-    load_configuration,
 )
-
-class MainWindow(QMainWindow):
-    """main window"""
-    def __init__(self, groups_view, refresh_thread):
-        """constructor"""
-        super().__init__()
-        self.refresh_thread = refresh_thread
-
-        # status and refresh button packed horizontally
-        self.status = QLabel("Welcome to git-dashboard")
-        self.button = QPushButton("refresh now")
-        self.button.clicked.connect(self.refresh_button)  # pylint: disable=no-member
-        hlayout = QHBoxLayout()
-        hlayout.addWidget(self.status, 66)
-        hlayout.addWidget(self.button, 33)
-
-        # vertical layout
-        vlayout = QVBoxLayout()
-        vlayout.addWidget(groups_view)
-        vlayout.addLayout(hlayout)
-
-        # dummy container widget
-        widget = QWidget()
-        widget.setLayout(vlayout)
-        self.setCentralWidget(widget)
-
-    def closeEvent(self, event):
-        """gracefully terminate the application by stopping refresh_thread"""
-        self.refresh_thread.stop = True
-        while not self.refresh_thread.isFinished():
-            time.sleep(1)
-        event.accept()  # let the window close
-
-    def refresh_button(self):
-        """refresh button action"""
-        self.refresh_thread.force = True
-
-class RefreshThread(QThread):
-    """Separate thread used to query git repos in the background"""
-    ready = Signal(object)   # Signal must be class, not instance member
-    tick  = Signal(object)   # Signal must be class, not instance member
-    def __init__(self, config, refresh):
+from git_dashboard.engine import DEFAULT_WORKERS
+from git_dashboard.aheadbehind import DEFAULT_SIZE
+from git_dashboard.fetch import DEFAULT_JOBS
+from git_dashboard.scanner import DEFAULT_PRUNE
+
+def version() -> str:
+    """return the version of the installed package"""
+    from importlib import metadata # pylint: disable=import-outside-toplevel
+    try:
+        return metadata.version("git_dashboard")
+    except metadata.PackageNotFoundError:
+        return 'develop'
+
+class VersionAction(argparse.Action):
+    """same as argparse's "version" action, looking up the version only when asked for"""
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, default=argparse.SUPPRESS,
+                 help=None): # pylint: disable=redefined-builtin
         """constructor"""
-        super().__init__()
-        self.config  = config
-        self.refresh = refresh
-        self.stop    = False
-        self.force   = False
+        super().__init__(option_strings=option_strings, dest=dest, default=default, nargs=0,
+                         help=help)
 
-    def run(self):
-        """thread run method"""
-        while True:
-            groups = load_configuration(config=self.config, initial=False)
-            self.ready.emit(groups)
-            # wait for `refresh` seconds, or until stop is issued
-            elapsed  = 0
-            self.force = False
-            num_repos  = sum(map(len, groups.values()))
-            while not self.stop and not self.force and elapsed < self.refresh:
-                time.sleep(1)
-                elapsed += 1
-                self.tick.emit((elapsed, num_repos))
-            if self.stop:
-                break
+    def __call__(self, parser, namespace, values, option_string=None): # pylint: disable=redefined-outer-name
+        """print the version and exit"""
+        parser.exit(message=f"{version()}\n")
 
 def parser():
     """argument parser"""
-    try:
-        version = pkg_resources.require("git-dashboard")[0].version
-    except pkg_resources.DistributionNotFound:
-        version = 'develop'
     par = argparse.ArgumentParser(description="Git dashboard")
     par.add_argument("-c", "--config",  default=CONFIG,
         help=f"Configuration file. Default={CONFIG}")
     par.add_argument("--no-gui",  default=False, action='store_true',
         help="No GUI. Show repo status in JSON format and exit")
+    par.add_argument("-f", "--format", choices=["json", "ndjson"], default="json",
+        help="Output format of --no-gui. ndjson prints one record per repo as soon as it is "
+             "analyzed. Default=json")
+    par.add_argument("-d", "--daemon", default=False, action='store_true',
+        help="Run headless, refreshing repos and serving their status to clients started with "
+             "--attach")
+    par.add_argument("-A", "--attach", default=False, action='store_true',
+        help="Show the repo status served by a daemon (see --daemon) instead of analyzing repos. "
+             "Options controlling the analysis are those of the daemon")
+    par.add_argument("--socket", default=SOCKET,
+        help=f"Socket of the daemon. Default={SOCKET}")
+    par.add_argument("-p", "--profile", default=False, action='store_true',
+        help="With --no-gui, add the time spent analyzing each repo to its record, "
+             "and a summary of each refresh cycle to the output")
     par.add_argument("-r", "--refresh",  type=int, default=60,
         help="Refresh interval in seconds. Default=60")
+    par.add_argument("--background-refresh", type=int, default=None, metavar="SECONDS",
+        help="In the GUI, refresh interval of the groups whose tab is not shown, in seconds. They "
+             "are also refreshed when their tab is shown (0=only then). Default=same as --refresh")
+    par.add_argument("-j", "--jobs", type=int, default=DEFAULT_WORKERS,
+        help=f"Number of repos analyzed concurrently. Default={DEFAULT_WORKERS}")
+    par.add_argument("--backend", choices=["threads", "processes"], default="threads",
+        help="Analyze repos in worker threads, or in worker processes so that parsing the output "
+             "of git uses several cores and doesn't slow down the GUI. Default=threads")
+    par.add_argument("-t", "--timeout", type=float, default=60,
+        help="Give up on a repo if it can't be analyzed within this many seconds. Default=60")
+    par.add_argument("-i", "--incremental", default=False, action='store_true',
+        help="Only re-analyze repos whose git state changed since the previous refresh")
+    par.add_argument("--full-rescan", type=int, default=10,
+        help="With --incremental, re-analyze every repo every N refreshes (0=never). Default=10")
+    par.add_argument("-w", "--watch", default=False, action='store_true',
+        help="Watch repos for changes and update them immediately (inotify on Linux, polling "
+             "elsewhere). With --no-gui, keep running and print changed records in ndjson format")
+    par.add_argument("-a", "--adaptive", default=False, action='store_true',
+        help="Give each repo its own refresh interval: active repos are refreshed every "
+             "--min-interval seconds, idle ones back off up to --max-interval seconds")
+    par.add_argument("--min-interval", type=int, default=5,
+        help="With --adaptive, refresh interval of active repos in seconds. Default=5")
+    par.add_argument("--max-interval", type=int, default=3600,
+        help="With --adaptive, maximum refresh interval of idle repos in seconds. Default=3600")
+    par.add_argument("-b", "--branches", default=False, action='store_true',
+        help="List every local branch of each repo with its upstream, commits ahead/behind and "
+             "last commit date, as if every group had the `branches: true` git option")
+    par.add_argument("--ahead-behind-cache", type=int, default=DEFAULT_SIZE, metavar="SIZE",
+        help="Remember the commits ahead/behind upstream of up to SIZE (HEAD, upstream) commit "
+             "pairs across refreshes and restarts, instead of counting them every time "
+             f"(0=disable). Default={DEFAULT_SIZE}")
+    par.add_argument("--fetch-interval", type=int, default=0, metavar="SECONDS",
+        help="Fetch the remotes of every repo in the background, each remote URL at most once "
+             "every SECONDS, and re-analyze the repos whose remote branches moved. "
+             "Default=0 (never fetch)")
+    par.add_argument("--fetch-jobs", type=int, default=DEFAULT_JOBS,
+        help="With --fetch-interval, number of remote URLs fetched concurrently. "
+             f"Default={DEFAULT_JOBS}")
+    par.add_argument("--prune", action='append', metavar="PATTERN",
+        help="When creating the default configuration, skip directories matching PATTERN. "
+             f"Can be repeated. Default={','.join(DEFAULT_PRUNE)}")
+    par.add_argument("--max-depth", type=int, default=-1,
+        help="When creating the default configuration, don't scan deeper than this. "
+             "Default=no limit")
     par.add_argument("-s", "--font-scale", type=float, default=1.0,
         help="Font scale. Default=1.0")
-    par.add_argument("-v", "--version", action='version', version=version,
-        help=f"Print version ({version}) and exit")
+    par.add_argument("-v", "--version", action=VersionAction,
+        help="Print version and exit")
     return par
 
-def gui_mode(args):
-    """start git-dashboard in GUI mode"""
-    # start the app
-    app = QApplication(sys.argv)
-
-    # model and views
-    groups = load_configuration(config=args.config, initial=True)
-    groups_view = GroupsView(groups, args)
-
-    def refresh_func(groups):
-        """refresh repo status"""
-        for name, model in groups_view.models.items():
-            model.layoutAboutToBeChanged.emit()  # pylint: disable=no-member
-            model.group = groups[name]
-            model.layoutChanged.emit()           # pylint: disable=no-member
-
-    # start refresh thread and connect it refresh_func
-    refresh_thread = RefreshThread(args.config, args.refresh)
-    refresh_thread.ready.connect(refresh_func)
-    refresh_thread.start()
-
-    def sigint_handler(*args): # pylint: disable=unused-argument
-        """Handler for the SIGINT signal."""
-        refresh_thread.stop = True
-        while not refresh_thread.isFinished():
-            time.sleep(1)
-        QApplication.quit()
-
-    # instantiate main window
-    window = MainWindow(groups_view, refresh_thread)
-
-    # update status bar
-    def tick_func(elapsed_and_num_repos):
-        """update status bar"""
-        elapsed, num_repos = elapsed_and_num_repos
-        window.status.setText(f"Tracking {num_repos} repos. Refresh in {args.refresh - elapsed} secs...")
-
-    refresh_thread.tick.connect(tick_func)
-
-    # capture ctrl-c signal so we can exit gracefully
-    signal.signal(signal.SIGINT, sigint_handler)
-
-    # resize primary window to 1/5 width + 1/2 height
-    screen = app.primaryScreen()
-    size   = screen.size()
-    window.resize(size.width()//5, size.height()//2)
-
-    window.show()
-    app.exec()
-
-def cmdline_mode(args):
-    """command line mode"""
-    groups = load_configuration(config=args.config, initial=True)
-    print(json.dumps(groups, indent=2))
-
 def main():
     """main routine for test purposes"""
     args = parser().parse_args()
 
     # create default configuration if needed
-    if not os.path.exists(args.config):
+    if not os.path.exists(args.config) and not args.attach:
         home = Path.home()
-        create_default_configuration(home, 'home', args.config)
-
-    if args.no_gui:
+        create_default_configuration(home, 'home', args.config, args.prune, args.max_depth)
+
+    # pylint: disable=import-outside-toplevel
+    if args.daemon:
+        from git_dashboard.daemon import daemon_mode
+        daemon_mode(args)
+    elif args.no_gui and args.attach:
+        from git_dashboard.cli import attach_mode
+        attach_mode(args)
+    elif args.no_gui:
+        from git_dashboard.cli import cmdline_mode
         cmdline_mode(args)
     else:
+        from git_dashboard.gui import gui_mode
         gui_mode(args)
 
 if __name__ == "__main__":
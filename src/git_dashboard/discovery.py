@@ -0,0 +1,170 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Cached repository discovery
+
+Configured directories that are not git repos themselves are expanded into the
+git repos they contain. Listing directories is slow on network filesystems, so
+the listing of every visited directory is cached along with its mtime, and a
+directory is only listed again when its mtime changes. The cache is persisted
+as a JSON file, so the repos added/removed since the last run are known too:
+
+    {
+        "version": VERSION,
+        "listings": {path: [mtime_ns, listed_at_ns, has_git, [subdirectories]]},
+        "repos": {configured directory: [repos]}
+    }
+
+A cache of another version is discarded.
+"""
+
+import os
+import json
+import time
+
+from git_dashboard.scanner import is_git_entry
+from git_dashboard.persist import save_json
+
+# listings taken less than RACY_NS after the directory mtime are not trusted, as
+# the directory may have changed again within the filesystem's mtime granularity
+RACY_NS = 2 * 1000 * 1000 * 1000
+
+# version of the cache format, incremented when cached listings must be discarded
+# (version 2: has_git is also true for a .git file)
+VERSION = 2
+
+class DiscoveryCache:
+    """Cache of directory listings used to discover git repos"""
+    def __init__(self, filename=None):
+        """constructor. If `filename` is given, the cache is loaded from and saved to it"""
+        self.filename = filename
+        self.listings = {}      # directory -> [mtime_ns, listed_at_ns, has_git, [subdirectories]]
+        self.repos    = {}      # configured directory -> repos found in previous pass
+        self.dirty    = False
+        self.visited  = set()   # directories visited in the current pass
+        self.added    = set()   # repos found in the last pass but not in the previous one
+        self.removed  = set()   # repos found in the previous pass but not in the last one
+        if filename is not None:
+            try:
+                with open(filename, "r", encoding="utf-8") as inp:
+                    cache = json.load(inp)
+                if cache["version"] != VERSION:
+                    raise ValueError("cache of another version")
+                self.listings = cache["listings"]
+                self.repos    = cache["repos"]
+            except (OSError, ValueError, KeyError, TypeError):
+                self.listings = {}
+                self.repos    = {}
+
+    def begin_pass(self):
+        """start a new discovery pass, resetting the added/removed delta"""
+        self.visited = set()
+        self.added   = set()
+        self.removed = set()
+
+    def end_pass(self):
+        """forget directories not visited in this pass, and persist the cache if it changed"""
+        for cache in (self.listings, self.repos):
+            for dirname in set(cache) - self.visited:
+                del cache[dirname]
+                self.dirty = True
+        self.save()
+
+    def save(self):
+        """persist the cache if it changed"""
+        if self.filename is None or not self.dirty:
+            return
+        cache = {"version": VERSION, "listings": self.listings, "repos": self.repos}
+        if save_json(self.filename, cache):
+            self.dirty = False
+
+    def listdir(self, dirname):
+        """
+        return (has_git, subdirectories) of `dirname`, or None if it can't be listed.
+        Symlinked subdirectories are skipped.
+        """
+        self.visited.add(dirname)
+        try:
+            mtime = os.stat(dirname).st_mtime_ns
+        except OSError:
+            return None
+        cached = self.listings.get(dirname)
+        if cached is not None and cached[0] == mtime and cached[1] - mtime >= RACY_NS:
+            return cached[2], cached[3]
+        try:
+            has_git, dirnames = False, []
+            with os.scandir(dirname) as entries:
+                for entry in entries:
+                    if entry.name == ".git":
+                        has_git = has_git or is_git_entry(entry)
+                    elif entry.is_dir() and not entry.is_symlink():
+                        dirnames.append(entry.name)
+        except OSError:
+            # skip directories where we don't have permission
+            return None
+        dirnames = sorted(dirnames)
+        self.listings[dirname] = [mtime, time.time_ns(), has_git, dirnames]
+        self.dirty = True
+        return has_git, dirnames
+
+    def find_repos(self, dirname, depth=0, maxdepth=-1):
+        """
+        same as config.find_git_repos_from_path, using cached listings
+        """
+        if os.path.islink(dirname):
+            return []
+        listing = self.listdir(dirname)
+        if listing is None:
+            return []
+        has_git, dirnames = listing
+        if has_git:
+            return [dirname]
+        results = []
+        if depth != maxdepth:
+            for name in dirnames:
+                results.extend(self.find_repos(os.path.join(dirname, name), depth+1, maxdepth))
+        return results
+
+    def expand(self, dirname):
+        """
+        return the git repos found in configured directory `dirname`: either
+        `dirname` itself or the repos one level below it. Return None if `dirname`
+        is not a valid directory.
+        """
+        listing = self.listdir(dirname)
+        if listing is None:
+            repos = None
+        elif listing[0]:
+            repos = [dirname]
+        elif os.path.islink(dirname):
+            # configured symlinks are followed, but only if they point to a repo
+            repos = []
+        else:
+            repos = []
+            for name in listing[1]:
+                repos.extend(self.find_repos(os.path.join(dirname, name), 1, 1))
+
+        previous = self.repos.get(dirname)
+        if previous is not None:
+            self.added.update(set(repos or []) - set(previous))
+            self.removed.update(set(previous) - set(repos or []))
+        if repos is None and previous is not None:
+            del self.repos[dirname]
+            self.dirty = True
+        elif repos is not None and repos != previous:
+            self.repos[dirname] = repos
+            self.dirty = True
+        return repos
@@ -0,0 +1,228 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Concurrent analysis engine
+
+Analyzing a repo is dominated by waiting on git subprocesses, so repos are
+analyzed by a pool of worker threads. The pool is kept alive between refresh
+cycles and results are always returned in the same order as the input paths.
+An optional AnalysisCache (see fingerprint.py) skips repos that didn't change,
+and an optional AheadBehindCache (see aheadbehind.py) memoizes ahead/behind counts.
+With a ProcessBackend (see pool.py), worker threads hand repos over to worker
+processes, which run git and parse its output outside of this process.
+
+Each repo has a deadline: its git process is killed when the deadline expires
+and the repo is reported as "timeout", so a single huge repo (or a hung network
+mount) cannot stall a refresh. Repos still waiting for a worker thread have a
+deadline too, counted from their submission, so that they are not waited for
+forever when every worker is stuck. A repo still being analyzed since a
+previous cycle is not submitted again: it keeps its original deadline. In-flight
+work can be cancelled at any time.
+"""
+
+import os
+import time
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    wait,
+    FIRST_COMPLETED,
+)
+
+from git_dashboard.config import analyze
+from git_dashboard.options import DEFAULT
+from git_dashboard.aheadbehind import create_memo
+from git_dashboard.status import (
+    RepoStatus,
+    GitProcesses,
+)
+
+# same default as ThreadPoolExecutor: I/O bound work, at least 5 workers, at most 32
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# how often (in seconds) in-flight work is checked for timeouts and cancellation
+POLL = 0.1
+
+# extra time given to a repo past its timeout, before giving up on its worker thread
+# (e.g. stuck on a hung NFS mount, where even stat() doesn't return)
+GRACE = 1.0
+
+class AnalysisEngine: # pylint: disable=too-many-instance-attributes
+    """Analyze git repos concurrently using a pool of worker threads"""
+    def __init__(self, workers=DEFAULT_WORKERS, cache=None, timeout=None, memo=None, # pylint: disable=too-many-arguments
+                 backend=None):
+        """
+        constructor.
+        Each repo must be analyzed within `timeout` seconds, or it is reported as "timeout".
+        If `backend` is given (see pool.py), repos are analyzed by it, with its own memo
+        """
+        self.workers   = max(1, workers)
+        self.cache     = cache
+        self.timeout   = timeout
+        self.memo      = memo
+        self.backend   = backend
+        self.processes = GitProcesses()
+        self.started   = {}   # repo path -> time its analysis started, until it is done
+        self.running   = {}   # repo path -> (future, time submitted) of its analysis, until done
+        self.executor  = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analyze")
+
+    def analyze_one(self, path, options=DEFAULT):
+        """analyze a single repo with git `options` (see options.py)"""
+        if self.backend is None:
+            return analyze(path, self.timeout, self.processes, options, self.memo)
+        result = self.backend.analyze(path, self.timeout, options)
+        if self.processes.cancelled:
+            # git was killed by the worker, the error it reported doesn't matter
+            return RepoStatus(path, error="cancelled")
+        return result
+
+    def task(self, path, cached, options):
+        """
+        worker task: analyze a single repo, going through the cache if `cached`.
+        Return (result, elapsed)
+        """
+        self.started[path] = start = time.monotonic()
+        try:
+            if self.processes.cancelled:
+                result = RepoStatus(path, error="cancelled")
+            elif cached and self.cache is not None:
+                result = self.cache.analyze(path, lambda path: self.analyze_one(path, options),
+                                            options)
+            else:
+                result = self.analyze_one(path, options)
+                if self.cache is not None:
+                    self.cache.update(path, result, options)
+            return result, time.monotonic() - start
+        finally:
+            self.started.pop(path, None)
+
+    def submit(self, path, cached, options):
+        """
+        return the future of the analysis of `path`, and the time it was submitted. A repo
+        still being analyzed (e.g. hung since a previous cycle) is not submitted again
+        """
+        running = self.running.get(path)
+        if running is None or running[0].done():
+            running = (self.executor.submit(self.task, path, cached, options), time.monotonic())
+            self.running[path] = running
+        return running
+
+    def collect(self, paths, cached, options=None):
+        """
+        analyze `paths` and yield (path, (result, elapsed)) as soon as each repo is done.
+        `options` maps repo paths to their git options (see options.py), DEFAULT otherwise.
+        Repos that exceed their timeout, or that are pending when the refresh is
+        cancelled, are given up on
+        """
+        options   = options or {}
+        futures   = {}
+        submitted = {}
+        for path in paths:
+            future, submitted[path] = self.submit(path, cached, options.get(path, DEFAULT))
+            futures[future] = path
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=POLL, return_when=FIRST_COMPLETED)
+            for future in done:
+                if not future.cancelled():
+                    yield futures[future], future.result()
+            now = time.monotonic()
+            for future in list(pending):
+                path = futures[future]
+                # running repos are timed from their start, queued ones from their submission
+                since = self.started.get(path, submitted[path])
+                hung  = self.timeout and now - since > self.timeout + GRACE
+                if hung or (self.processes.cancelled and future.cancel()):
+                    # a queued repo given up on doesn't need a worker anymore
+                    future.cancel()
+                    pending.discard(future)
+                    yield path, (RepoStatus(path, error="timeout" if hung else "cancelled"), 0.0)
+        self.running = {path: running for path, running in self.running.items()
+                        if not running[0].done()}
+        if self.memo is not None:
+            self.memo.save()
+
+    def analyze(self, paths, options=None):
+        """analyze all `paths` and return their results in the same order"""
+        if self.cache is not None:
+            self.cache.begin_cycle()
+        results = {path: result for path, (result, _) in self.collect(paths, True, options)}
+        if self.cache is not None:
+            self.cache.retain(paths)
+        return [results[path] for path in paths]
+
+    def stream(self, paths, options=None, tracked=None):
+        """
+        analyze all `paths` and yield (path, result) pairs as soon as each repo is done.
+        Cached results of the `tracked` repos (by default `paths`) are kept for the next cycles
+        """
+        if self.cache is not None:
+            self.cache.begin_cycle()
+        for path, (result, _) in self.collect(paths, True, options):
+            yield path, result
+        if self.cache is not None:
+            self.cache.retain(paths if tracked is None else tracked)
+
+    def refresh_timed(self, paths, options=None):
+        """
+        re-analyze `paths` regardless of the cache, e.g. after a filesystem event.
+        Return a list of (result, elapsed seconds)
+        """
+        results = dict(self.collect(paths, False, options))
+        return [results[path] for path in paths]
+
+    def refresh(self, paths, options=None):
+        """re-analyze `paths` regardless of the cache, and return their results"""
+        return [result for result, _ in self.refresh_timed(paths, options)]
+
+    @property
+    def spawned(self) -> int:
+        """number of git processes started so far"""
+        if self.backend is None:
+            return self.processes.spawned
+        return self.processes.spawned + self.backend.spawned
+
+    def invalidate(self):
+        """force a full rescan on the next cycle"""
+        if self.cache is not None:
+            self.cache.clear()
+
+    def cancel(self):
+        """cancel in-flight work: running git processes are killed and pending repos are skipped"""
+        self.processes.cancel()
+        if self.backend is not None:
+            self.backend.cancel()
+
+    def resume(self):
+        """accept new work after `cancel()`"""
+        self.processes.resume()
+        if self.backend is not None:
+            self.backend.resume()
+
+    def shutdown(self):
+        """release worker threads and processes"""
+        self.processes.cancel()
+        self.executor.shutdown(wait=False)
+        if self.backend is not None:
+            self.backend.shutdown()
+
+def create_engine(args, cache=None):
+    """return the engine configured by the command line arguments, with analysis `cache` if given"""
+    if args.backend == "processes":
+        # multiprocessing is only imported when used
+        from git_dashboard.pool import ProcessBackend # pylint: disable=import-outside-toplevel
+        backend = ProcessBackend(min(args.jobs, os.cpu_count() or 1), args.ahead_behind_cache)
+        return AnalysisEngine(args.jobs, cache, args.timeout, backend=backend)
+    return AnalysisEngine(args.jobs, cache, args.timeout, create_memo(args))
@@ -0,0 +1,182 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Background fetch scheduler
+
+Commits behind upstream are only known as of the last fetch. The scheduler
+fetches the remotes of the tracked repos in the background, so that they stay
+accurate without the user fetching every repo by hand:
+
+- worktrees sharing an object store are fetched once, as a single target
+- targets sharing a remote URL are fetched together, at most once per
+  `interval`: the first one from the remote, and the others from the first
+  one's remote-tracking refs, so that the remote is only contacted once
+- at most `jobs` URLs are fetched concurrently
+- once fetched, only the repos whose remote-tracking refs moved are reported,
+  to be re-analyzed
+
+Fetches run in their own worker threads: `poll()` never waits for them, so the
+refresh loop is never blocked by a slow or unreachable remote.
+"""
+
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from git_dashboard.fingerprint import (
+    OTHER_SECTION,
+    KEY_VALUE,
+    read_text,
+    git_dirs,
+    remote_refs,
+)
+from git_dashboard.status import (
+    GitProcesses,
+    GitStatusError,
+    run_git,
+)
+
+REMOTE_SECTION = re.compile(r'^\s*\[remote\s+"(.*)"\]\s*$')
+
+# default number of URLs fetched concurrently
+DEFAULT_JOBS = 4
+
+# fetches are given up on after that many seconds
+FETCH_TIMEOUT = 300
+
+# never start a garbage collection or maintenance in the background
+FETCH = ["-c", "gc.auto=0", "-c", "maintenance.auto=false", "fetch", "--quiet"]
+
+# a remote of the object store at `common_dir`, and the worktrees sharing it
+Target = namedtuple("Target", ["common_dir", "remote", "default", "paths"])
+
+def remotes(config) -> dict:
+    """return {name: (url, fetch refspecs)} of the remotes configured in the git `config` file"""
+    result  = {}
+    current = None
+    for line in (read_text(config) or "").splitlines():
+        match = REMOTE_SECTION.match(line)
+        if match or OTHER_SECTION.match(line):
+            current = match.group(1) if match else None
+            if current is not None:
+                result.setdefault(current, (None, []))
+            continue
+        match = KEY_VALUE.match(line)
+        if current is not None and match:
+            key, value = match.group(1).lower(), match.group(2)
+            url, refspecs = result[current]
+            if key == "url" and url is None:
+                result[current] = (value, refspecs)
+            elif key == "fetch":
+                refspecs.append(value)
+    return {name: remote for name, remote in result.items() if remote[0] is not None}
+
+def normalize(url, path) -> str:
+    """return `url` as a key shared by every repo fetching from the same remote"""
+    if url.startswith(("./", "../")):
+        # relative to the worktree
+        url = os.path.normpath(os.path.join(path, url))
+    return url.rstrip("/")
+
+def find_targets(paths) -> dict:
+    """return {url: [Target]} of the repos at `paths`, one target per object store and remote"""
+    stores = {}   # common_dir -> worktree paths
+    for path in paths:
+        _, common_dir = git_dirs(path)
+        stores.setdefault(os.path.realpath(common_dir), []).append(path)
+    targets = {}
+    for common_dir, worktrees in stores.items():
+        for remote, (url, refspecs) in remotes(os.path.join(common_dir, "config")).items():
+            default = refspecs == [f"+refs/heads/*:refs/remotes/{remote}/*"]
+            targets.setdefault(normalize(url, worktrees[0]), []).append(
+                Target(common_dir, remote, default, tuple(worktrees)))
+    return targets
+
+def drain(stream):
+    """read and discard the output of git"""
+    stream.read()
+
+class FetchScheduler:
+    """Fetch the remotes of the tracked repos in the background, at most every `interval` seconds"""
+    def __init__(self, interval, jobs=DEFAULT_JOBS, timeout=FETCH_TIMEOUT):
+        """constructor"""
+        self.interval  = interval
+        self.timeout   = timeout
+        self.processes = GitProcesses()
+        self.executor  = ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="fetch")
+        self.targets   = {}   # url -> [Target]
+        self.fetched   = {}   # url -> time its last fetch started
+        self.running   = {}   # url -> future of its fetch, returning the repos whose refs moved
+
+    def update(self, paths):
+        """set the repos whose remotes are fetched"""
+        self.targets = find_targets(paths)
+        self.fetched = {url: started for url, started in self.fetched.items()
+                        if url in self.targets}
+
+    def poll(self) -> set:
+        """
+        start fetching the URLs that are due, without waiting for them. Return the
+        paths of the repos whose remote-tracking refs moved since the last poll
+        """
+        moved = set()
+        for url, future in list(self.running.items()):
+            if future.done():
+                del self.running[url]
+                if not future.cancelled() and future.exception() is None:
+                    moved.update(future.result())
+        now = time.monotonic()
+        for url, targets in self.targets.items():
+            due = now - self.fetched.get(url, -self.interval) >= self.interval
+            if url not in self.running and due:
+                self.fetched[url] = now
+                self.running[url] = self.executor.submit(self.fetch, targets)
+        return moved
+
+    def fetch(self, targets) -> set:
+        """
+        fetch `targets` sharing the same URL, the first one from the remote and the
+        others from it when possible. Return the paths of the repos whose refs moved
+        """
+        first  = targets[0]
+        before = [remote_refs(target.common_dir, target.remote) for target in targets]
+        try:
+            run_git(first.paths[0], FETCH + [first.remote], drain, self.timeout, self.processes)
+        except GitStatusError:
+            # unreachable remote, missing credentials, ... try again at the next interval
+            return set()
+        for target in targets[1:]:
+            if first.default and target.default:
+                refspec = f"+refs/remotes/{first.remote}/*:refs/remotes/{target.remote}/*"
+                args    = [first.common_dir, refspec]
+            else:
+                args = [target.remote]
+            try:
+                run_git(target.paths[0], FETCH + args, drain, self.timeout, self.processes)
+            except GitStatusError:
+                continue
+        moved = set()
+        for target, refs in zip(targets, before):
+            if remote_refs(target.common_dir, target.remote) != refs:
+                moved.update(target.paths)
+        return moved
+
+    def shutdown(self):
+        """kill in-flight fetches and release worker threads"""
+        self.processes.cancel()
+        self.executor.shutdown(wait=False)
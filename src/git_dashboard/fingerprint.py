@@ -0,0 +1,200 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Repo fingerprints and analysis cache
+
+A fingerprint is a cheap summary of the state of a repo made of the mtime and
+size of the files git touches when the repo changes:
+
+    .git/HEAD, .git/index, .git/config, packed-refs, the refs/heads directory,
+    the current branch ref, its upstream ref, and the worktree directory itself
+
+If the fingerprint of a repo did not change since its last analysis, the
+previous result is reused. Edits to tracked files don't touch any of these
+files, hence the cache also forces a full rescan every N cycles.
+"""
+
+import os
+import re
+
+BRANCH_SECTION = re.compile(r'^\s*\[branch\s+"(.*)"\]\s*$')
+OTHER_SECTION  = re.compile(r'^\s*\[')
+KEY_VALUE      = re.compile(r'^\s*(\w+)\s*=\s*(.*?)\s*$')
+SHA            = re.compile(r'^[0-9a-f]{40}([0-9a-f]{24})?$')
+
+# how git expands a short ref name, first match wins (see `git help revisions`)
+REF_RULES = ("{}", "refs/{}", "refs/tags/{}", "refs/heads/{}", "refs/remotes/{}",
+             "refs/remotes/{}/HEAD")
+
+def read_text(path):
+    """return the stripped content of a small text file, or None if it can't be read"""
+    try:
+        with open(path, "r", encoding="utf-8", errors="surrogateescape") as inp:
+            return inp.read().strip()
+    except OSError:
+        return None
+
+def git_dirs(path):
+    """
+    return (git_dir, common_dir) for the worktree at `path`.
+    `.git` is a file pointing elsewhere for linked worktrees and submodules, and
+    refs/config are shared through `commondir` for linked worktrees.
+    """
+    git_dir = os.path.join(path, ".git")
+    if os.path.isfile(git_dir):
+        content = read_text(git_dir) or ""
+        if content.startswith("gitdir:"):
+            git_dir = os.path.join(path, content[len("gitdir:"):].strip())
+    common_dir = read_text(os.path.join(git_dir, "commondir"))
+    if common_dir is None:
+        return git_dir, git_dir
+    return git_dir, os.path.join(git_dir, common_dir)
+
+def upstream_ref(config, branch):
+    """return the upstream ref of `branch` as configured in the git `config` file, or None"""
+    remote = merge = None
+    in_branch = False
+    for line in (read_text(config) or "").splitlines():
+        match = BRANCH_SECTION.match(line)
+        if match or OTHER_SECTION.match(line):
+            in_branch = bool(match) and match.group(1) == branch
+            continue
+        match = KEY_VALUE.match(line)
+        if in_branch and match:
+            key, value = match.group(1).lower(), match.group(2)
+            if key == "remote":
+                remote = value
+            elif key == "merge":
+                merge = value
+    if remote is None or merge is None:
+        return None
+    if remote == ".":
+        return merge
+    return re.sub(r"^refs/heads/", f"refs/remotes/{remote}/", merge)
+
+def read_ref(common_dir, ref):
+    """return the value of `ref` from its loose file or from packed-refs, None if there is none"""
+    value = read_text(os.path.join(common_dir, ref))
+    if value is None:
+        for line in (read_text(os.path.join(common_dir, "packed-refs")) or "").splitlines():
+            if line.endswith(f" {ref}") and not line.startswith(("#", "^")):
+                return line.split(" ", 1)[0]
+    return value
+
+def remote_refs(common_dir, remote) -> dict:
+    """return {ref: commit} of the remote-tracking refs of `remote`, from loose and packed refs"""
+    prefix = f"refs/remotes/{remote}/"
+    refs   = {}
+    for line in (read_text(os.path.join(common_dir, "packed-refs")) or "").splitlines():
+        oid, _, ref = line.partition(" ")
+        if ref.startswith(prefix):
+            refs[ref] = oid
+    # loose refs take precedence over packed ones
+    for dirpath, _, filenames in os.walk(os.path.join(common_dir, prefix)):
+        for name in filenames:
+            ref = os.path.relpath(os.path.join(dirpath, name), common_dir).replace(os.sep, "/")
+            refs[ref] = read_text(os.path.join(dirpath, name))
+    return refs
+
+def upstream_oid(path, upstream):
+    """
+    return the commit `upstream` points to in the repo at `path`, or None if it can't be
+    resolved from the ref files. `upstream` is the name git reports in `git status`, which
+    is the shortest name that resolves to the upstream ref
+    """
+    _, common_dir = git_dirs(path)
+    for rule in REF_RULES:
+        value = read_ref(common_dir, rule.format(upstream))
+        if value is not None:
+            # symbolic refs are not followed
+            return value if SHA.match(value) else None
+    return None
+
+def stat(path):
+    """return (mtime, size) of `path`, or None if it doesn't exist"""
+    try:
+        info = os.stat(path)
+        return (info.st_mtime_ns, info.st_size)
+    except OSError:
+        return None
+
+def fingerprint(path):
+    """return the fingerprint of the git repo at `path`"""
+    git_dir, common_dir = git_dirs(path)
+    head   = read_text(os.path.join(git_dir, "HEAD")) or ""
+    config = os.path.join(common_dir, "config")
+    files  = [
+        os.path.join(git_dir, "HEAD"),
+        os.path.join(git_dir, "index"),
+        os.path.join(common_dir, "packed-refs"),
+        # branches are created and updated by renaming files into it (see branches.py)
+        os.path.join(common_dir, "refs", "heads"),
+        config,
+    ]
+    if head.startswith("ref:"):
+        ref = head[len("ref:"):].strip()
+        files.append(os.path.join(common_dir, ref))
+        upstream = upstream_ref(config, re.sub(r"^refs/heads/", "", ref))
+        if upstream is not None:
+            files.append(os.path.join(common_dir, upstream))
+    return (head, path, stat(path)) + tuple((name, stat(name)) for name in files)
+
+class AnalysisCache:
+    """
+    Reuse analysis results of repos whose fingerprint didn't change.
+    If `full_rescan` is not 0, every repo is re-analyzed every `full_rescan` cycles.
+    """
+    def __init__(self, full_rescan=0):
+        """constructor"""
+        self.full_rescan = full_rescan
+        self.entries     = {}   # path -> (fingerprint, result)
+        self.cycle       = 0
+
+    def begin_cycle(self):
+        """start a new refresh cycle"""
+        if self.full_rescan and self.cycle % self.full_rescan == 0:
+            self.clear()
+        self.cycle += 1
+
+    def clear(self):
+        """forget every result, forcing a full rescan"""
+        self.entries = {}
+
+    def retain(self, paths):
+        """forget results of repos that are no longer tracked"""
+        paths = set(paths)
+        self.entries = {path: entry for path, entry in self.entries.items() if path in paths}
+
+    def update(self, path, result, options=None):
+        """store a fresh analysis result for `path`, obtained with git `options`"""
+        if result.transient:
+            self.entries.pop(path, None)
+        else:
+            self.entries[path] = ((fingerprint(path), options), result)
+
+    def analyze(self, path, analyze, options=None):
+        """
+        return the cached result for `path` if still valid, otherwise `analyze(path)`.
+        Results obtained with other git `options` (see options.py) are not valid
+        """
+        current = (fingerprint(path), options)
+        entry   = self.entries.get(path)
+        if entry is not None and entry[0] == current:
+            return entry[1]
+        result = analyze(path)
+        if not result.transient:
+            self.entries[path] = (current, result)
+        return result
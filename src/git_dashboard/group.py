@@ -17,23 +17,26 @@
 Group Model and View classes
 
 A group is a collection of related repos. Underlying model is just a list of
-repo attributes:
+RepoStatus (see status.py):
 
 group = [
-    ["name1", "branch1", "status1", "path1"],
-    ["name2", "branch2", "status2", "path2"],
+    RepoStatus("path1"),
+    RepoStatus("path2"),
     ...
 ]
 
-The group model is in charge of expanding the path into name, branch, status, and
-other useful information to the view component.
+The group model is in charge of rendering each repo into the name, branch,
+status, colors and tooltips displayed by the view component. Rendering is done
+once per refresh, so that `data()` is a cheap lookup. When every branch of the
+repos is listed (see branches.py), they are rendered as children of their repo.
 """
 
 import re
+import time
 from enum import IntEnum
 
 from PySide6 import QtCore, QtWidgets, QtGui
-from PySide6.QtCore import Qt, QSortFilterProxyModel
+from PySide6.QtCore import Qt, QItemSelectionModel, QSortFilterProxyModel
 from PySide6.QtGui import QFont
 from PySide6.QtWidgets import QApplication
 
@@ -44,50 +47,273 @@ class Column(IntEnum):
     STATUS = 2
     PATH   = 3
 
-class GroupModel(QtCore.QAbstractTableModel):
-    """Model Group"""
+# role used by the proxy model to sort rows
+SORT_ROLE = Qt.UserRole
+
+MAIN_BRANCH    = re.compile(r'master|develop')
+STATUS_TOOLTIP = "-:behind\n+:ahead\nu:untracked\ns:staged"
+STALE_TOOLTIP  = "last known status, refreshing..."
+GREEN = QtGui.QBrush(QtCore.Qt.darkGreen)
+BLACK = QtGui.QBrush(QtCore.Qt.black)
+RED   = QtGui.QBrush(QtCore.Qt.darkRed)
+GRAY  = QtGui.QBrush(QtCore.Qt.gray)
+
+# when the branches of more repos than this changed, the model is reset instead of
+# signaling each repo, which would make the views lay out every expanded repo again
+MAX_CHILD_UPDATES = 8
+
+def status_sort_key(repo) -> int:
+    """
+    numeric sort key of the status column: errors first, then by number of
+    commits behind, ahead, dirty and number of untracked + staged files
+    """
+    if repo.error is not None:
+        return 10 ** 15
+    key = min(repo.behind or 0, 999) * 1000 + min(repo.ahead or 0, 999)
+    key = key * 10 + int(repo.dirty)
+    return key * 100000 + min((repo.untracked or 0) + repo.staged, 99999)
+
+def tooltips(repo):
+    """return the tooltip of each column. The name tooltip shows the analysis time of the repo"""
+    clean = repo.status == "clean"
+    name  = repo.path if repo.profile is None else f"{repo.path}\n{repo.profile.format()}"
+    if repo.stale:
+        return (name, repo.path, STALE_TOOLTIP)
+    return (name, repo.path, None if clean else STATUS_TOOLTIP)
+
+def foregrounds(repo):
+    """return the foreground of each column. Stale repos are grayed out"""
+    if repo.stale:
+        return (GRAY, GRAY, GRAY)
+    clean = repo.status == "clean"
+    return (None, GREEN if MAIN_BRANCH.search(repo.branch) else BLACK, GREEN if clean else RED)
+
+def branch_status(branch) -> str:
+    """return the status string of a branch w.r.t its upstream"""
+    if branch["gone"]:
+        return "gone"
+    if branch["upstream"] is None:
+        return "local"
+    if branch["ahead"] == branch["behind"] == 0:
+        return "in sync"
+    return f"-{branch['behind']}/+{branch['ahead']}"
+
+def branch_sort_key(branch) -> int:
+    """numeric sort key of the status column of a branch: gone first, then by behind and ahead"""
+    if branch["gone"]:
+        return 10 ** 7
+    return min(branch["behind"] or 0, 999) * 1000 + min(branch["ahead"] or 0, 999)
+
+def render_branch(branch, stale):
+    """return {role: (value of each column)} for a branch, grayed out if its repo is `stale`"""
+    status = branch_status(branch)
+    date   = time.localtime(branch["date"])
+    if stale:
+        foreground = GRAY
+    else:
+        foreground = {"in sync": GREEN, "local": BLACK}.get(status, RED)
+    return {
+        Qt.DisplayRole:    (("* " if branch["current"] else "") + branch["name"],
+                            branch["upstream"] or "",
+                            f"{status}, {time.strftime('%Y-%m-%d', date)}"),
+        Qt.ForegroundRole: (None, None, foreground),
+        Qt.ToolTipRole:    (None, None, f"last commit {time.strftime('%Y-%m-%d %H:%M', date)}"),
+        SORT_ROLE:         (branch["name"], branch["upstream"] or "", branch_sort_key(branch)),
+    }
+
+def render_branches(repo):
+    """return the rendering of every branch of a repo, see `render_branch`"""
+    return [render_branch(branch, repo.stale) for branch in repo.branches or []]
+
+def render(repo):
+    """return {role: (value of each column)} for a repo"""
+    return {
+        Qt.DisplayRole:    (repo.name, repo.branch, repo.status),
+        Qt.ForegroundRole: foregrounds(repo),
+        Qt.ToolTipRole:    tooltips(repo),
+        SORT_ROLE:         (repo.name, repo.branch, status_sort_key(repo)),
+    }
+
+class GroupModel(QtCore.QAbstractItemModel): # pylint: disable=too-many-instance-attributes
+    """
+    Model Group. Repos are top level rows, and their branches (if listed, see
+    branches.py) are child rows. Child indexes carry the id of their repo, which
+    is stable across row insertions and removals, and is mapped back to its row
+    by `positions`
+    """
     def __init__(self, group):
         """Constructor"""
         super().__init__()
-        self.header = ["name", "branch", "status", "path"]
-        self.group = group
+        self.header   = ["name", "branch", "status", "path"]
+        self.next_id  = 0
+        self.group    = list(group)
+        self.rows     = [render(repo) for repo in self.group]
+        self.children = [render_branches(repo) for repo in self.group]
+        self.ids      = [self.new_id() for _ in self.group]
+        self.positions = {}
+        self.reindex()
 
-    def data(self, index, role): # pylint: disable=too-many-return-statements
-        """access model data"""
-        # DisplayRole
-        if role == Qt.DisplayRole:
-            column_name = self.header[index.column()]
-            return self.group[index.row()][column_name]
-
-        # ForeGroundRole
-        if index.isValid() and role == Qt.ForegroundRole:
-            # branch color
-            if index.column() == Column.BRANCH:
-                if re.search(r'master|develop', index.data()):
-                    return QtGui.QBrush(QtCore.Qt.darkGreen)
-                return QtGui.QBrush(QtCore.Qt.black)
-
-            # status color
-            if index.column() == Column.STATUS:
-                if index.data() == "clean":
-                    return QtGui.QBrush(QtCore.Qt.darkGreen)
-                return QtGui.QBrush(QtCore.Qt.darkRed)
-
-        # ToolTipRole
-        if index.isValid() and role == Qt.ToolTipRole:
-            # status tooltip
-            if index.column() == Column.STATUS and index.data() != "clean":
-                return "-:behind\n+:ahead\nu:untracked\ns:staged"
-            if index.column() in [Column.NAME, Column.BRANCH]:
-                return self.group[index.row()]["path"]
+    def reindex(self):
+        """map the id of each repo to its row, after rows were inserted or removed"""
+        self.positions = {repo_id: row for row, repo_id in enumerate(self.ids)}
 
-        return None
+    def new_id(self) -> int:
+        """return a new repo id. 0 is the id of the root"""
+        self.next_id += 1
+        return self.next_id
+
+    def reset(self, group):
+        """replace the whole model data with `group`"""
+        self.beginResetModel()
+        self.group    = list(group)
+        self.rows     = [render(repo) for repo in self.group]
+        self.children = [render_branches(repo) for repo in self.group]
+        self.ids      = [self.new_id() for _ in self.group]
+        self.reindex()
+        self.endResetModel()
 
-    def rowCount(self, _):
-        """number of rows"""
-        return len(self.group)
+    def update(self, group):
+        """
+        Replace the model data with `group`, keyed by repo path. Only rows that
+        were added, removed or changed are signaled to the views, so that sorting,
+        selection, expanded repos and scroll position are preserved. Contiguous
+        rows are signaled together, and changed repos as a single range: each
+        signal makes a sorting proxy model sort again. When the branches of many
+        repos changed, the model is reset instead (see GroupView).
+        """
+        self.remove_rows({repo.path for repo in group})
 
-    def columnCount(self, _):
+        # insert new rows and update changed ones
+        current  = {repo.path for repo in self.group}
+        changed  = []   # ids of the repos whose columns changed
+        children = {}   # id -> rendered branches of the repos whose branches changed
+        row      = 0
+        while row < len(group):
+            repo = group[row]
+            if row < len(self.group) and self.group[row].path == repo.path:
+                if self.update_row(row, repo):
+                    changed.append(self.ids[row])
+                    branches = render_branches(repo)
+                    if branches != self.children[row]:
+                        children[self.ids[row]] = branches
+                row += 1
+            elif repo.path not in current:
+                end = row + 1
+                while end < len(group) and group[end].path not in current:
+                    end += 1
+                self.insert_rows(row, group[row:end])
+                row = end
+            else:
+                # repos were reordered, fallback to a full reset
+                self.reset(group)
+                return
+        if len(self.group) != len(group) or len(children) > MAX_CHILD_UPDATES:
+            # duplicated paths, or too many repos to signal one at a time
+            self.reset(group)
+            return
+        for repo_id, branches in children.items():
+            self.update_children(self.positions[repo_id], branches)
+        if changed:
+            rows = [self.positions[repo_id] for repo_id in changed]
+            self.dataChanged.emit(self.index(min(rows), 0),  # pylint: disable=no-member
+                                  self.index(max(rows), self.columnCount() - 1))
+
+    def remove_rows(self, paths):
+        """remove the repos whose path is not in `paths`, one contiguous block at a time"""
+        last = len(self.group) - 1
+        while last >= 0:
+            if self.group[last].path in paths:
+                last -= 1
+                continue
+            first = last
+            while first > 0 and self.group[first - 1].path not in paths:
+                first -= 1
+            self.beginRemoveRows(QtCore.QModelIndex(), first, last)
+            for rows in (self.group, self.rows, self.children, self.ids):
+                del rows[first:last + 1]
+            self.reindex()
+            self.endRemoveRows()
+            last = first - 1
+
+    def update_row(self, row, repo) -> bool:
+        """
+        replace the repo at `row` with `repo`, a new status of the same path.
+        Return True if it changed
+        """
+        if self.group[row] == repo and self.group[row].stale == repo.stale:
+            # same status, only its profile may have changed. Tooltips are
+            # queried when displayed, no need to signal the views
+            if self.group[row].profile is not repo.profile:
+                self.group[row] = repo
+                self.rows[row][Qt.ToolTipRole] = tooltips(repo)
+            return False
+        self.group[row], self.rows[row] = repo, render(repo)
+        return True
+
+    def insert_rows(self, row, repos):
+        """insert `repos` at `row`"""
+        self.beginInsertRows(QtCore.QModelIndex(), row, row + len(repos) - 1)
+        self.group[row:row]    = repos
+        self.rows[row:row]     = [render(repo) for repo in repos]
+        self.children[row:row] = [render_branches(repo) for repo in repos]
+        self.ids[row:row]      = [self.new_id() for _ in repos]
+        self.reindex()
+        self.endInsertRows()
+
+    def update_children(self, row, new):
+        """replace the rendered branches of the repo at `row` with `new`"""
+        old = self.children[row]
+        if old == new:
+            return
+        parent = self.index(row, 0)
+        if len(new) < len(old):
+            self.beginRemoveRows(parent, len(new), len(old) - 1)
+            del old[len(new):]
+            self.endRemoveRows()
+        elif len(new) > len(old):
+            self.beginInsertRows(parent, len(old), len(new) - 1)
+            old.extend(new[len(old):])
+            self.endInsertRows()
+        changed = [child for child, rendered in enumerate(new) if old[child] != rendered]
+        old[:] = new
+        if changed:
+            self.dataChanged.emit(self.index(min(changed), 0, parent),  # pylint: disable=no-member
+                                  self.index(max(changed), self.columnCount() - 1, parent))
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        """index of a repo, or of a branch of the repo at `parent`"""
+        if not self.hasIndex(row, column, parent):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, self.ids[parent.row()] if parent.isValid() else 0)
+
+    def parent(self, index=None):
+        """parent of a branch is its repo, repos have no parent"""
+        if index is None:
+            # QObject.parent()
+            return super().parent()
+        if not index.isValid() or index.internalId() == 0:
+            return QtCore.QModelIndex()
+        return self.createIndex(self.positions[index.internalId()], 0, 0)
+
+    def data(self, index, role):
+        """access model data"""
+        if not index.isValid():
+            return None
+        if index.internalId() == 0:
+            values = self.rows[index.row()].get(role)
+        else:
+            values = self.children[self.positions[index.internalId()]][index.row()].get(role)
+        return None if values is None else values[index.column()]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """number of repos, or of branches of the repo at `parent`"""
+        if not parent.isValid():
+            return len(self.group)
+        if parent.internalId() == 0 and parent.column() == 0:
+            return len(self.children[parent.row()])
+        return 0
+
+    def columnCount(self, parent=QtCore.QModelIndex()): # pylint: disable=unused-argument
         """number of columns"""
         return len(self.header) - 1  # skip "path" column
 
@@ -97,20 +323,36 @@ class GroupModel(QtCore.QAbstractTableModel):
             return self.header[col]
         return None
 
-class GroupView(QtWidgets.QTableView):
-    """View for group"""
+class GroupView(QtWidgets.QTreeView):
+    """
+    View for group. Repos whose branches are listed can be expanded. Expanded
+    repos, the current repo and the scroll position are kept across resets of
+    the model. They are collapsed while the proxy model sorts, which takes
+    quadratic time when repos are expanded
+    """
     def __init__(self, model, args):
         """constructor"""
         super().__init__()
+        self.group_model = model
+        self.state       = None   # (expanded paths, current path, scroll) before a reset or sort
 
         # enable sorting through a proxy model
         self.setSortingEnabled(True)
         self.proxy_model = QSortFilterProxyModel()
+        self.proxy_model.setSortRole(SORT_ROLE)
         self.proxy_model.setSourceModel(model)
         self.setModel(self.proxy_model)
+        # after the proxy model and this view, which forget expanded repos when reset
+        model.modelAboutToBeReset.connect(self.save_state)  # pylint: disable=no-member
+        model.modelReset.connect(self.restore_state)  # pylint: disable=no-member
+        self.proxy_model.layoutAboutToBeChanged.connect(  # pylint: disable=no-member
+            self.save_state)
+        self.proxy_model.layoutChanged.connect(self.restore_state)  # pylint: disable=no-member
+        self.setUniformRowHeights(True)
+        self.setAlternatingRowColors(True)
 
         # make columns resizable
-        header = self.horizontalHeader()
+        header = self.header()
         modes = [
             QtWidgets.QHeaderView.ResizeToContents,  # name
             QtWidgets.QHeaderView.ResizeToContents,  # branch
@@ -124,3 +366,34 @@ class GroupView(QtWidgets.QTableView):
         default_font_size = default_font.pointSize()
         smaller_font_size = int(default_font_size * args.font_scale)
         self.setFont(QFont("Arial", smaller_font_size))
+
+    def source_index(self, row):
+        """return the index of the view of the repo at `row` of the model"""
+        return self.proxy_model.mapFromSource(self.group_model.index(row, 0))
+
+    def save_state(self):
+        """remember expanded repos, the current repo and the scroll position, then collapse all"""
+        group    = self.group_model.group
+        expanded = {repo.path for row, repo in enumerate(group)
+                    if self.isExpanded(self.source_index(row))}
+        current  = self.proxy_model.mapToSource(self.currentIndex())
+        while current.parent().isValid():
+            current = current.parent()
+        self.state = (expanded, group[current.row()].path if current.isValid() else None,
+                      self.verticalScrollBar().value())
+        if expanded:
+            self.collapseAll()
+
+    def restore_state(self):
+        """expand the remembered repos again, make the remembered repo current and scroll back"""
+        if self.state is None:
+            return
+        (expanded, current, scroll), self.state = self.state, None
+        for row, repo in enumerate(self.group_model.group):
+            if repo.path in expanded:
+                self.setExpanded(self.source_index(row), True)
+            if repo.path == current:
+                # without scrolling to it, which lays out every expanded repo
+                self.selectionModel().setCurrentIndex(self.source_index(row),
+                                                      QItemSelectionModel.NoUpdate)
+        self.verticalScrollBar().setValue(scroll)
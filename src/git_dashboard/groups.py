@@ -18,14 +18,17 @@ Groups is a collection of Group (see group.py). Underlying model is a dictionary
 of groups. E.g.
     groups = {
         "group1": [
-            ["name1", "branch1", "status1", "path1"],
-            ["name2", "branch2", "status2", "path2"],
+            RepoStatus("path1"),
+            RepoStatus("path2"),
             ...
         ],
         "group2": [
-            ["name3", "branch3", "status3", "path3"],
+            RepoStatus("path3"),
         ]
     }
+
+The last tab lists the repos of every group, filtered by text and status (see
+allrepos.py).
 """
 
 from PySide6.QtWidgets import QTabWidget
@@ -34,6 +37,7 @@ from git_dashboard.group import (
     GroupView,
     GroupModel
 )
+from git_dashboard.allrepos import AllReposView
 
 class GroupsView(QTabWidget):
     """View class for groups"""
@@ -46,8 +50,41 @@ class GroupsView(QTabWidget):
         self.setMovable(True)
 
         self.models = {}
+        self.views  = {}
         for name, group in groups.items():
             model = GroupModel(group)
             view  = GroupView(model, args)
             self.addTab(view, name)
             self.models[name] = model
+            self.views[name]  = view
+
+        # after the groups, so that the first group stays the tab shown at startup
+        self.all_repos = AllReposView(groups, args)
+        self.addTab(self.all_repos, "all repos")
+
+    def visible_groups(self):
+        """
+        return the names of the groups shown by the current tab. For the all repos tab,
+        the groups of the repos in view
+        """
+        current = self.currentWidget()
+        if current is self.all_repos:
+            paths = set(self.all_repos.shown_paths())
+            return [name for name, group in self.groups.items()
+                    if any(repo.path in paths for repo in group)]
+        return [name for name, view in self.views.items() if view is current]
+
+    def refresh(self, groups):
+        """update the models of every group, and the all repos tab"""
+        self.groups = groups
+        for name, model in self.models.items():
+            model.update(groups.get(name, []))
+        self.all_repos.refresh(groups)
+
+    def refresh_group(self, name_and_group):
+        """update the model of a single group, and the all repos tab"""
+        name, group = name_and_group
+        self.groups = dict(self.groups, **{name: group})
+        if name in self.models:
+            self.models[name].update(group)
+        self.all_repos.refresh(self.groups)
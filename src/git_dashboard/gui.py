@@ -0,0 +1,166 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Graphical user interface
+
+The main window shows one tab per group, and a status bar with the refresh
+button. Repos are analyzed by a RefreshThread (see refresh.py), or by the
+daemon when attached to it (see daemon.py).
+"""
+
+import sys
+import signal
+
+from PySide6.QtWidgets import (
+    QApplication,
+    QMainWindow,
+    QVBoxLayout,
+    QHBoxLayout,
+    QWidget,
+    QLabel,
+    QPushButton,
+)
+
+from git_dashboard.groups import GroupsView
+from git_dashboard.config import SNAPSHOT
+from git_dashboard.snapshot import Snapshot
+from git_dashboard.refresh import create_refresh_thread, pending
+from git_dashboard.daemon import DaemonClient
+from git_dashboard import client
+
+class MainWindow(QMainWindow):
+    """main window"""
+    def __init__(self, groups_view, refresh_thread):
+        """constructor"""
+        super().__init__()
+        self.refresh_thread = refresh_thread
+        self.last_cycle     = ""
+
+        # status and refresh button packed horizontally
+        self.status = QLabel("Welcome to git-dashboard. Refreshing...")
+        self.button = QPushButton("refresh now")
+        self.button.clicked.connect(self.refresh_button)  # pylint: disable=no-member
+        hlayout = QHBoxLayout()
+        hlayout.addWidget(self.status, 66)
+        hlayout.addWidget(self.button, 33)
+
+        # vertical layout
+        vlayout = QVBoxLayout()
+        vlayout.addWidget(groups_view)
+        vlayout.addLayout(hlayout)
+
+        # dummy container widget
+        widget = QWidget()
+        widget.setLayout(vlayout)
+        self.setCentralWidget(widget)
+
+    def closeEvent(self, event):
+        """gracefully terminate the application by stopping refresh_thread"""
+        self.refresh_thread.request_stop()
+        self.refresh_thread.wait()
+        event.accept()  # let the window close
+
+    def refresh_button(self):
+        """refresh button action"""
+        self.refresh_thread.request_refresh()
+
+    def cycle(self, seconds_and_spawns):
+        """remember the duration of the last refresh cycle"""
+        seconds, spawns = seconds_and_spawns
+        self.last_cycle = f" Last refresh took {seconds:.2f} secs ({spawns} git processes)."
+
+    def tick(self, elapsed_and_num_repos):
+        """update status bar"""
+        elapsed, num_repos = elapsed_and_num_repos
+        self.status.setText(f"Tracking {num_repos} repos.{self.last_cycle} "
+                            f"Refresh in {self.refresh_thread.refresh - elapsed} secs...")
+
+def initial_groups(refresh_thread, snapshot):
+    """
+    return the groups to display at startup, without analyzing any repo: the last
+    known status if there is a snapshot of the configuration, otherwise the repos
+    pending analysis. Either way, they are stale until their first refresh, and
+    the refresh thread starts from them
+    """
+    config = refresh_thread.config
+    config.reload()
+    groups = snapshot.load(config.digest)
+    if groups is not None:
+        refresh_thread.initial = True
+    else:
+        groups = {name: [pending(path) for path in group]
+                  for name, group in config.expand(initial=True).items()}
+    refresh_thread.groups = groups
+    return groups
+
+def gui_mode(args):
+    """start git-dashboard in GUI mode"""
+    # start the app
+    app = QApplication(sys.argv)
+
+    # model and views. When attached to the daemon, it replaces the refresh thread
+    if args.attach:
+        try:
+            groups = client.snapshot(args.socket)
+        except OSError as exc:
+            sys.exit(f"ERROR: Can't attach to daemon at {args.socket}: {exc}")
+        refresh_thread = DaemonClient(args.socket)
+    else:
+        snapshot = Snapshot(SNAPSHOT)
+        refresh_thread = create_refresh_thread(args, snapshot)
+        groups = initial_groups(refresh_thread, snapshot)
+    groups_view = GroupsView(groups, args)
+
+    def refresh_func(groups):
+        """refresh repo status"""
+        groups_view.refresh(groups)
+
+    def visible_func(*_):
+        """refresh the groups of the current tab first"""
+        refresh_thread.set_visible(groups_view.visible_groups())
+
+    # start refresh thread and connect it refresh_func. Each group is updated once it is analyzed
+    refresh_thread.ready.connect(refresh_func)
+    refresh_thread.group_ready.connect(groups_view.refresh_group)
+    groups_view.currentChanged.connect(visible_func)  # pylint: disable=no-member
+    groups_view.all_repos.shown.connect(visible_func)
+    visible_func(groups_view.currentIndex())
+    refresh_thread.start()
+
+    def sigint_handler(*args): # pylint: disable=unused-argument
+        """Handler for the SIGINT signal."""
+        refresh_thread.request_stop()
+        refresh_thread.wait()
+        QApplication.quit()
+
+    # instantiate main window
+    window = MainWindow(groups_view, refresh_thread)
+
+    # update status bar
+    refresh_thread.cycle.connect(window.cycle)
+    refresh_thread.tick.connect(window.tick)
+
+    # capture ctrl-c signal so we can exit gracefully
+    signal.signal(signal.SIGINT, sigint_handler)
+
+    # resize primary window to 1/5 width + 1/2 height
+    size = app.primaryScreen().size()
+    window.resize(size.width()//5, size.height()//2)
+
+    window.show()
+    app.exec()
+    if not args.attach:
+        refresh_thread.engine.shutdown()
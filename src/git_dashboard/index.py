@@ -0,0 +1,135 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Status index
+
+The "all repos" tab (see allrepos.py) lists the repos of every group, filtered
+by text and by status. Instead of matching every row against the filter, repos
+are indexed by status bucket:
+
+    dirty | behind | ahead | untracked | error
+
+and by a lower case search key made of their name, branch and path. A repo
+listed in several groups is indexed once. The index is updated incrementally:
+on each refresh, only the repos whose status changed move between buckets.
+
+A query returns the paths of the repos in any of the selected buckets (every
+repo if none is selected) whose search key contains every word of the text. It
+only scans the selected buckets, and a query narrowing the previous one (e.g.
+one more character typed) only scans the previous results.
+"""
+
+BUCKETS = ("dirty", "behind", "ahead", "untracked", "error")
+
+def repo_buckets(repo) -> tuple:
+    """return the buckets of a repo (a RepoStatus)"""
+    if repo.error is not None:
+        return ("error",)
+    buckets = []
+    if repo.dirty:
+        buckets.append("dirty")
+    if repo.behind:
+        buckets.append("behind")
+    if repo.ahead:
+        buckets.append("ahead")
+    if repo.untracked:
+        buckets.append("untracked")
+    return tuple(buckets)
+
+def search_key(repo) -> str:
+    """return the text that filters are matched against"""
+    return f"{repo.name}\n{repo.branch}\n{repo.path}".lower()
+
+def narrows(old, new) -> bool:
+    """True if every repo matching the words `new` also matches the words `old`"""
+    return all(any(word in other for other in new) for word in old)
+
+class StatusIndex:
+    """Repos of every group, indexed by status bucket and search key"""
+    def __init__(self):
+        """constructor"""
+        self.repos    = {}    # path -> RepoStatus
+        self.keys     = {}    # path -> search key
+        self.order    = {}    # path -> position, in the order repos were first indexed
+        self.buckets  = {bucket: set() for bucket in BUCKETS}
+        self.next_pos = 0
+        self.version  = 0     # incremented whenever buckets or keys change
+        self.last     = None  # (version, selected buckets, words, paths) of the last query
+
+    def __len__(self):
+        """number of indexed repos"""
+        return len(self.repos)
+
+    def update(self, groups) -> set:
+        """
+        index the repos of `groups` ({name: [RepoStatus]}) and return the paths of
+        the repos that were added, removed or replaced since the last update
+        """
+        repos = {}
+        for group in groups.values():
+            for repo in group:
+                repos.setdefault(repo.path, repo)
+        changed = {path for path in self.repos if path not in repos}
+        for path in changed:
+            self.unindex(path)
+            del self.repos[path], self.keys[path], self.order[path]
+            self.version += 1
+        for path, repo in repos.items():
+            old = self.repos.get(path)
+            if old is repo:
+                continue
+            changed.add(path)
+            self.repos[path] = repo
+            if (old is not None and repo_buckets(old) == repo_buckets(repo)
+                    and old.branch == repo.branch):
+                # same buckets and search key, e.g. only its profile changed
+                continue
+            if old is None:
+                self.order[path] = self.next_pos
+                self.next_pos   += 1
+            else:
+                self.unindex(path)
+            for bucket in repo_buckets(repo):
+                self.buckets[bucket].add(path)
+            self.keys[path] = search_key(repo)
+            self.version   += 1
+        return changed
+
+    def unindex(self, path):
+        """remove `path` from every bucket"""
+        for bucket in self.buckets.values():
+            bucket.discard(path)
+
+    def query(self, text="", selected=()) -> list:
+        """
+        return the paths of the repos in any of the `selected` buckets (or of every
+        repo if none is selected) matching every word of `text`, in index order
+        """
+        words    = text.lower().split()
+        selected = frozenset(selected)
+        last     = self.last
+        if last is not None and last[:2] == (self.version, selected) and narrows(last[2], words):
+            # only the previous results can match
+            candidates = last[3]
+        elif selected:
+            matching   = set().union(*(self.buckets[bucket] for bucket in selected))
+            candidates = sorted(matching, key=self.order.get)
+        else:
+            candidates = self.repos
+        keys  = self.keys
+        paths = [path for path in candidates if all(word in keys[path] for word in words)]
+        self.last = (self.version, selected, words, paths)
+        return paths
@@ -0,0 +1,140 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Git performance options
+
+Most of the time of `git status` in a large worktree is spent stat-ing every
+tracked file and enumerating every untracked file. Groups, or single entries of
+a group, can opt into cheaper status in the configuration file:
+
+    git:
+      untracked-files: normal      # all (default) | normal | no
+      untracked-cache: true        # core.untrackedCache
+      fsmonitor: true              # core.fsmonitor: true or the path of a hook
+      ignore-submodules: all       # none (default) | untracked | dirty | all
+      branches: true               # also list every local branch (see branches.py)
+
+With `untracked-files: normal`, untracked directories are counted once instead
+of counting each file they contain. With `no` (which YAML reads as false, also
+accepted), untracked files are not counted.
+`branches` costs one more git process per repo, however many branches it has.
+"""
+
+# repos slower than this (in seconds) to analyze are advised to use options
+SLOW = 0.5
+
+# that many untracked files are worth counting as directories
+MANY_UNTRACKED = 1000
+
+class GitOptions:
+    """options of the git invocations of a repo"""
+    __slots__ = ("untracked_files", "untracked_cache", "fsmonitor", "ignore_submodules", "branches")
+
+    KEYS              = ("untracked-files", "untracked-cache", "fsmonitor", "ignore-submodules",
+                         "branches")
+    UNTRACKED_FILES   = ("all", "normal", "no")
+    IGNORE_SUBMODULES = ("none", "untracked", "dirty", "all")
+
+    def __init__(self, untracked_files="all", untracked_cache=None, fsmonitor=None, # pylint: disable=too-many-arguments
+                 ignore_submodules=None, branches=False):
+        """constructor. None means git's own configuration of the repo is used"""
+        self.untracked_files   = untracked_files
+        self.untracked_cache   = untracked_cache
+        self.fsmonitor         = fsmonitor
+        self.ignore_submodules = ignore_submodules
+        self.branches          = branches
+
+    @classmethod
+    def from_config(cls, section, base=None):
+        """
+        return the options of a `git:` configuration section, on top of the `base` options
+
+        :raises ValueError: unknown key or invalid value
+        """
+        base = base or DEFAULT
+        if not isinstance(section, dict):
+            raise ValueError("git options must be a mapping")
+        unknown = set(section) - set(cls.KEYS)
+        if unknown:
+            raise ValueError(f"unknown git options: {', '.join(sorted(map(str, unknown)))}")
+        untracked_files = section.get("untracked-files", base.untracked_files)
+        if untracked_files is False:
+            # YAML reads an unquoted `no` as false
+            untracked_files = "no"
+        options = cls(
+            untracked_files,
+            section.get("untracked-cache", base.untracked_cache),
+            section.get("fsmonitor", base.fsmonitor),
+            section.get("ignore-submodules", base.ignore_submodules),
+            section.get("branches", base.branches),
+        )
+        if options.untracked_files not in cls.UNTRACKED_FILES:
+            raise ValueError(f"untracked-files must be one of {', '.join(cls.UNTRACKED_FILES)}"
+                             " (quoted, if YAML reads it as another type)")
+        if options.ignore_submodules not in cls.IGNORE_SUBMODULES + (None,):
+            raise ValueError(f"ignore-submodules must be one of {', '.join(cls.IGNORE_SUBMODULES)}")
+        if options.untracked_cache not in (True, False, None):
+            raise ValueError("untracked-cache must be true or false")
+        if not isinstance(options.fsmonitor, (bool, str, type(None))):
+            raise ValueError("fsmonitor must be true, false or the path of a hook")
+        if not isinstance(options.branches, bool):
+            raise ValueError("branches must be true or false")
+        return options
+
+    def config(self) -> list:
+        """return the `-c name=value` arguments of git"""
+        args = []
+        if self.untracked_cache is not None:
+            args += ["-c", f"core.untrackedCache={str(self.untracked_cache).lower()}"]
+        if self.fsmonitor is not None:
+            value = self.fsmonitor
+            if isinstance(value, bool):
+                value = str(value).lower()
+            args += ["-c", f"core.fsmonitor={value}"]
+        return args
+
+    def status(self) -> list:
+        """return the options of git status"""
+        args = [f"--untracked-files={self.untracked_files}"]
+        if self.ignore_submodules is not None:
+            args.append(f"--ignore-submodules={self.ignore_submodules}")
+        return args
+
+    def advise(self, repo) -> list:
+        """return the options that would speed up the analysis of `repo`, a profiled RepoStatus"""
+        if repo.profile is None or repo.error is not None:
+            return []
+        slow   = repo.profile.total >= SLOW
+        advice = []
+        if self.untracked_files == "all" and (repo.untracked or 0) >= MANY_UNTRACKED:
+            advice.append("untracked-files: normal")
+        if slow and self.untracked_cache is None:
+            advice.append("untracked-cache: true")
+        if slow and self.fsmonitor is None:
+            advice.append("fsmonitor: true")
+        return advice
+
+    def __eq__(self, other):
+        """two options are equal if all their fields are"""
+        if not isinstance(other, GitOptions):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __hash__(self):
+        """hash of all fields"""
+        return hash(tuple(getattr(self, slot) for slot in self.__slots__))
+
+DEFAULT = GitOptions()
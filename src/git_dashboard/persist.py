@@ -0,0 +1,42 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Persisted JSON files
+
+The status snapshot (see snapshot.py), the discovery cache (see discovery.py)
+and the ahead/behind memo (see aheadbehind.py) are only optimizations: they are
+written atomically, so that a concurrent reader or a crash never leaves a
+truncated file behind, and failing to write them is not an error.
+"""
+
+import os
+import json
+
+def save_json(filename, data) -> bool:
+    """atomically replace `filename` with `data` as compact JSON. Return False if it failed"""
+    tmp = f"{filename}.{os.getpid()}"
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as out:
+            json.dump(data, out, separators=(",", ":"))
+        os.replace(tmp, filename)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return False
+    return True
@@ -0,0 +1,130 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Process pool analysis backend
+
+Parsing the output of git runs under the GIL, in the same process as the Qt
+event loop. With this backend, repos are analyzed in worker processes instead,
+so that parsing scales across cores and never delays painting:
+
+- repos are sharded across workers by path, so that each repo is always
+  analyzed by the same worker, whose ahead/behind memo (see aheadbehind.py)
+  stays warm
+- workers are started once and kept between refresh cycles
+- results are RepoStatus (see status.py), which pickle compactly thanks to
+  their `__slots__`
+
+The engine (see engine.py) keeps scheduling, deadlines and caching: each of
+its threads waits for one repo analyzed by a worker. Cancelling kills the git
+processes of every worker.
+"""
+
+import os
+import time
+import signal
+import threading
+import multiprocessing
+from concurrent.futures import (
+    CancelledError,
+    ProcessPoolExecutor,
+)
+
+from git_dashboard.config import analyze
+from git_dashboard.status import (
+    RepoStatus,
+    GitProcesses,
+)
+from git_dashboard.aheadbehind import AheadBehindCache, DEFAULT_SIZE
+
+# how often (in seconds) workers check for cancellation
+POLL = 0.1
+
+# git processes and ahead/behind memo of the current worker process
+WORKER = {}
+
+def watch(cancelled, processes):
+    """worker thread: kill the git processes of the worker as long as the refresh is `cancelled`"""
+    while True:
+        cancelled.wait()
+        while cancelled.is_set():
+            processes.cancel()
+            processes.resume()
+            time.sleep(POLL)
+
+def start_worker(cancelled, memo_size):
+    """initialize a worker process"""
+    # the parent process handles ctrl-c
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    WORKER["processes"] = GitProcesses()
+    WORKER["memo"]      = AheadBehindCache(memo_size) if memo_size > 0 else None
+    threading.Thread(target=watch, args=(cancelled, WORKER["processes"]), daemon=True).start()
+
+def analyze_in_worker(path, timeout, options):
+    """analyze a repo in a worker process"""
+    return analyze(path, timeout, WORKER["processes"], options, WORKER["memo"])
+
+def ping():
+    """do nothing, used to start a worker"""
+
+class ProcessBackend:
+    """Analyze repos in `workers` processes, each memoizing `memo_size` ahead/behind counts"""
+    def __init__(self, workers=os.cpu_count() or 1, memo_size=DEFAULT_SIZE):
+        """constructor. Workers are started in the background right away"""
+        # worker processes must not inherit the threads of Qt, hence they are spawned, not forked
+        context        = multiprocessing.get_context("spawn")
+        self.cancelled = context.Event()
+        self.shards    = [ProcessPoolExecutor(1, context, start_worker, (self.cancelled, memo_size))
+                          for _ in range(max(1, workers))]
+        self.lock      = threading.Lock()
+        self.pending   = set()  # futures submitted to the workers and not done yet
+        self.spawned   = 0      # number of git processes started by the workers so far
+        for shard in self.shards:
+            shard.submit(ping)
+
+    def analyze(self, path, timeout, options):
+        """analyze a repo in its worker and return its RepoStatus"""
+        shard  = self.shards[hash(path) % len(self.shards)]
+        future = shard.submit(analyze_in_worker, path, timeout, options)
+        with self.lock:
+            self.pending.add(future)
+        try:
+            result = future.result()
+        except CancelledError:
+            result = RepoStatus(path, error="cancelled")
+        finally:
+            with self.lock:
+                self.pending.discard(future)
+        if result.profile is not None:
+            with self.lock:
+                self.spawned += result.profile.spawns
+        return result
+
+    def cancel(self):
+        """kill the git processes of every worker, and skip the repos they didn't start yet"""
+        self.cancelled.set()
+        with self.lock:
+            for future in self.pending:
+                future.cancel()
+
+    def resume(self):
+        """accept new work after `cancel()`"""
+        self.cancelled.clear()
+
+    def shutdown(self):
+        """kill the git processes of every worker and stop them"""
+        self.cancel()
+        for shard in self.shards:
+            shard.shutdown(wait=False)
@@ -0,0 +1,313 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Background refresh loop
+
+The RefreshThread analyzes every configured repo every `refresh` seconds and
+signals the results to the GUI (see gui.py) or the daemon (see daemon.py). In
+between, repos are re-analyzed as soon as they change (watch mode), when
+they are due (adaptive scheduler), or when a background fetch moved their
+remote-tracking refs (see fetch.py).
+
+The GUI tells the thread which groups are visible. They are analyzed first,
+and every group is signaled as soon as its own repos are analyzed, without
+waiting for the others. Hidden groups are only refreshed every `background`
+seconds, and when they are shown again.
+"""
+
+import time
+import math
+import threading
+
+from PySide6.QtCore import (
+    Signal,
+    QThread,
+)
+
+from git_dashboard.config import (
+    DISCOVERY_CACHE,
+    Configuration,
+)
+from git_dashboard.engine import create_engine
+from git_dashboard.options import GitOptions
+from git_dashboard.fingerprint import AnalysisCache
+from git_dashboard.discovery import DiscoveryCache
+from git_dashboard.scheduler import Scheduler
+from git_dashboard.fetch import FetchScheduler
+from git_dashboard.watcher import create_watcher
+from git_dashboard.status import RepoStatus
+
+def pending(path):
+    """return the status of a repo that was not analyzed yet"""
+    repo = RepoStatus(path, error="pending")
+    repo.stale = True
+    return repo
+
+def waiting_groups(paths, names, todo):
+    """
+    return ({name: paths of `todo` in the group}, {path of `todo`: names of its groups})
+    for the groups `names` of `paths`
+    """
+    waiting = {name: set(paths[name]).intersection(todo) for name in names}
+    owners  = {}
+    for name, left in waiting.items():
+        for path in left:
+            owners.setdefault(path, []).append(name)
+    return waiting, owners
+
+class RefreshThread(QThread): # pylint: disable=too-many-instance-attributes
+    """Separate thread used to query git repos in the background"""
+    ready       = Signal(object)   # Signal must be class, not instance member
+    group_ready = Signal(object)   # (name, [RepoStatus]) of a group, once its repos are analyzed
+    tick        = Signal(object)   # Signal must be class, not instance member
+    cycle       = Signal(object)   # (seconds, git processes) of the last full refresh cycle
+    def __init__(self, config, refresh, engine, watcher=None, scheduler=None, snapshot=None, # pylint: disable=too-many-arguments
+                 fetcher=None, background=None):
+        """
+        constructor.
+        If `snapshot` is given (see snapshot.py), the latest results are persisted to it.
+        If `fetcher` is given (see fetch.py), remotes are fetched in the background.
+        Hidden groups are refreshed every `background` seconds (0=only when shown,
+        default=`refresh`)
+        """
+        super().__init__()
+        self.config     = config
+        self.refresh    = refresh
+        self.background = refresh if background is None else background
+        self.engine     = engine
+        self.watcher    = watcher
+        self.scheduler  = scheduler
+        self.snapshot   = snapshot
+        self.fetcher    = fetcher
+        self.groups     = {}     # results to start from, e.g. loaded from a snapshot
+        self.visible    = None   # names of the visible groups, None if every group is
+        self.names      = []     # names of the groups, in configuration order
+        self.refreshed  = {}     # group name -> time its last refresh started
+        self.shown      = False  # groups not refreshed recently were shown
+        self.initial    = False  # display warnings about invalid repos in the first cycle
+        self.watching   = False  # the watcher was given the repos to watch
+        self.stop       = False
+        self.force      = False
+        self.wakeup     = threading.Event()
+
+    def request_stop(self):
+        """stop the thread as soon as possible, cancelling in-flight work"""
+        self.stop = True
+        self.engine.cancel()
+        self.wakeup.set()
+
+    def request_refresh(self):
+        """start a full refresh now, cancelling in-flight work"""
+        self.force = True
+        self.engine.cancel()
+        self.wakeup.set()
+
+    def set_visible(self, names):
+        """
+        set the names of the visible groups (None if every group is). Visible groups
+        not refreshed for `refresh` seconds are refreshed right away
+        """
+        self.visible = None if names is None else frozenset(names)
+        if self.overdue():
+            self.shown = True
+            self.wakeup.set()
+
+    def is_visible(self, name) -> bool:
+        """True if the group `name` is visible"""
+        visible = self.visible
+        return visible is None or name in visible
+
+    def overdue(self, names=None) -> list:
+        """return the visible groups (among `names` if given) not refreshed for `refresh` seconds"""
+        now = time.monotonic()
+        # both are replaced, not updated: they are read from the GUI thread
+        refreshed = self.refreshed
+        return [name for name in (self.names if names is None else names)
+                if self.is_visible(name) and now - refreshed.get(name, -math.inf) >= self.refresh]
+
+    def due(self, names) -> list:
+        """
+        return the groups to refresh in a full cycle, visible ones first. With the adaptive
+        scheduler, every group is, as each repo has its own schedule
+        """
+        now     = time.monotonic()
+        visible = [name for name in names if self.is_visible(name)]
+        hidden  = [name for name in names if not self.is_visible(name) and (
+                   self.scheduler is not None or (self.background > 0 and
+                   now - self.refreshed.get(name, -math.inf) >= self.background))]
+        return visible + hidden
+
+    def reanalyze(self, paths):
+        """re-analyze `paths` and return {path: result}"""
+        paths  = sorted(paths)
+        status = {}
+        results = self.engine.refresh_timed(paths, self.config.options)
+        for path, (result, elapsed) in zip(paths, results):
+            status[path] = result
+            if self.scheduler is not None:
+                self.scheduler.record(path, result, elapsed)
+        return status
+
+    def stream(self, paths, tracked):
+        """analyze `paths` and yield (path, result) as soon as each repo is done"""
+        if self.scheduler is None:
+            yield from self.engine.stream(paths, self.config.options, tracked)
+            return
+        for path, (result, elapsed) in self.engine.collect(paths, False, self.config.options):
+            self.scheduler.record(path, result, elapsed)
+            yield path, result
+
+    def analyze(self, groups, names=None):
+        """
+        refresh the groups `names`, or the groups that are due in a full refresh cycle,
+        visible ones first. Each group is signaled as soon as its repos are analyzed.
+        Other groups keep their results from `groups`. With the adaptive scheduler, a
+        full cycle only analyzes the repos that are due (including the newly added ones)
+        """
+        initial, self.initial = self.initial, False
+        paths   = self.config.expand(initial)
+        tracked = list(dict.fromkeys(path for group in paths.values() for path in group))
+        due     = None
+        if self.scheduler is not None:
+            self.scheduler.update(tracked)
+            if names is None:
+                due = set(self.scheduler.due())
+        names = self.due(paths) if names is None else [name for name in names if name in paths]
+        todo  = [path for path in dict.fromkeys(path for name in names for path in paths[name])
+                 if due is None or path in due]
+        self.started(paths, names)
+
+        # groups still waiting for some of their repos
+        waiting, owners = waiting_groups(paths, names, todo)
+        status = {repo.path: repo for group in groups.values() for repo in group}
+        for path, result in self.stream(todo, tracked):
+            status[path] = result
+            for name in owners[path]:
+                waiting[name].discard(path)
+                if not waiting[name] and not self.stop and not self.force:
+                    self.group_ready.emit((name, [status[member] for member in paths[name]]))
+        return {name: [status.get(path) or pending(path) for path in group]
+                for name, group in paths.items()}
+
+    def started(self, paths, names):
+        """record that the groups `names` of `paths` ({name: [path]}) are being refreshed"""
+        refreshed = {name: started for name, started in self.refreshed.items() if name in paths}
+        refreshed.update(dict.fromkeys(names, time.monotonic()))
+        self.refreshed, self.names = refreshed, list(paths)
+
+    def idle(self, groups):
+        """
+        wait for one second. In watch mode, re-analyze the repos that changed in
+        the meantime. With the adaptive scheduler, re-analyze repos that are due.
+        Return the updated groups
+        """
+        changed  = set()
+        deadline = time.monotonic() + 1
+        while not self.stop and not self.force and not self.shown and time.monotonic() < deadline:
+            # wait in short steps to stay responsive to stop/refresh requests
+            if self.watcher is None:
+                self.wakeup.wait(deadline - time.monotonic())
+            else:
+                changed.update(self.watcher.wait(min(0.25, max(0, deadline - time.monotonic()))))
+        if self.scheduler is not None:
+            changed.update(self.scheduler.due())
+        if self.fetcher is not None:
+            changed.update(self.fetcher.poll())
+        if self.shown and not self.stop and not self.force:
+            # refresh the groups that were just shown
+            self.shown = False
+            self.wakeup.clear()
+            analyzed = self.analyze(groups, self.overdue())
+            self.track(analyzed)
+            if self.stop or self.force:
+                return groups
+            groups = analyzed
+            self.publish(groups)
+        if not changed or self.stop or self.force:
+            return groups
+        status  = self.reanalyze(changed)
+        updated = {name: [status.get(repo.path, repo) for repo in group]
+                   for name, group in groups.items()}
+        if updated != groups and not self.stop and not self.force:
+            self.publish(updated)
+        return updated
+
+    def track(self, groups):
+        """
+        watch and fetch the repos of `groups`, after each analysis: expanding the
+        configuration consumes the repos discovered or removed since the last one
+        """
+        paths     = [repo.path for group in groups.values() for repo in group]
+        discovery = self.config.discovery
+        # only (un)watch repos when some were added or removed
+        if self.watcher is not None and (discovery is None or discovery.added or
+                                         discovery.removed or not self.watching):
+            self.watching = True
+            self.watcher.update(paths)
+        if self.fetcher is not None:
+            self.fetcher.update(paths)
+
+    def publish(self, groups):
+        """send new results to the views, and persist them"""
+        self.ready.emit(groups)
+        if self.snapshot is not None:
+            self.snapshot.save(groups, self.config.digest)
+
+    def run(self):
+        """thread run method"""
+        groups = self.groups
+        while not self.stop:
+            forced, self.force = self.force, False
+            self.wakeup.clear()
+            self.engine.resume()
+            self.shown = False
+            if forced:
+                self.engine.invalidate()
+                if self.scheduler is not None:
+                    self.scheduler.reset()
+            start, spawned = time.monotonic(), self.engine.spawned
+            analyzed = self.analyze(groups)
+            self.track(analyzed)
+            if self.stop or self.force:
+                # cancelled while analyzing, results are incomplete
+                continue
+            groups = analyzed
+            self.publish(groups)
+            self.cycle.emit((time.monotonic() - start, self.engine.spawned - spawned))
+            # wait for `refresh` seconds, or until stop is issued
+            elapsed   = 0
+            num_repos = sum(map(len, groups.values()))
+            while not self.stop and not self.force and elapsed < self.refresh:
+                groups = self.idle(groups)
+                elapsed += 1
+                self.tick.emit((elapsed, num_repos))
+        if self.watcher is not None:
+            self.watcher.close()
+        if self.fetcher is not None:
+            self.fetcher.shutdown()
+
+def create_refresh_thread(args, snapshot=None):
+    """return the refresh thread configured by the command line arguments"""
+    cache     = AnalysisCache(args.full_rescan) if args.incremental else None
+    engine    = create_engine(args, cache)
+    config    = Configuration(args.config, DiscoveryCache(DISCOVERY_CACHE),
+                              GitOptions(branches=args.branches))
+    watcher   = create_watcher() if args.watch else None
+    scheduler = Scheduler(args.min_interval, args.max_interval) if args.adaptive else None
+    fetcher   = (FetchScheduler(args.fetch_interval, args.fetch_jobs)
+                 if args.fetch_interval > 0 else None)
+    return RefreshThread(config, args.refresh, engine, watcher, scheduler, snapshot, fetcher,
+                         args.background_refresh)
@@ -0,0 +1,106 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Fast git repo scanner
+
+Used to crawl large directory trees (e.g. $HOME) for git repos. Directories are
+listed with `os.scandir` by a pool of worker threads, without recursion, and
+repos are streamed back as soon as they are found:
+
+- a directory containing a `.git` directory or file (worktrees, submodules) is
+  a repo, and is not descended into
+- symlinks are not followed
+- directories whose name match a prune pattern (fnmatch syntax) are skipped
+"""
+
+import os
+import fnmatch
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    wait,
+    FIRST_COMPLETED,
+)
+
+# directories that are expensive to crawl and are very unlikely to contain repos we want to track
+DEFAULT_PRUNE = [
+    "node_modules", "__pycache__", ".venv", "venv", "virtualenv", ".tox", ".nox", "site-packages",
+    ".cache", ".npm", ".cargo", ".rustup", ".gradle", ".m2", ".Trash",
+]
+
+DEFAULT_WORKERS = 8
+
+def is_pruned(name, prune):
+    """return True if directory `name` matches one of the `prune` patterns"""
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in prune)
+
+def is_git_entry(entry) -> bool:
+    """
+    return True if the os.DirEntry `entry` makes its directory a repo: a `.git`
+    directory for regular repos, or a `.git` file for worktrees and submodules
+    """
+    return entry.name == ".git" and (entry.is_dir() or entry.is_file())
+
+def list_directory(dirname, prune):
+    """
+    list a single directory, skipping subdirectories matching `prune` patterns.
+    Return (is_repo, subdirectories)
+    """
+    subdirs = []
+    try:
+        with os.scandir(dirname) as entries:
+            for entry in entries:
+                try:
+                    if is_git_entry(entry):
+                        return True, []
+                    if entry.is_dir(follow_symlinks=False) and not is_pruned(entry.name, prune):
+                        subdirs.append(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        # skip directories where we don't have permission
+        pass
+    return False, subdirs
+
+def scan(root, prune=None, maxdepth=-1, workers=DEFAULT_WORKERS, progress=None): # pylint: disable=too-many-arguments
+    """
+    Generator of the git repos found under `root`, in no particular order.
+
+    :param prune: list of directory name patterns to skip (default: DEFAULT_PRUNE)
+    :param maxdepth: don't descend below this depth (-1 means no limit)
+    :param workers: number of directories listed concurrently
+    :param progress: called as `progress(directories_scanned, repos_found)` after each directory
+    """
+    prune = DEFAULT_PRUNE if prune is None else prune
+    root = os.fspath(root)
+    if os.path.islink(root):
+        return
+    scanned = found = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scan") as executor:
+        pending = {executor.submit(list_directory, root, prune): (root, 0)}
+        while pending:
+            for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                dirname, depth = pending.pop(future)
+                is_repo, subdirs = future.result()
+                scanned += 1
+                if is_repo:
+                    found += 1
+                    yield dirname
+                elif depth != maxdepth:
+                    for subdir in subdirs:
+                        pending[executor.submit(list_directory, subdir, prune)] = (
+                            subdir, depth + 1)
+                if progress is not None:
+                    progress(scanned, found)
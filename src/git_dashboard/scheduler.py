@@ -0,0 +1,113 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Adaptive refresh scheduler
+
+Every repo has its own refresh interval and next due time, kept in a priority
+queue:
+
+- repos that changed since their previous analysis, or are dirty, are
+  refreshed every `min_interval` seconds
+- idle repos back off exponentially, up to `max_interval` seconds
+- repos that fail to be analyzed back off faster, and repos that are slow to
+  analyze are penalized in proportion to their analysis time
+"""
+
+import time
+import heapq
+
+# repos slower than this (in seconds) to analyze get their interval stretched
+SLOW = 1.0
+
+class Schedule: # pylint: disable=too-few-public-methods
+    """scheduling state of a single repo"""
+    __slots__ = ("interval", "due", "failures", "result")
+
+    def __init__(self, interval, due):
+        """constructor"""
+        self.interval = interval
+        self.due      = due
+        self.failures = 0
+        self.result   = None
+
+class Scheduler:
+    """Priority queue of repos ordered by their next due time"""
+    def __init__(self, min_interval, max_interval):
+        """constructor"""
+        self.min_interval = max(1, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.repos = {}   # repo path -> Schedule
+        self.queue = []   # heap of (due, path). Outdated entries are skipped when popped
+
+    def push(self, path, due):
+        """schedule `path` at time `due`"""
+        self.repos[path].due = due
+        heapq.heappush(self.queue, (due, path))
+
+    def update(self, paths):
+        """set the repos being scheduled. New repos are due immediately"""
+        paths = set(paths)
+        for path in set(self.repos) - paths:
+            del self.repos[path]
+        now = time.monotonic()
+        for path in paths - set(self.repos):
+            self.repos[path] = Schedule(self.min_interval, now)
+            self.push(path, now)
+
+    def reset(self):
+        """make every repo due immediately, e.g. when the user asks for a refresh"""
+        now = time.monotonic()
+        self.queue = []
+        for path, schedule in self.repos.items():
+            schedule.interval = self.min_interval
+            self.push(path, now)
+
+    def due(self):
+        """pop and return all the repos that are due"""
+        now   = time.monotonic()
+        paths = []
+        while self.queue and self.queue[0][0] <= now:
+            due, path = heapq.heappop(self.queue)
+            schedule  = self.repos.get(path)
+            # skip repos no longer tracked, rescheduled since or already popped
+            if schedule is not None and schedule.due == due:
+                schedule.due = None
+                paths.append(path)
+        return paths
+
+    def record(self, path, result, elapsed):
+        """record the `result` of analyzing `path` in `elapsed` seconds and schedule it again"""
+        schedule = self.repos.get(path)
+        if schedule is None:
+            return
+        if result.error == "cancelled":
+            # not a property of the repo, try again as soon as possible
+            self.push(path, time.monotonic())
+            return
+        if result.error is not None:
+            schedule.failures += 1
+            interval = schedule.interval * 2 ** min(schedule.failures, 4)
+        elif result != schedule.result or result.dirty:
+            schedule.failures = 0
+            interval = self.min_interval
+        else:
+            schedule.failures = 0
+            interval = schedule.interval * 2
+        if elapsed > SLOW:
+            interval *= elapsed / SLOW
+        schedule.interval = min(max(interval, self.min_interval), self.max_interval)
+        schedule.result   = result
+        self.push(path, time.monotonic() + schedule.interval)
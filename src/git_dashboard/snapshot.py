@@ -0,0 +1,73 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Persistent status snapshot
+
+The last known status of every group is saved to a JSON file, so that the GUI
+can show it as soon as it starts, marked as stale, while the first refresh runs
+in the background:
+
+    {
+        "digest": sha1 of the configuration file the snapshot was taken with,
+        "groups": {name: [record, ...]}    see RepoStatus.to_dict
+    }
+
+A snapshot taken with a different configuration is ignored, as its groups may
+not match the configured ones.
+"""
+
+import json
+
+from git_dashboard.status import RepoStatus
+from git_dashboard.persist import save_json
+
+class Snapshot:
+    """Last known status of every group, persisted as JSON"""
+    def __init__(self, filename):
+        """constructor"""
+        self.filename = filename
+        self.groups   = None   # groups last loaded or saved
+
+    def load(self, digest):
+        """
+        return the saved groups of RepoStatus, marked as stale, or None if there
+        is no snapshot taken with configuration `digest`
+        """
+        try:
+            with open(self.filename, "r", encoding="utf-8") as inp:
+                snapshot = json.load(inp)
+            if snapshot["digest"] != digest:
+                return None
+            groups = {name: [RepoStatus.from_dict(record) for record in group]
+                      for name, group in snapshot["groups"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        for group in groups.values():
+            for repo in group:
+                repo.stale = True
+        self.groups = groups
+        return groups
+
+    def save(self, groups, digest):
+        """persist `groups` of RepoStatus taken with configuration `digest`, if they changed"""
+        if groups == self.groups:
+            return
+        snapshot = {
+            "digest": digest,
+            "groups": {name: [repo.to_dict() for repo in group] for name, group in groups.items()},
+        }
+        if save_json(self.filename, snapshot):
+            self.groups = groups
@@ -0,0 +1,395 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Git status backend
+
+The complete status of a repo is obtained from a single call to:
+
+    git status --porcelain=v2 --branch -z --untracked-files=all
+
+whose output is parsed as a stream of NUL terminated records:
+
+    # branch.oid <commit> | (initial)
+    # branch.head <branch> | (detached)
+    # branch.upstream <upstream>
+    # branch.ab +<ahead> -<behind> | +? -?
+    1 <XY> <sub> <mH> <mI> <mW> <hH> <hI> <path>
+    2 <XY> <sub> <mH> <mI> <mW> <hH> <hI> <X><score> <path> NUL <orig_path>
+    u <XY> <sub> <m1> <m2> <m3> <mW> <h1> <h2> <h3> <path>
+    ? <path>
+
+See `git help status` for details.
+
+With an AheadBehindCache (see aheadbehind.py), git status is run with
+`--no-ahead-behind`, which only tells whether the branch and its upstream
+differ (`+? -?`). Their counts are then looked up by (HEAD, upstream) commit
+pair, and only computed on a miss, by:
+
+    git rev-list --left-right --count <HEAD>...<upstream>
+"""
+
+import os
+import signal
+import threading
+import subprocess
+
+from git_dashboard.timing import Profile
+from git_dashboard.options import DEFAULT
+from git_dashboard.fingerprint import upstream_oid
+
+# size of the chunks read from git's stdout
+CHUNK_SIZE = 64 * 1024
+
+# don't take optional locks (e.g. index refresh) so we never compete with the user's own git
+# commands, and never prompt for credentials (see fetch.py)
+GIT_ENV = dict(os.environ, GIT_OPTIONAL_LOCKS="0", GIT_TERMINAL_PROMPT="0")
+
+class NotAGitRepoError(Exception):
+    """path is not the top level directory of a git repo"""
+
+class GitStatusError(Exception):
+    """git status failed"""
+
+class GitTimeoutError(GitStatusError):
+    """git was killed because it didn't finish in time"""
+
+class GitCancelledError(GitStatusError):
+    """git was killed, or not started, because the refresh was cancelled"""
+
+def kill(proc):
+    """
+    kill a git process along with its children (hooks, fsmonitor, ...), which
+    may otherwise keep its stdout open
+    """
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except OSError:
+        # already gone
+        pass
+
+# errors that may go away by themselves, hence their results must not be cached
+TRANSIENT_ERRORS = ("timeout", "cancelled")
+
+class GitProcesses:
+    """
+    Registry of in-flight git processes, so that they can all be killed at once
+    when a refresh is cancelled (e.g. on shutdown or when the user asks for a
+    refresh now). Once cancelled, no new process is started until `resume()`.
+    """
+    def __init__(self):
+        """constructor"""
+        self.lock      = threading.Lock()
+        self.running   = set()
+        self.cancelled = False
+        self.spawned   = 0   # number of processes started so far
+
+    def spawn(self, cmd):
+        """start and register a process"""
+        with self.lock:
+            if self.cancelled:
+                raise GitCancelledError(cmd)
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, # pylint: disable=consider-using-with
+                                    stderr=subprocess.PIPE, env=GIT_ENV,
+                                    start_new_session=os.name == "posix")
+            self.running.add(proc)
+            self.spawned += 1
+            return proc
+
+    def release(self, proc):
+        """unregister a finished process"""
+        with self.lock:
+            self.running.discard(proc)
+
+    def cancel(self):
+        """kill every running process, and refuse to start new ones"""
+        with self.lock:
+            self.cancelled = True
+            for proc in self.running:
+                kill(proc)
+
+    def resume(self):
+        """allow processes to be started again"""
+        with self.lock:
+            self.cancelled = False
+
+class RepoStatus: # pylint: disable=too-many-instance-attributes
+    """
+    Status of a single repo. `ahead` and `behind` are None when the branch has no
+    upstream, and `error` is None unless the repo could not be analyzed. The
+    status string displayed to the user is computed once, at construction:
+
+        clean | (clean|dirty)[/-<behind>/+<ahead>]/u<untracked>/s<staged> | <error>
+    """
+    FIELDS    = ("name", "path", "branch", "dirty", "ahead", "behind", "untracked", "staged",
+                 "error", "status")
+    # how the status was obtained is not part of it: its `profile` (see timing.py),
+    # and whether it is `stale`, i.e. loaded from a previous run (see snapshot.py)
+    __slots__ = FIELDS + ("branches", "profile", "stale")
+
+    def __init__(self, path, branch="n/a", dirty=False, ahead=None, behind=None, # pylint: disable=too-many-arguments
+                 untracked=0, staged=0, error=None):
+        """constructor"""
+        self.name      = os.path.basename(path)
+        self.path      = path
+        self.branch    = branch
+        self.dirty     = dirty
+        self.ahead     = ahead
+        self.behind    = behind
+        self.untracked = untracked
+        self.staged    = staged
+        self.error     = error
+        self.status    = self.format()
+        self.branches  = None   # every local branch, if asked for (see branches.py)
+        self.profile   = None
+        self.stale     = False
+
+    def format(self) -> str:
+        """return the status string"""
+        if self.error is not None:
+            return self.error
+        status = ["dirty" if self.dirty else "clean"]
+        # ahead/behind w.r.t to upstream ref
+        if self.ahead is not None:
+            status += [f"-{self.behind}", f"+{self.ahead}"]
+        # untracked files are not counted with `untracked-files: no` (see options.py)
+        if self.untracked is not None:
+            status.append(f"u{self.untracked}")
+        status.append(f"s{self.staged}")
+        joined_status = "/".join(status)
+        # simplify the clean case
+        if joined_status in ["clean/-0/+0/u0/s0", "clean/u0/s0", "clean/-0/+0/s0", "clean/s0"]:
+            return "clean"
+        return joined_status
+
+    @property
+    def transient(self) -> bool:
+        """True if the repo could not be analyzed for reasons that may go away by themselves"""
+        return self.error in TRANSIENT_ERRORS
+
+    def __eq__(self, other):
+        """two statuses are equal if all their fields and branches are"""
+        if not isinstance(other, RepoStatus):
+            return NotImplemented
+        return (all(getattr(self, field) == getattr(other, field) for field in self.FIELDS)
+                and self.branches == other.branches)
+
+    def __hash__(self):
+        """hash of the repo path"""
+        return hash(self.path)
+
+    def __repr__(self):
+        """representation for debugging"""
+        return f"RepoStatus({self.path!r}, {self.branch!r}, {self.status!r})"
+
+    def to_dict(self, profile=False) -> dict:
+        """return the status as a JSON serializable dict, with its profile if `profile`"""
+        result = {
+            "name": self.name, "branch": self.branch, "status": self.status, "path": self.path,
+            "dirty": self.dirty, "ahead": self.ahead, "behind": self.behind,
+            "untracked": self.untracked, "staged": self.staged, "error": self.error,
+        }
+        if self.branches is not None:
+            result["branches"] = self.branches
+        if profile:
+            result["profile"] = None if self.profile is None else self.profile.to_dict()
+        return result
+
+    @classmethod
+    def from_dict(cls, record):
+        """return a status from the output of `to_dict`, e.g. received from the daemon"""
+        result = cls(
+            record["path"], record["branch"], record["dirty"], record["ahead"], record["behind"],
+            record["untracked"], record["staged"], record["error"],
+        )
+        result.branches = record.get("branches")
+        if record.get("profile") is not None:
+            result.profile = Profile.from_dict(record["profile"])
+        return result
+
+def is_git_repo(path) -> bool:
+    """return True if `path` is the top level directory of a git worktree"""
+    # `.git` is a directory for regular repos, and a file for worktrees and submodules
+    return os.path.exists(os.path.join(path, ".git"))
+
+def records(stream):
+    """split a binary stream into NUL terminated records without reading it all at once"""
+    pending = b""
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        pending += chunk
+        *complete, pending = pending.split(b"\0")
+        yield from complete
+    if pending:
+        yield pending
+
+def branch_ab(value):
+    """
+    parse the value of a `branch.ab` header into (ahead, behind, diverged).
+    With `--no-ahead-behind`, counts are `?` when the branch and its upstream differ
+    """
+    if value == "+? -?":
+        return None, None, True
+    ahead, behind = value.split()
+    return int(ahead), -int(behind), False
+
+def parse(stream) -> dict:
+    """
+    parse the output of `git status --porcelain=v2 --branch -z` and return:
+    {oid, branch, detached, upstream, ahead, behind, diverged, modified, staged, untracked}
+    where `ahead` and `behind` are None when there is no upstream to compare with, or when
+    they were not counted (`--no-ahead-behind`) and the branch `diverged` from its upstream
+    """
+    result = {
+        "oid": None, "branch": None, "detached": False, "upstream": None,
+        "ahead": None, "behind": None, "diverged": False,
+        "modified": 0, "staged": 0, "untracked": 0,
+    }
+    entries = records(stream)
+    for record in entries:
+        kind = record[:1]
+        if kind == b"?":
+            result["untracked"] += 1
+        elif kind in (b"1", b"2"):
+            # XY: X is the index (staged) state, Y is the worktree state, '.' means unchanged
+            if record[2:3] != b".":
+                result["staged"] += 1
+            if record[3:4] != b".":
+                result["modified"] += 1
+            if kind == b"2":
+                next(entries, None)  # skip the original path of a rename/copy
+        elif kind == b"u":
+            # an unmerged path has conflicts in the worktree, and its stages in the index
+            # differ from HEAD, hence it counts as both modified and staged
+            result["staged"]   += 1
+            result["modified"] += 1
+        elif kind == b"#":
+            key, _, value = record[2:].decode("utf-8", "surrogateescape").partition(" ")
+            if key == "branch.oid":
+                result["oid"] = None if value == "(initial)" else value
+            elif key == "branch.head":
+                result["detached"] = value == "(detached)"
+                result["branch"]   = None if result["detached"] else value
+            elif key == "branch.upstream":
+                result["upstream"] = value
+            elif key == "branch.ab":
+                result["ahead"], result["behind"], result["diverged"] = branch_ab(value)
+    return result
+
+def run_git(path, args, parse_output, timeout=None, processes=None, profile=None): # pylint: disable=too-many-arguments
+    """
+    run `git -C <path> <args>` and return `parse_output(stdout)`. git is killed
+    if it runs for more than `timeout` seconds, or if `processes` is cancelled.
+    Time spent is recorded in `profile` (see timing.py) if given.
+
+    :raises GitTimeoutError: git didn't finish in time
+    :raises GitCancelledError: the refresh was cancelled
+    :raises GitStatusError: git returned an error
+    """
+    cmd  = ["git", "-C", path] + args
+    proc = GitProcesses().spawn(cmd) if processes is None else processes.spawn(cmd)
+    if profile is not None:
+        profile.spawned()
+        profile.step("spawn")
+    expired = threading.Event()
+    def expire():
+        expired.set()
+        kill(proc)
+    timer = None
+    if timeout:
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+    error = None
+    try:
+        with proc:
+            try:
+                result = parse_output(proc.stdout)
+            except ValueError as exc:
+                # truncated output of a killed process
+                error = exc
+            if profile is not None:
+                profile.step("status")
+            stderr = proc.stderr.read()
+    finally:
+        if profile is not None:
+            profile.step("wait")
+        if timer is not None:
+            timer.cancel()
+        if processes is not None:
+            processes.release(proc)
+    if expired.is_set():
+        raise GitTimeoutError(path)
+    if processes is not None and processes.cancelled:
+        raise GitCancelledError(path)
+    if proc.returncode != 0 or error is not None:
+        raise GitStatusError(stderr.decode("utf-8", "replace").strip() or str(error))
+    return result
+
+def count_commits(stream):
+    """parse the output of `git rev-list --left-right --count` into (left, right)"""
+    left, right = stream.read().split()
+    return int(left), int(right)
+
+def ahead_behind(path, info, timeout=None, processes=None, memo=None):
+    """
+    fill in the ahead/behind counts of a diverged branch in `info` (see `parse`), looking
+    them up in `memo` (see aheadbehind.py) by commit pair, and walking the graph on a miss.
+    Return True if git was run
+    """
+    upstream = upstream_oid(path, info["upstream"])
+    counts   = None if upstream is None else memo.get(info["oid"], upstream)
+    if counts is None:
+        # an upstream that can't be resolved from the ref files is compared by name, not memoized
+        commits = f"{info['oid']}...{upstream or '@{upstream}'}"
+        args    = ["rev-list", "--left-right", "--count", commits]
+        counts  = run_git(path, args, count_commits, timeout, processes)
+        if upstream is not None:
+            memo.put(info["oid"], upstream, counts)
+        info["ahead"], info["behind"] = counts
+        return True
+    info["ahead"], info["behind"] = counts
+    return False
+
+def git_status(path, timeout=None, processes=None, profile=None, options=DEFAULT, memo=None): # pylint: disable=too-many-arguments
+    """
+    return the status of the git repo at `path` (see `parse`) using a single git process
+    with git `options` (see options.py). See `run_git` for `timeout`, `processes` and `profile`.
+    If `memo` is given (see aheadbehind.py), ahead/behind counts are memoized by commit pair,
+    at the cost of a second git process when they are not known yet
+
+    :raises NotAGitRepoError: `path` is not a git repo
+    :raises GitStatusError: git returned an error, timed out or was cancelled
+    """
+    is_repo = is_git_repo(path)
+    if profile is not None:
+        profile.step("check")
+    if not is_repo:
+        raise NotAGitRepoError(path)
+    args = options.config() + ["status", "--porcelain=v2", "--branch", "-z"] + options.status()
+    if memo is None:
+        return run_git(path, args, parse, timeout, processes, profile)
+    info = run_git(path, args + ["--no-ahead-behind"], parse, timeout, processes, profile)
+    if info["diverged"]:
+        walked = ahead_behind(path, info, timeout, processes, memo)
+        if profile is not None:
+            if walked:
+                profile.spawned()
+            profile.step("ahead-behind")
+    return info
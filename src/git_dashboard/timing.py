@@ -0,0 +1,86 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Lightweight instrumentation of the analysis of a repo
+
+A Profile records the wall time spent in each step of the analysis, and the
+number of git processes spawned. Steps are consecutive: each call to `step()`
+closes the step that started with the previous call:
+
+    check           is the path a git repo
+    spawn           start git
+    status          read and parse the output of git, i.e. most of git's own run time
+    wait            wait for git to exit
+    ahead-behind    look up or count commits ahead/behind upstream (see aheadbehind.py)
+    branches        list every local branch, if asked for (see branches.py)
+    parse           turn the parsed output into a RepoStatus
+"""
+
+import time
+
+class Profile:
+    """Wall time per analysis step, and number of git processes spawned"""
+    __slots__ = ("steps", "spawns", "start", "last", "advice")
+
+    def __init__(self):
+        """constructor"""
+        self.steps  = {}   # step name -> seconds
+        self.spawns = 0
+        self.advice = []   # git options that would make the analysis faster, see options.py
+        self.start  = self.last = time.perf_counter()
+
+    def step(self, name):
+        """close step `name`, which started at the end of the previous step"""
+        now = time.perf_counter()
+        self.steps[name] = self.steps.get(name, 0.0) + now - self.last
+        self.last = now
+
+    def spawned(self):
+        """count a git process"""
+        self.spawns += 1
+
+    @property
+    def total(self) -> float:
+        """seconds from the creation of the profile to the end of the last step"""
+        return self.last - self.start
+
+    def format(self) -> str:
+        """one line summary for humans"""
+        steps = ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in self.steps.items())
+        summary = f"analyzed in {self.total * 1000:.1f}ms, {self.spawns} git process(es): {steps}"
+        if self.advice:
+            summary += f" (try {', '.join(self.advice)})"
+        return summary
+
+    @classmethod
+    def from_dict(cls, record):
+        """return a profile from the output of `to_dict`"""
+        profile = cls()
+        profile.start  = 0.0
+        profile.last   = record["total"]
+        profile.spawns = record["spawns"]
+        profile.steps  = dict(record["steps"])
+        profile.advice = list(record.get("advice", []))
+        return profile
+
+    def to_dict(self) -> dict:
+        """return the profile as a JSON serializable dict, in seconds"""
+        return {
+            "total":  round(self.total, 6),
+            "spawns": self.spawns,
+            "steps":  {name: round(seconds, 6) for name, seconds in self.steps.items()},
+            "advice": self.advice,
+        }
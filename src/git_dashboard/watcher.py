@@ -0,0 +1,254 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Filesystem watchers
+
+A watcher reports which of the tracked repos changed, so only those repos need
+to be re-analyzed. Bursts of events (e.g. a commit or a checkout) are debounced
+and coalesced into a single set of repo paths.
+
+- InotifyWatcher: Linux only. Watches the git directory, its refs and the
+  worktree directories of every repo, except dependency and cache directories
+  (see scanner.DEFAULT_PRUNE) and the directories ignored by the top-level
+  .gitignore. Edits below them only show up on the next full refresh.
+- PollingWatcher: portable fallback. Compares repo fingerprints (see
+  fingerprint.py) periodically, hence it doesn't notice edits of tracked files
+  until the next full refresh.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from git_dashboard.fingerprint import (
+    fingerprint,
+    git_dirs,
+)
+from git_dashboard.scanner import DEFAULT_PRUNE, is_pruned
+
+# wait until no event arrived for DEBOUNCE seconds, but never more than MAX_DELAY seconds
+DEBOUNCE  = 0.25
+MAX_DELAY = 2.0
+
+# inotify constants, see `man inotify`
+IN_MODIFY      = 0x00000002
+IN_ATTRIB      = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ONLYDIR     = 0x01000000
+IN_ISDIR       = 0x40000000
+IN_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+           IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+EVENT = struct.Struct("iIII")
+
+def ignored_dirs(repo):
+    """
+    return the directory name patterns ignored at any depth, and those only ignored at
+    the top of the worktree of `repo`, from the "name/" lines of its top-level .gitignore
+    """
+    anywhere, top = [], []
+    try:
+        with open(os.path.join(repo, ".gitignore"), "r", encoding="utf-8") as inp:
+            lines = [line.strip() for line in inp]
+    except (OSError, UnicodeDecodeError):
+        return anywhere, top
+    if any(line.startswith("!") for line in lines):
+        # a negation could include files back, pruning would miss their changes
+        return anywhere, top
+    for line in lines:
+        if not line.endswith("/") or line.startswith("#"):
+            continue
+        name = line.rstrip("/")
+        if name.startswith("/"):
+            name = name[1:]
+            if "/" not in name and "**" not in name and name:
+                top.append(name)
+        elif "/" not in name and "**" not in name and name:
+            anywhere.append(name)
+    return anywhere, top
+
+class PollingWatcher:
+    """Detect changed repos by comparing their fingerprints every `interval` seconds"""
+    def __init__(self, interval=2.0):
+        """constructor"""
+        self.interval     = interval
+        self.fingerprints = {}
+        self.last_poll    = time.monotonic()
+
+    def update(self, paths):
+        """set the repos being watched"""
+        self.fingerprints = {path: self.fingerprints.get(path) or fingerprint(path)
+                             for path in paths}
+
+    def wait(self, timeout):
+        """wait up to `timeout` seconds and return the set of repos that changed"""
+        time.sleep(max(0, min(timeout, self.last_poll + self.interval - time.monotonic())))
+        if time.monotonic() - self.last_poll < self.interval:
+            return set()
+        self.last_poll = time.monotonic()
+        changed = set()
+        for path, previous in self.fingerprints.items():
+            current = fingerprint(path)
+            if current != previous:
+                self.fingerprints[path] = current
+                changed.add(path)
+        return changed
+
+    def close(self):
+        """release resources"""
+        self.fingerprints = {}
+
+class InotifyWatcher:
+    """
+    Detect changed repos through Linux inotify events. Worktree directories matching
+    `prune` (default: scanner.DEFAULT_PRUNE) are not watched
+    """
+    def __init__(self, prune=None):
+        """constructor"""
+        self.libc       = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.inotify_fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.inotify_fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.prune   = DEFAULT_PRUNE if prune is None else prune
+        self.watches = {}    # watch descriptor -> (repo path, directory, prune, prune below)
+        self.repos   = {}    # repo path -> set of watch descriptors
+        self.full    = False # True once the kernel ran out of watches
+
+    def add_watch(self, repo, dirname, prune=(), below=None):
+        """
+        watch a single directory on behalf of `repo`. Directories created in it are
+        watched unless they match `prune`, and so are their sub-directories unless they
+        match `below` (default: `prune`)
+        """
+        watch = self.libc.inotify_add_watch(self.inotify_fd, os.fsencode(dirname), IN_MASK)
+        if watch < 0:
+            if ctypes.get_errno() == errno.ENOSPC and not self.full:
+                self.full = True
+                print("WARNING: Out of inotify watches. Some changes will only show up on the next "
+                      "refresh", file=sys.stderr)
+            return
+        self.watches[watch] = (repo, dirname, prune, prune if below is None else below)
+        self.repos[repo].add(watch)
+
+    def add_tree(self, repo, root, prune=(), top=()):
+        """
+        watch `root` and all its sub-directories, skipping symlinks, .git and directories
+        matching `prune`, or matching `top` right below `root`
+        """
+        stack = [(root, list(prune) + list(top))]
+        while stack and not self.full:
+            dirname, skip = stack.pop()
+            self.add_watch(repo, dirname, skip, prune)
+            try:
+                with os.scandir(dirname) as entries:
+                    for entry in entries:
+                        if (entry.name != ".git" and not is_pruned(entry.name, skip)
+                                and entry.is_dir(follow_symlinks=False)):
+                            stack.append((entry.path, prune))
+            except OSError:
+                pass
+
+    def add_repo(self, repo):
+        """watch the git directory, refs and worktree of `repo`"""
+        self.repos[repo] = set()
+        git_dir, common_dir = git_dirs(repo)
+        self.add_watch(repo, git_dir)
+        self.add_tree(repo, os.path.join(common_dir, "refs"))
+        ignored, top = ignored_dirs(repo)
+        self.add_tree(repo, repo, list(self.prune) + ignored, top)
+
+    def remove_repo(self, repo):
+        """stop watching `repo`"""
+        for watch in self.repos.pop(repo, set()):
+            self.libc.inotify_rm_watch(self.inotify_fd, watch)
+            self.watches.pop(watch, None)
+
+    def update(self, paths):
+        """set the repos being watched"""
+        paths = set(paths)
+        for repo in set(self.repos) - paths:
+            self.remove_repo(repo)
+        for repo in sorted(paths - set(self.repos)):
+            self.add_repo(repo)
+
+    def read_events(self, changed):
+        """read all pending events and add the affected repos to `changed`"""
+        while True:
+            try:
+                buf = os.read(self.inotify_fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(buf):
+                watch, mask, _, length = EVENT.unpack_from(buf, offset)
+                name = buf[offset + EVENT.size:offset + EVENT.size + length].rstrip(b"\0")
+                offset += EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    changed.update(self.repos)
+                    continue
+                if watch not in self.watches:
+                    continue
+                repo, dirname, prune, below = self.watches[watch]
+                if mask & IN_IGNORED:
+                    del self.watches[watch]
+                    self.repos.get(repo, set()).discard(watch)
+                    continue
+                changed.add(repo)
+                # start watching directories created inside the worktree
+                name = os.fsdecode(name)
+                if (mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and name != ".git"
+                        and not is_pruned(name, prune)):
+                    self.add_tree(repo, os.path.join(dirname, name), below)
+
+    def wait(self, timeout):
+        """wait up to `timeout` seconds and return the set of repos that changed"""
+        changed = set()
+        if not select.select([self.inotify_fd], [], [], timeout)[0]:
+            return changed
+        # coalesce bursts of events
+        start = time.monotonic()
+        while True:
+            self.read_events(changed)
+            remaining = MAX_DELAY - (time.monotonic() - start)
+            if remaining <= 0 or not select.select([self.inotify_fd], [], [],
+                                                   min(DEBOUNCE, remaining))[0]:
+                return changed
+
+    def close(self):
+        """release resources"""
+        os.close(self.inotify_fd)
+        self.watches = {}
+        self.repos   = {}
+
+def create_watcher():
+    """return an inotify watcher if available, otherwise a polling watcher"""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher()
@@ -0,0 +1,98 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the memoized ahead/behind counts, against the counts of git itself
+"""
+
+import os
+import subprocess
+
+import pytest
+
+from git_dashboard.aheadbehind import AheadBehindCache
+from git_dashboard.status import git_status
+
+def git(path, *args) -> str:
+    """run git in `path` and return its output"""
+    cmd = ["git", "-c", "user.name=test", "-c", "user.email=test@example.com",
+           "-c", "init.defaultBranch=main", "-C", str(path)] + list(args)
+    return subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip()
+
+def commit(path, message):
+    """commit an empty change"""
+    git(path, "commit", "-q", "--allow-empty", "-m", message)
+
+@pytest.fixture(name="clone")
+def fixture_clone(tmp_path):
+    """a clone 2 commits ahead of and 1 commit behind its upstream origin/main"""
+    origin = tmp_path / "origin"
+    git(tmp_path, "init", "-q", str(origin))
+    commit(origin, "first")
+    clone = tmp_path / "clone"
+    git(tmp_path, "clone", "-q", str(origin), str(clone))
+    commit(clone, "mine")
+    commit(clone, "mine again")
+    commit(origin, "theirs")
+    git(clone, "fetch", "-q")
+    return clone
+
+def counts(path, memo=None):
+    """return (ahead, behind) as reported by git_status"""
+    info = git_status(str(path), memo=memo)
+    return info["ahead"], info["behind"]
+
+def test_memoized(clone):
+    """counts are computed once, then looked up"""
+    memo = AheadBehindCache()
+    assert counts(clone, memo) == counts(clone) == (2, 1)
+    assert counts(clone, memo) == (2, 1)
+    assert (memo.hits, memo.misses) == (1, 1)
+
+def test_included_config(clone):
+    """the upstream is configured in an included file"""
+    git(clone, "config", "--unset", "branch.main.remote")
+    git(clone, "config", "--unset", "branch.main.merge")
+    included = os.path.join(str(clone), ".git", "branches.cfg")
+    git(clone, "config", "-f", included, "branch.main.remote", "origin")
+    git(clone, "config", "-f", included, "branch.main.merge", "refs/heads/main")
+    git(clone, "config", "include.path", "branches.cfg")
+    memo = AheadBehindCache()
+    assert counts(clone, memo) == counts(clone) == (2, 1)
+    assert counts(clone, memo) == (2, 1)
+    assert memo.hits == 1
+
+def test_fetch_refspec(clone):
+    """the upstream is not at refs/remotes/<remote>/<branch>, which holds another commit"""
+    git(clone, "config", "remote.origin.fetch", "+refs/heads/*:refs/remotes/mirror/*")
+    git(clone, "fetch", "-q")
+    git(clone, "update-ref", "refs/remotes/origin/main", "HEAD~2")
+    assert counts(clone, AheadBehindCache()) == counts(clone) == (2, 1)
+
+def test_local_upstream(clone):
+    """a branch whose upstream is another local branch (branch.<name>.remote = .)"""
+    git(clone, "checkout", "-q", "-b", "topic", "--track", "main")
+    commit(clone, "topic")
+    git(clone, "reset", "-q", "--hard", "HEAD~2")
+    commit(clone, "topic again")
+    assert counts(clone, AheadBehindCache()) == counts(clone) == (1, 1)
+
+def test_packed_upstream(clone):
+    """the upstream ref is only in packed-refs"""
+    git(clone, "pack-refs", "--all")
+    memo = AheadBehindCache()
+    assert counts(clone, memo) == counts(clone) == (2, 1)
+    assert counts(clone, memo) == (2, 1)
+    assert memo.hits == 1
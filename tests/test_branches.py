@@ -0,0 +1,67 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the `git for-each-ref` branch parser
+"""
+
+import io
+
+from git_dashboard.branches import parse_branch, parse_branches
+
+def line(head, name, upstream="", track="", date="1700000000"):
+    """return a line of `git for-each-ref --format=<FORMAT>`"""
+    return "\0".join((head, f"refs/heads/{name}", upstream, track, date))
+
+def test_in_sync():
+    """the current branch, in sync with its upstream"""
+    assert parse_branch(line("*", "main", "origin/main")) == {
+        "name": "main", "current": True, "upstream": "origin/main",
+        "ahead": 0, "behind": 0, "gone": False, "date": 1700000000,
+    }
+
+def test_ahead_behind():
+    """either part of the track field may be missing"""
+    for track, counts in (("ahead 3", (3, 0)), ("behind 2", (0, 2)),
+                          ("ahead 3, behind 2", (3, 2))):
+        branch = parse_branch(line(" ", "topic", "origin/topic", track))
+        assert not branch["current"]
+        assert (branch["ahead"], branch["behind"]) == counts
+
+def test_no_upstream():
+    """branches without upstream have no counts"""
+    branch = parse_branch(line(" ", "local"))
+    assert branch["upstream"] is None
+    assert (branch["ahead"], branch["behind"], branch["gone"]) == (None, None, False)
+
+def test_gone():
+    """the upstream of the branch no longer exists"""
+    branch = parse_branch(line(" ", "merged", "origin/merged", "gone"))
+    assert branch["gone"]
+    assert branch["upstream"] == "origin/merged"
+    assert (branch["ahead"], branch["behind"]) == (None, None)
+
+def test_names():
+    """branch names keep their slashes, and dates may be missing"""
+    branch = parse_branch(line(" ", "feature/x", date=""))
+    assert (branch["name"], branch["date"]) == ("feature/x", 0)
+
+def test_parse_branches():
+    """one branch per line, in order, undecodable names are kept"""
+    output = "\n".join((line("*", "main"), line(" ", "caf\xe9"))) + "\n"
+    stream = io.BytesIO(output.encode("latin-1"))
+    branches = parse_branches(stream)
+    assert [branch["name"] for branch in branches] == ["main", "caf\udce9"]
+    assert parse_branches(io.BytesIO(b"")) == []
@@ -0,0 +1,118 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the JSON document and NDJSON records of the command line
+"""
+
+import json
+import argparse
+
+from git_dashboard.cli import RecordPrinter, print_groups, cycle_summary, stream_cycle
+from git_dashboard.status import RepoStatus
+from git_dashboard.timing import Profile
+
+def printed(capsys) -> list:
+    """return the records printed since the last call"""
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+def test_changed_only(capsys):
+    """a record is only printed again when it changed"""
+    printer = RecordPrinter()
+    assert printer.update({"work": ["/a", "/b"]}) == ["/a", "/b"]
+    printer.print("/a", RepoStatus("/a", "main"))
+    printer.print("/b", RepoStatus("/b", "main"))
+    assert [(record["path"], record["status"]) for record in printed(capsys)] == [
+        ("/a", "clean"), ("/b", "clean")]
+    printer.print("/a", RepoStatus("/a", "main"))
+    assert not printed(capsys)
+    printer.print("/a", RepoStatus("/a", "main", dirty=True))
+    assert [record["status"] for record in printed(capsys)] == ["dirty/u0/s0"]
+
+def test_groups(capsys):
+    """records list the groups of the repo, and are printed again when they change"""
+    printer = RecordPrinter()
+    printer.update({"work": ["/a"], "all": ["/a"]})
+    printer.print("/a", RepoStatus("/a", "main"))
+    assert printed(capsys)[0]["groups"] == ["work", "all"]
+    printer.update({"work": ["/a"]})
+    printer.print("/a", RepoStatus("/a", "main"))
+    assert printed(capsys)[0]["groups"] == ["work"]
+
+def test_removed(capsys):
+    """repos no longer tracked are reported once"""
+    printer = RecordPrinter()
+    printer.update({"work": ["/a", "/b"]})
+    printer.print("/a", RepoStatus("/a", "main"))
+    printer.print("/b", RepoStatus("/b", "main"))
+    capsys.readouterr()
+    assert printer.update({"work": ["/a"]}) == ["/a"]
+    assert printed(capsys) == [{"path": "/b", "removed": True}]
+    printer.update({"work": ["/a"]})
+    assert not printed(capsys)
+
+def test_profile(capsys):
+    """with profiles, a record isn't printed again when only its profile changed"""
+    printer = RecordPrinter(profile=True)
+    printer.update({"work": ["/a"]})
+    repo = RepoStatus("/a", "main")
+    repo.profile = Profile()
+    repo.profile.spawned()
+    printer.print("/a", repo)
+    record = printed(capsys)[0]
+    assert record["profile"]["spawns"] == 1
+    repo = RepoStatus("/a", "main")
+    repo.profile = Profile()
+    printer.print("/a", repo)
+    assert not printed(capsys)
+
+def test_without_profile(capsys):
+    """records have no profile unless asked for"""
+    printer = RecordPrinter()
+    printer.update({"work": ["/a"]})
+    printer.print("/a", RepoStatus("/a", "main"))
+    assert "profile" not in printed(capsys)[0]
+
+def test_document(capsys):
+    """with profiles, the JSON document has a groups and a profile section"""
+    repo = RepoStatus("/a", "main")
+    repo.profile = Profile()
+    print_groups({"work": [repo]})
+    assert json.loads(capsys.readouterr().out) == {"work": [repo.to_dict()]}
+    summary = cycle_summary(1.5, 2, [repo])
+    print_groups({"work": [repo]}, True, summary)
+    document = json.loads(capsys.readouterr().out)
+    assert document["profile"] == summary
+    assert summary["slowest"][0]["path"] == "/a"
+    assert document["groups"]["work"][0]["profile"]["spawns"] == 0
+
+class FakeEngine: # pylint: disable=too-few-public-methods
+    """engine returning clean repos"""
+    spawned = 0
+
+    @staticmethod
+    def stream(paths, _):
+        """yield each path with its status"""
+        for path in paths:
+            yield path, RepoStatus(path, "main")
+
+def test_cycle_record(capsys):
+    """with profiles, a summary record follows the records of each cycle"""
+    printer = RecordPrinter(profile=True)
+    paths   = printer.update({"work": ["/a", "/b"]})
+    stream_cycle(argparse.Namespace(profile=True), FakeEngine(), printer, paths, {})
+    records = printed(capsys)
+    assert [record.get("path") for record in records] == ["/a", "/b", None]
+    assert records[-1]["profile"]["repos"] == 2
@@ -0,0 +1,118 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the compiled configuration and its exclusions
+"""
+
+import os
+
+import pytest
+
+from git_dashboard.config import Configuration, Exclusions
+from git_dashboard.discovery import DiscoveryCache
+
+def test_exact():
+    """an exact path only excludes itself"""
+    excludes = Exclusions(["/home/john/nasa/proj2"])
+    assert "/home/john/nasa/proj2" in excludes
+    assert "/home/john/nasa/proj22" not in excludes
+    assert "/home/john/nasa/proj2/sub" not in excludes
+
+def test_prefix():
+    """a trailing / excludes the directory and everything below it"""
+    excludes = Exclusions(["/home/john/nasa/archive/"])
+    assert "/home/john/nasa/archive" in excludes
+    assert "/home/john/nasa/archive/proj1" in excludes
+    assert "/home/john/nasa/archive/2020/proj1" in excludes
+    assert "/home/john/nasa/archived" not in excludes
+    assert "/home/john/nasa" not in excludes
+
+def test_glob():
+    """glob patterns are matched against the whole path"""
+    excludes = Exclusions(["/home/john/nasa/*-old", "/home/john/tmp?"])
+    assert "/home/john/nasa/proj1-old" in excludes
+    assert "/home/john/nasa/proj1-older" not in excludes
+    assert "/home/john/tmp1" in excludes
+    assert "/home/john/tmp" not in excludes
+
+def test_combined():
+    """every kind of pattern applies at once"""
+    excludes = Exclusions(["/a/exact", "/a/prefix/", "/a/*.bak"])
+    assert excludes
+    assert all(path in excludes for path in ["/a/exact", "/a/prefix/x", "/a/x.bak"])
+    assert "/a/other" not in excludes
+
+def test_empty():
+    """no pattern excludes nothing"""
+    excludes = Exclusions([])
+    assert not excludes
+    assert "/" not in excludes
+
+@pytest.fixture(name="home")
+def fixture_home(tmp_path):
+    """repos under work/ and nasa/"""
+    for path in ["work/app", "work/lib", "nasa/proj1", "nasa/proj2", "nasa/archive/old"]:
+        os.makedirs(tmp_path / path / ".git")
+    return tmp_path
+
+def write_config(home, content):
+    """write the configuration file of `home` and return its path"""
+    filename = home / "config.yaml"
+    filename.write_text(content.format(home=home))
+    return str(filename)
+
+@pytest.mark.parametrize("discovery", [None, DiscoveryCache()], ids=["scandir", "cached"])
+def test_expand(home, discovery, capsys):
+    """groups are expanded into repos, skipping exclusions and invalid directories"""
+    config = Configuration(write_config(home, """
+work:
+  - {home}/work
+nasa:
+  - {home}/nasa
+  - "!{home}/nasa/proj2"
+  - {home}/missing
+"""), discovery)
+    paths = config.expand(initial=True)
+    assert paths == {
+        "work": [str(home / "work" / "app"), str(home / "work" / "lib")],
+        "nasa": [str(home / "nasa" / "proj1")],
+    }
+    warnings = capsys.readouterr()
+    assert not warnings.out
+    assert "proj2" in warnings.err and "missing" in warnings.err
+    # warnings are only displayed initially
+    config.expand()
+    assert not capsys.readouterr().err
+
+def test_reload(home):
+    """the file is only parsed again when its content changes"""
+    filename = write_config(home, "work:\n  - {home}/work\n")
+    config = Configuration(filename)
+    assert config.reload()
+    assert not config.reload()
+    digest = config.digest
+    # same content, new mtime
+    os.utime(filename, ns=(0, 0))
+    assert not config.reload()
+    assert config.digest == digest
+    write_config(home, "work:\n  - {home}/work\n  - \"!{home}/work/lib\"\n")
+    assert config.reload()
+    assert config.digest != digest
+    assert config.expand() == {"work": [str(home / "work" / "app")]}
+
+def test_empty_config(home):
+    """an empty configuration has no groups"""
+    assert not Configuration(write_config(home, "")).expand()
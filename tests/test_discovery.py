@@ -0,0 +1,124 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the cached directory listings used for repo discovery
+"""
+
+import os
+import json
+
+from git_dashboard.discovery import DiscoveryCache, RACY_NS, VERSION
+
+def set_mtime(path, mtime_ns):
+    """set the mtime of `path`"""
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def make_repo(path, git_file=False):
+    """create a fake repo: a directory with a .git directory, or a .git file"""
+    os.makedirs(path)
+    if git_file:
+        with open(os.path.join(path, ".git"), "w", encoding="utf-8") as out:
+            out.write("gitdir: elsewhere\n")
+    else:
+        os.mkdir(os.path.join(path, ".git"))
+
+def test_listing_reused(tmp_path):
+    """a listing taken well after the directory mtime is reused until the mtime changes"""
+    past = os.stat(tmp_path).st_mtime_ns - 10 * RACY_NS
+    set_mtime(tmp_path, past)
+    cache = DiscoveryCache()
+    assert cache.listdir(str(tmp_path)) == (False, [])
+    (tmp_path / "new").mkdir()
+    set_mtime(tmp_path, past)
+    assert cache.listdir(str(tmp_path)) == (False, [])
+    set_mtime(tmp_path, past + 1)
+    assert cache.listdir(str(tmp_path)) == (False, ["new"])
+
+def test_racy_listing(tmp_path):
+    """a listing taken within RACY_NS of the directory mtime is not trusted"""
+    cache = DiscoveryCache()
+    mtime = os.stat(tmp_path).st_mtime_ns
+    assert cache.listdir(str(tmp_path)) == (False, [])
+    # changed again within the mtime granularity of the filesystem
+    (tmp_path / "new").mkdir()
+    set_mtime(tmp_path, mtime)
+    assert cache.listdir(str(tmp_path)) == (False, ["new"])
+
+def test_git_entries(tmp_path):
+    """repos have a .git directory, or a .git file for worktrees and submodules"""
+    make_repo(str(tmp_path / "repo"))
+    make_repo(str(tmp_path / "worktree"), git_file=True)
+    (tmp_path / "other" / "nested").mkdir(parents=True)
+    make_repo(str(tmp_path / "other" / "nested" / "deep"))
+    cache = DiscoveryCache()
+    assert cache.listdir(str(tmp_path / "repo")) == (True, [])
+    assert cache.listdir(str(tmp_path / "worktree")) == (True, [])
+    # configured directories are expanded one level deep
+    assert cache.expand(str(tmp_path)) == [str(tmp_path / "repo"), str(tmp_path / "worktree")]
+    assert cache.find_repos(str(tmp_path)) == [
+        str(tmp_path / "other" / "nested" / "deep"),
+        str(tmp_path / "repo"),
+        str(tmp_path / "worktree"),
+    ]
+
+def test_invalid_directory(tmp_path):
+    """a configured directory that doesn't exist expands to None"""
+    assert DiscoveryCache().expand(str(tmp_path / "missing")) is None
+
+def test_persisted_delta(tmp_path):
+    """repos added and removed since the previous run are known after a reload"""
+    work     = tmp_path / "work"
+    filename = str(tmp_path / "cache" / "discovery.json")
+    make_repo(str(work / "old"))
+    cache = DiscoveryCache(filename)
+    cache.begin_pass()
+    assert cache.expand(str(work)) == [str(work / "old")]
+    cache.end_pass()
+    assert os.path.exists(filename)
+
+    os.rename(work / "old", work / "new")
+    cache = DiscoveryCache(filename)
+    cache.begin_pass()
+    assert cache.expand(str(work)) == [str(work / "new")]
+    cache.end_pass()
+    assert cache.added == {str(work / "new")}
+    assert cache.removed == {str(work / "old")}
+
+def test_unvisited_forgotten(tmp_path):
+    """directories not visited in a pass are dropped from the cache"""
+    make_repo(str(tmp_path / "a" / "repo"))
+    make_repo(str(tmp_path / "b" / "repo"))
+    cache = DiscoveryCache()
+    cache.begin_pass()
+    cache.expand(str(tmp_path / "a"))
+    cache.expand(str(tmp_path / "b"))
+    cache.end_pass()
+    cache.begin_pass()
+    cache.expand(str(tmp_path / "a"))
+    cache.end_pass()
+    assert set(cache.repos) == {str(tmp_path / "a")}
+    assert all(path.startswith(str(tmp_path / "a")) for path in cache.listings)
+
+def test_other_version_discarded(tmp_path):
+    """a cache written by another version, or not a cache at all, is ignored"""
+    filename = tmp_path / "discovery.json"
+    listings = {str(tmp_path): [0, RACY_NS, False, []]}
+    filename.write_text(json.dumps({"version": VERSION - 1, "listings": listings, "repos": {}}))
+    assert not DiscoveryCache(str(filename)).listings
+    filename.write_text(json.dumps({"version": VERSION, "listings": listings, "repos": {}}))
+    assert DiscoveryCache(str(filename)).listings == listings
+    filename.write_text("[]")
+    assert not DiscoveryCache(str(filename)).listings
@@ -0,0 +1,162 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the in place updates of GroupModel
+"""
+
+import pytest
+
+from PySide6.QtCore import Qt
+from PySide6.QtTest import QAbstractItemModelTester
+
+from git_dashboard.group import GroupModel, MAX_CHILD_UPDATES
+from git_dashboard.status import RepoStatus
+from git_dashboard.timing import Profile
+
+def repo(name, dirty=False, branches=None):
+    """return the status of repo `name`, with local `branches` names if given"""
+    status = RepoStatus(f"/work/{name}", "main", dirty=dirty)
+    if branches is not None:
+        status.branches = [{"name": branch, "current": branch == "main", "upstream": None,
+                            "ahead": None, "behind": None, "gone": False, "date": 0}
+                           for branch in branches]
+    return status
+
+def repos(letters, **kwargs):
+    """return the status of a repo per letter of `letters`"""
+    return [repo(name, **kwargs) for name in letters]
+
+class Signals:
+    """record the signals of a model"""
+    def __init__(self, model):
+        """constructor"""
+        self.model  = model
+        self.events = []
+        model.rowsInserted.connect(lambda parent, first, last: self.events.append(
+            ("inserted", self.row(parent), first, last)))
+        model.rowsRemoved.connect(lambda parent, first, last: self.events.append(
+            ("removed", self.row(parent), first, last)))
+        model.dataChanged.connect(lambda top, bottom: self.events.append(
+            ("changed", self.row(top.parent()), top.row(), bottom.row())))
+        model.modelReset.connect(lambda: self.events.append(("reset",)))
+
+    @staticmethod
+    def row(parent):
+        """row of the repo of a child index, None for top level rows"""
+        return parent.row() if parent.isValid() else None
+
+    def take(self) -> list:
+        """return the signals recorded since the last call"""
+        events, self.events = self.events, []
+        return events
+
+@pytest.fixture(name="model")
+def fixture_model(qapp): # pylint: disable=unused-argument
+    """a model of repos a to f, checked for consistency by QAbstractItemModelTester"""
+    model = GroupModel(repos("abcdef"))
+    model.tester = QAbstractItemModelTester(model)
+    return model
+
+def names(model) -> str:
+    """return the names of the repos of the model, as rendered"""
+    return "".join(model.data(model.index(row, 0), Qt.DisplayRole)
+                   for row in range(model.rowCount()))
+
+def test_unchanged(model):
+    """an identical group signals nothing"""
+    signals = Signals(model)
+    model.update(repos("abcdef"))
+    assert not signals.take()
+
+def test_insert(model):
+    """contiguous new repos are inserted at once"""
+    signals = Signals(model)
+    model.update(repos("axybcdefz"))
+    assert signals.take() == [("inserted", None, 1, 2), ("inserted", None, 8, 8)]
+    assert names(model) == "axybcdefz"
+
+def test_remove(model):
+    """contiguous removed repos are removed at once"""
+    signals = Signals(model)
+    model.update(repos("adf"))
+    assert signals.take() == [("removed", None, 4, 4), ("removed", None, 1, 2)]
+    assert names(model) == "adf"
+
+def test_changed(model):
+    """changed repos are signaled as a single range"""
+    signals = Signals(model)
+    model.update([repo("a"), repo("b", dirty=True), repo("c"), repo("d"), repo("e", dirty=True),
+                  repo("f")])
+    assert signals.take() == [("changed", None, 1, 4)]
+    assert model.data(model.index(1, 2), Qt.DisplayRole) == "dirty/u0/s0"
+
+def test_profile_only(model):
+    """a new profile is not signaled, tooltips are queried when displayed"""
+    signals = Signals(model)
+    group = repos("abcdef")
+    group[0].profile = Profile()
+    model.update(group)
+    assert not signals.take()
+    assert "analyzed in" in model.data(model.index(0, 0), Qt.ToolTipRole)
+
+def test_reorder(model):
+    """reordered repos reset the model"""
+    signals = Signals(model)
+    model.update(repos("bacdef"))
+    assert signals.take() == [("reset",)]
+    assert names(model) == "bacdef"
+
+def test_duplicates(model):
+    """a repo listed twice resets the model"""
+    signals = Signals(model)
+    model.update(repos("abcdefa"))
+    assert ("reset",) in signals.take()
+    assert names(model) == "abcdefa"
+
+def test_branches(qapp): # pylint: disable=unused-argument
+    """branches are child rows, updated in place"""
+    model = GroupModel(repos("ab", branches=["main", "topic"]))
+    model.tester = QAbstractItemModelTester(model)
+    signals = Signals(model)
+    assert model.rowCount(model.index(0, 0)) == 2
+    model.update([repo("x"), repo("a", branches=["main"]),
+                  repo("b", dirty=True, branches=["main", "topic", "new"])])
+    events = signals.take()
+    assert ("inserted", None, 0, 0) in events
+    assert ("removed", 1, 1, 1) in events
+    assert ("inserted", 2, 2, 2) in events
+    assert model.rowCount(model.index(1, 0)) == 1
+    assert model.rowCount(model.index(2, 0)) == 3
+    # child indexes map back to their repo after rows were inserted
+    child = model.index(2, 0, model.index(2, 0))
+    assert model.parent(child).row() == 2
+    assert model.data(child, Qt.DisplayRole) == "new"
+
+def test_many_branches_reset(qapp): # pylint: disable=unused-argument
+    """when the branches of many repos changed, the model is reset instead"""
+    count = MAX_CHILD_UPDATES + 1
+    model = GroupModel([repo(f"r{num}", branches=["main"]) for num in range(count)])
+    signals = Signals(model)
+    model.update([repo(f"r{num}", branches=["main", "topic"]) for num in range(count)])
+    assert signals.take() == [("reset",)]
+    # up to MAX_CHILD_UPDATES repos, branches are removed in place
+    model.update([repo(f"r{num}",
+                       branches=["main"] if num < MAX_CHILD_UPDATES else ["main", "topic"])
+                  for num in range(count)])
+    events = signals.take()
+    assert ("reset",) not in events
+    assert [event for event in events if event[0] == "removed"] == [
+        ("removed", num, 1, 1) for num in range(MAX_CHILD_UPDATES)]
@@ -0,0 +1,126 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the visible groups and of the refresh order they give
+"""
+
+import argparse
+
+from PySide6.QtCore import Qt
+
+from git_dashboard.groups import GroupsView
+from git_dashboard.options import DEFAULT
+from git_dashboard.refresh import RefreshThread
+from git_dashboard.status import RepoStatus
+
+ARGS = argparse.Namespace(font_scale=1.0)
+
+def make_groups(sizes):
+    """return {name: [RepoStatus]} with `size` repos in each group"""
+    return {name: [RepoStatus(f"/{name}/repo{num:03}") for num in range(size)]
+            for name, size in sizes.items()}
+
+class FakeConfig: # pylint: disable=too-few-public-methods
+    """configuration of fixed groups of paths"""
+    options   = DEFAULT
+    discovery = None
+
+    def __init__(self, groups):
+        """constructor"""
+        self.paths = {name: [repo.path for repo in group] for name, group in groups.items()}
+
+    def expand(self, initial=False): # pylint: disable=unused-argument
+        """return {name: [path]}"""
+        return self.paths
+
+class FakeEngine: # pylint: disable=too-few-public-methods
+    """engine recording the order repos are analyzed in"""
+    def __init__(self):
+        """constructor"""
+        self.analyzed = []
+
+    def stream(self, paths, options, tracked): # pylint: disable=unused-argument
+        """analyze `paths`"""
+        for path in paths:
+            self.analyzed.append(path)
+            yield path, RepoStatus(path)
+
+def startup(groups, background=None):
+    """return (the refresh thread, the groups it signaled) after its first cycle"""
+    view   = GroupsView(groups, ARGS)
+    thread = RefreshThread(FakeConfig(groups), 60, FakeEngine(), background=background)
+    thread.set_visible(view.visible_groups())
+    ready = []
+    thread.group_ready.connect(lambda name_and_group: ready.append(name_and_group[0]))
+    thread.analyze({})
+    return thread, ready
+
+def test_first_group_shown(qapp): # pylint: disable=unused-argument
+    """the first group is the tab shown at startup, the all repos tab comes last"""
+    view = GroupsView(make_groups({"work": 2, "oss": 3}), ARGS)
+    assert view.tabText(view.currentIndex()) == "work"
+    assert view.tabText(view.count() - 1) == "all repos"
+    assert view.visible_groups() == ["work"]
+
+def test_hidden_groups_deferred_at_startup(qapp): # pylint: disable=unused-argument
+    """the shown group is analyzed and signaled before the hidden ones"""
+    groups = make_groups({"oss": 3, "work": 2, "misc": 2})
+    thread, ready = startup(groups)
+    assert ready == ["oss", "work", "misc"]
+    assert thread.engine.analyzed[:3] == [repo.path for repo in groups["oss"]]
+
+def test_hidden_groups_skipped_at_startup(qapp): # pylint: disable=unused-argument
+    """with --background-refresh 0, hidden groups wait until they are shown"""
+    groups = make_groups({"oss": 3, "work": 2})
+    thread, ready = startup(groups, background=0)
+    assert ready == ["oss"]
+    assert thread.engine.analyzed == [repo.path for repo in groups["oss"]]
+    assert thread.overdue() == []
+    thread.set_visible(["work"])
+    assert thread.overdue() == ["work"]
+
+def test_all_repos_tab(qapp): # pylint: disable=unused-argument
+    """the all repos tab shows the groups of the repos in view"""
+    view = GroupsView(make_groups({"aaa": 30, "bbb": 30}), ARGS)
+    view.resize(400, 200)
+    view.show()
+    view.setCurrentWidget(view.all_repos)
+    table = view.all_repos.table
+    table.sortByColumn(3, Qt.AscendingOrder)
+    qapp.processEvents()
+    assert view.visible_groups() == ["aaa"]
+    table.verticalScrollBar().setValue(table.verticalScrollBar().maximum())
+    assert view.visible_groups() == ["bbb"]
+    view.all_repos.text.setText("bbb/repo01")
+    assert view.visible_groups() == ["bbb"]
+    view.all_repos.text.setText("no such repo")
+    assert view.visible_groups() == []
+    view.close()
+
+def test_all_repos_tab_signals(qapp): # pylint: disable=unused-argument
+    """scrolling and filtering the all repos tab signal that other repos are in view"""
+    view = GroupsView(make_groups({"aaa": 30, "bbb": 30}), ARGS)
+    view.resize(400, 200)
+    view.show()
+    qapp.processEvents()
+    shown = []
+    view.all_repos.shown.connect(lambda: shown.append(True))
+    view.all_repos.table.verticalScrollBar().setValue(5)
+    assert shown
+    shown.clear()
+    view.all_repos.text.setText("aaa")
+    assert shown
+    view.close()
@@ -0,0 +1,95 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the status index of the all repos tab
+"""
+
+from git_dashboard.index import StatusIndex
+from git_dashboard.status import RepoStatus
+from git_dashboard.timing import Profile
+
+def repo(name, branch="main", **kwargs):
+    """return the status of repo `name`"""
+    return RepoStatus(f"/work/{name}", branch, **kwargs)
+
+def buckets(index) -> dict:
+    """return the non empty buckets of `index`, as sorted repo names"""
+    return {bucket: sorted(path.rsplit("/", 1)[1] for path in paths)
+            for bucket, paths in index.buckets.items() if paths}
+
+def test_buckets():
+    """repos are indexed once, in every bucket they belong to"""
+    index   = StatusIndex()
+    changed = index.update({
+        "one": [repo("a", dirty=True, ahead=1), repo("b", behind=2, untracked=3)],
+        "two": [repo("c", error="timeout", dirty=True), repo("a", dirty=True, ahead=1)],
+    })
+    assert changed == {"/work/a", "/work/b", "/work/c"}
+    assert len(index) == 3
+    assert buckets(index) == {"dirty": ["a"], "ahead": ["a"], "behind": ["b"],
+                              "untracked": ["b"], "error": ["c"]}
+
+def test_incremental():
+    """only replaced and removed repos are reported, and move between buckets"""
+    index = StatusIndex()
+    same  = repo("a")
+    index.update({"one": [same, repo("b", dirty=True), repo("c")]})
+    changed = index.update({"one": [same, repo("b", ahead=1)]})
+    assert changed == {"/work/b", "/work/c"}
+    assert buckets(index) == {"ahead": ["b"]}
+    assert index.query() == ["/work/a", "/work/b"]
+
+def test_profile_only():
+    """a new status with the same buckets and key is reported, the index is untouched"""
+    index = StatusIndex()
+    index.update({"one": [repo("a", dirty=True)]})
+    version = index.version
+    status  = repo("a", dirty=True)
+    status.profile = Profile()
+    assert index.update({"one": [status]}) == {"/work/a"}
+    assert index.version == version
+    assert index.repos["/work/a"] is status
+
+def test_query():
+    """repos match any selected bucket and every word, in index order"""
+    index = StatusIndex()
+    index.update({"one": [repo("app", "Feature/X", dirty=True), repo("lib", behind=1),
+                          repo("docs", ahead=1, dirty=True)]})
+    assert index.query() == ["/work/app", "/work/lib", "/work/docs"]
+    assert index.query(selected=["behind", "ahead"]) == ["/work/lib", "/work/docs"]
+    assert index.query("feature") == ["/work/app"]
+    assert index.query("work APP x") == ["/work/app"]
+    assert index.query("doc", ["dirty"]) == ["/work/docs"]
+    assert not index.query("missing")
+
+def test_narrowing():
+    """a query narrowing the previous one only scans its results"""
+    index = StatusIndex()
+    index.update({"one": [repo("app"), repo("lib")]})
+    assert index.query("ap") == ["/work/app"]
+    # a key changed behind the back of the index is not scanned again
+    index.keys["/work/lib"] += "\napp"
+    assert index.query("app") == ["/work/app"]
+    # a wider query scans every repo again
+    assert index.query("a") == ["/work/app", "/work/lib"]
+
+def test_update_invalidates():
+    """results of a previous query are not reused after an update"""
+    index = StatusIndex()
+    index.update({"one": [repo("app"), repo("lib")]})
+    assert index.query("ap") == ["/work/app"]
+    index.update({"one": [repo("app"), repo("lib", "app-fix")]})
+    assert index.query("app") == ["/work/app", "/work/lib"]
@@ -0,0 +1,74 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the git performance options
+"""
+
+import pytest
+import yaml
+
+from git_dashboard.options import GitOptions, DEFAULT
+
+def from_yaml(text, base=None):
+    """return the options of a `git:` section written in YAML"""
+    return GitOptions.from_config(yaml.safe_load(text), base)
+
+def test_defaults():
+    """an empty section keeps git's own configuration"""
+    options = GitOptions.from_config({})
+    assert options == DEFAULT
+    assert not options.config()
+    assert options.status() == ["--untracked-files=all"]
+
+def test_untracked_files_no():
+    """YAML reads an unquoted `no` as false, which means no"""
+    assert from_yaml("untracked-files: no").untracked_files == "no"
+    assert from_yaml("untracked-files: 'no'").untracked_files == "no"
+
+def test_arguments():
+    """options are passed as git configuration and status arguments"""
+    options = from_yaml("""
+        untracked-files: normal
+        untracked-cache: true
+        fsmonitor: /usr/bin/hook
+        ignore-submodules: dirty
+    """)
+    assert options.config() == ["-c", "core.untrackedCache=true",
+                                "-c", "core.fsmonitor=/usr/bin/hook"]
+    assert options.status() == ["--untracked-files=normal", "--ignore-submodules=dirty"]
+    assert from_yaml("fsmonitor: false").config() == ["-c", "core.fsmonitor=false"]
+
+def test_base():
+    """unset keys are inherited from the base options"""
+    base    = from_yaml("{untracked-files: normal, fsmonitor: true}")
+    options = from_yaml("{untracked-cache: false, fsmonitor: false}", base)
+    assert options == GitOptions("normal", False, False)
+    assert GitOptions.from_config({}, base) == base
+
+@pytest.mark.parametrize("text", [
+    "[untracked-files]",
+    "unknown: true",
+    "untracked-files: some",
+    "untracked-files: yes",
+    "untracked-cache: sometimes",
+    "ignore-submodules: everything",
+    "fsmonitor: 3",
+    "branches: 'yes'",
+])
+def test_invalid(text):
+    """invalid sections raise ValueError"""
+    with pytest.raises(ValueError):
+        from_yaml(text)
@@ -0,0 +1,77 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the parallel repo scanner
+"""
+
+import os
+
+import pytest
+
+from git_dashboard.config import find_git_repos_from_path
+from git_dashboard.scanner import scan
+
+@pytest.fixture(name="home")
+def fixture_home(tmp_path):
+    """
+    a tree of repos: regular ones at several depths, a worktree with a .git file,
+    a repo nested in a repo, a pruned one and a symlinked one
+    """
+    for path in ["a", "b/c", "b/d/e/f", "b/c/nested", "x/node_modules/pkg", "elsewhere/linked"]:
+        os.makedirs(tmp_path / path / ".git")
+    (tmp_path / "w" / "worktree").mkdir(parents=True)
+    (tmp_path / "w" / "worktree" / ".git").write_text("gitdir: /somewhere/else\n")
+    (tmp_path / "b" / "empty").mkdir()
+    os.symlink(tmp_path / "elsewhere" / "linked", tmp_path / "link")
+    return tmp_path
+
+def relative(root, repos):
+    """return the sorted paths of `repos` relative to `root`"""
+    return sorted(os.path.relpath(repo, root) for repo in repos)
+
+def test_scan(home):
+    """repos are found at any depth, but not below another repo, in pruned or symlinked dirs"""
+    assert relative(home, scan(home)) == ["a", "b/c", "b/d/e/f", "elsewhere/linked", "w/worktree"]
+
+def test_no_prune(home):
+    """prune patterns can be replaced"""
+    assert "x/node_modules/pkg" in relative(home, scan(home, prune=[]))
+    assert relative(home, scan(home, prune=["b", "else*"])) == [
+        "a", "w/worktree", "x/node_modules/pkg"]
+
+def test_maxdepth(home):
+    """repos below maxdepth are not found"""
+    assert relative(home, scan(home, maxdepth=2)) == ["a", "b/c", "elsewhere/linked", "w/worktree"]
+
+def test_single_worker(home):
+    """a single worker finds the same repos"""
+    assert relative(home, scan(home, workers=1)) == relative(home, scan(home))
+
+def test_progress(home):
+    """progress reports the number of directories scanned and repos found"""
+    reports = []
+    repos   = list(scan(home, progress=lambda scanned, found: reports.append((scanned, found))))
+    assert reports[-1][1] == len(repos)
+    assert [scanned for scanned, _ in reports] == list(range(1, len(reports) + 1))
+
+def test_symlinked_root(home):
+    """a symlinked root is not followed"""
+    assert not list(scan(home / "link"))
+
+def test_recursive_discovery(home):
+    """recursive discovery of the configuration agrees with the scanner, without pruning"""
+    found = find_git_repos_from_path(str(home))
+    assert relative(home, found) == relative(home, scan(home, prune=[]))
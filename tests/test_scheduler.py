@@ -0,0 +1,125 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the adaptive refresh scheduler
+"""
+
+import pytest
+
+from git_dashboard import scheduler
+from git_dashboard.scheduler import Scheduler
+from git_dashboard.status import RepoStatus
+
+class Clock: # pylint: disable=too-few-public-methods
+    """a monotonic clock advanced by hand"""
+    def __init__(self):
+        """constructor"""
+        self.now = 1000.0
+
+    def __call__(self):
+        """return the current time"""
+        return self.now
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch):
+    """replace the clock of the scheduler"""
+    clock = Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    return clock
+
+def clean(path):
+    """return the status of a clean repo"""
+    return RepoStatus(path, "main")
+
+def test_new_repos_due(clock): # pylint: disable=unused-argument
+    """new repos are due immediately, removed repos never"""
+    queue = Scheduler(10, 100)
+    queue.update(["a", "b", "c"])
+    queue.update(["a", "c", "d"])
+    assert sorted(queue.due()) == ["a", "c", "d"]
+    assert not queue.due()
+
+def test_due_order(clock):
+    """repos are due in order of their due time"""
+    queue = Scheduler(10, 100)
+    queue.update(["a", "b"])
+    queue.due()
+    queue.record("a", clean("a"), 0)    # first result: due again after min_interval
+    clock.now += 5
+    queue.record("b", clean("b"), 0)
+    clock.now += 5
+    assert queue.due() == ["a"]
+    clock.now += 5
+    assert queue.due() == ["b"]
+
+def test_idle_backoff(clock):
+    """unchanged clean repos back off exponentially, up to max_interval"""
+    queue = Scheduler(10, 50)
+    queue.update(["a"])
+    intervals = []
+    for _ in range(5):
+        queue.record("a", clean("a"), 0)
+        intervals.append(queue.repos["a"].interval)
+        clock.now += queue.repos["a"].interval
+        assert queue.due() == ["a"]
+    assert intervals == [10, 20, 40, 50, 50]
+
+def test_changed_and_dirty(clock):
+    """changed or dirty repos go back to min_interval"""
+    queue = Scheduler(10, 100)
+    queue.update(["a", "b"])
+    for path in "ab":
+        queue.record(path, clean(path), 0)
+        queue.record(path, clean(path), 0)
+    queue.record("a", RepoStatus("a", "topic"), 0)
+    queue.record("b", RepoStatus("b", "main", dirty=True), 0)
+    clock.now += 10
+    assert sorted(queue.due()) == ["a", "b"]
+
+def test_failures_and_slow(clock): # pylint: disable=unused-argument
+    """failing repos back off faster, slow repos are stretched"""
+    queue = Scheduler(10, 1000)
+    queue.update(["a", "b"])
+    queue.record("a", RepoStatus("a", error="timeout"), 0)
+    queue.record("a", RepoStatus("a", error="timeout"), 0)
+    assert queue.repos["a"].interval == 80
+    queue.record("b", clean("b"), 3 * scheduler.SLOW)
+    assert queue.repos["b"].interval == 30
+
+def test_cancelled(clock): # pylint: disable=unused-argument
+    """cancelled repos are due again at once, with an unchanged interval"""
+    queue = Scheduler(10, 100)
+    queue.update(["a"])
+    queue.due()
+    queue.record("a", clean("a"), 0)
+    queue.record("a", RepoStatus("a", error="cancelled"), 0)
+    assert queue.due() == ["a"]
+    assert queue.repos["a"].interval == 10
+
+def test_reset(clock):
+    """a reset makes every repo due at once, rescheduled entries are skipped"""
+    queue = Scheduler(10, 100)
+    queue.update(["a", "b"])
+    queue.due()
+    for path in "ab":
+        queue.record(path, clean(path), 0)
+        queue.record(path, clean(path), 0)
+    queue.reset()
+    assert sorted(queue.due()) == ["a", "b"]
+    assert queue.repos["a"].interval == 10
+    queue.record("a", clean("a"), 0)
+    clock.now += 20
+    assert queue.due() == ["a"]
@@ -0,0 +1,127 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the `git status --porcelain=v2` parser
+"""
+
+import io
+
+from git_dashboard import status
+from git_dashboard.status import parse, records
+
+OID   = "0123456789abcdef0123456789abcdef01234567"
+BLOB  = "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+MODES = "100644 100644 100644"
+
+def porcelain(*lines):
+    """return the NUL terminated porcelain v2 output made of `lines`"""
+    return io.BytesIO(b"".join(line.encode() + b"\0" for line in lines))
+
+def changed(states, path):
+    """return an ordinary changed entry, `states` being its XY field"""
+    return f"1 {states} N... {MODES} {BLOB} {BLOB} {path}"
+
+def test_branch_headers():
+    """branch, upstream and ahead/behind counts come from the headers"""
+    result = parse(porcelain(
+        f"# branch.oid {OID}",
+        "# branch.head main",
+        "# branch.upstream origin/main",
+        "# branch.ab +2 -3",
+    ))
+    assert result["oid"] == OID
+    assert result["branch"] == "main"
+    assert not result["detached"]
+    assert result["upstream"] == "origin/main"
+    assert (result["ahead"], result["behind"], result["diverged"]) == (2, 3, False)
+    assert (result["modified"], result["staged"], result["untracked"]) == (0, 0, 0)
+
+def test_no_upstream():
+    """ahead/behind are None without an upstream"""
+    result = parse(porcelain(f"# branch.oid {OID}", "# branch.head topic"))
+    assert result["upstream"] is None
+    assert result["ahead"] is None and result["behind"] is None
+
+def test_not_counted():
+    """with --no-ahead-behind, a branch that differs from its upstream has diverged"""
+    result = parse(porcelain(
+        f"# branch.oid {OID}",
+        "# branch.head main",
+        "# branch.upstream origin/main",
+        "# branch.ab +? -?",
+    ))
+    assert result["ahead"] is None and result["behind"] is None
+    assert result["diverged"]
+
+def test_detached():
+    """a detached HEAD has no branch"""
+    result = parse(porcelain(f"# branch.oid {OID}", "# branch.head (detached)"))
+    assert result["detached"]
+    assert result["branch"] is None
+    assert result["oid"] == OID
+
+def test_initial():
+    """a repo without commits has no oid"""
+    result = parse(porcelain("# branch.oid (initial)", "# branch.head main", "? new"))
+    assert result["oid"] is None
+    assert result["branch"] == "main"
+    assert result["untracked"] == 1
+
+def test_changed_entries():
+    """X counts as staged, Y as modified, both for a file changed in the index and the worktree"""
+    result = parse(porcelain(
+        changed("M.", "staged"),
+        changed(".M", "modified"),
+        changed("MM", "both"),
+        changed("A.", "added"),
+        changed(".D", "deleted"),
+        "? untracked",
+        "? other",
+    ))
+    assert result["staged"] == 3
+    assert result["modified"] == 3
+    assert result["untracked"] == 2
+
+def test_rename():
+    """the original path of a rename is a record of its own, not an entry"""
+    result = parse(porcelain(
+        f"2 R. N... {MODES} {BLOB} {BLOB} R100 new name",
+        "old name",
+        f"2 RM N... {MODES} {BLOB} {BLOB} R087 moved",
+        "? looks like an untracked entry",
+        "? untracked",
+    ))
+    assert result["staged"] == 2
+    assert result["modified"] == 1
+    assert result["untracked"] == 1
+
+def test_unmerged():
+    """a conflicted path counts as both staged and modified"""
+    result = parse(porcelain(
+        f"# branch.oid {OID}",
+        "# branch.head main",
+        f"u UU N... 100644 100644 100644 100644 {BLOB} {BLOB} {BLOB} conflicted",
+        f"u AA N... 000000 100644 100644 100644 {BLOB} {BLOB} {BLOB} both added",
+    ))
+    assert result["staged"] == 2
+    assert result["modified"] == 2
+    assert result["untracked"] == 0
+
+def test_records_across_chunks(monkeypatch):
+    """records split across reads are put back together"""
+    monkeypatch.setattr(status, "CHUNK_SIZE", 3)
+    stream = io.BytesIO(b"first record\0second\0\0last without NUL")
+    assert list(records(stream)) == [b"first record", b"second", b"", b"last without NUL"]
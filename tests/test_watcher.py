@@ -0,0 +1,79 @@
+# Git Dashboard
+# Copyright (C) 2022 Jung Ko <kojung@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of  MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of the directories watched by the inotify watcher
+"""
+
+import os
+import sys
+import subprocess
+
+import pytest
+
+from git_dashboard.watcher import InotifyWatcher, ignored_dirs
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify")
+
+@pytest.fixture(name="repo")
+def fixture_repo(tmp_path):
+    """a repo with dependency, ignored and regular directories"""
+    repo = tmp_path / "repo"
+    subprocess.run(["git", "init", "-q", str(repo)], check=True)
+    (repo / ".gitignore").write_text("# build output\nbuild/\n/dist/\n*.log\n")
+    for dirname in ("src/dist", "src/build", "dist", "build/lib", "node_modules/pkg", "docs"):
+        os.makedirs(repo / dirname)
+    return str(repo)
+
+@pytest.fixture(name="watcher")
+def fixture_watcher(repo):
+    """a watcher of `repo`"""
+    watcher = InotifyWatcher()
+    watcher.update([repo])
+    yield watcher
+    watcher.close()
+
+def watched(watcher, repo) -> set:
+    """return the directories of the worktree watched, relative to it"""
+    return {os.path.relpath(dirname, repo) for _, dirname, _, _ in watcher.watches.values()
+            if not os.path.relpath(dirname, repo).startswith(".git")}
+
+def test_ignored_dirs(repo):
+    """only directory lines of the .gitignore are used, anchored ones at the top"""
+    assert ignored_dirs(repo) == (["build"], ["dist"])
+    with open(os.path.join(repo, ".gitignore"), "a", encoding="utf-8") as out:
+        out.write("!build/keep\n")
+    assert ignored_dirs(repo) == ([], [])
+
+def test_pruned(watcher, repo):
+    """dependency and ignored directories are not watched"""
+    assert watched(watcher, repo) == {".", "src", "src/dist", "docs"}
+
+def test_created(watcher, repo):
+    """created directories are watched unless pruned"""
+    for dirname in ("lib", "lib/build", "src/node_modules", "src/.venv", "src/dist/x"):
+        os.makedirs(os.path.join(repo, dirname), exist_ok=True)
+    assert watcher.wait(1) == {repo}
+    assert watched(watcher, repo) == {".", "src", "src/dist", "docs", "lib", "src/dist/x"}
+    with open(os.path.join(repo, "lib", "new"), "w", encoding="utf-8"):
+        pass
+    assert watcher.wait(1) == {repo}
+
+def test_refs(watcher, repo):
+    """branch directories are watched, whatever their name"""
+    os.makedirs(os.path.join(repo, ".git", "refs", "heads", "build"))
+    assert watcher.wait(1) == {repo}
+    assert os.path.join(repo, ".git", "refs", "heads", "build") in {
+        dirname for _, dirname, _, _ in watcher.watches.values()}